@@ -4,7 +4,7 @@ import { useState } from "react";
 import { useRouter } from "next/navigation";
 import { toast } from "sonner";
 import { login } from "@/lib/api/auth";
-import { setAccessToken, setCurrentUser } from "@/lib/api/helper";
+import { setAccessToken, setCurrentUser, setPendingTotpToken } from "@/lib/api/helper";
 import LoginForm, { LoginFormData } from "@/components/auth/LoginForm";
 
 export default function LoginPage() {
@@ -28,6 +28,7 @@ export default function LoginPage() {
 
                 if ("requireTOTP" in res) {
                     // Handle TOTP verification
+                    setPendingTotpToken(res.tempToken);
                     router.push(`/login/totp?email=${encodeURIComponent(formData.email)}`);
                 }
                 else if ("accessToken" in res) {
@@ -4,7 +4,12 @@ import { useState, useEffect, Suspense } from "react";
 import { useRouter, useSearchParams } from "next/navigation";
 import { toast } from "sonner";
 import { loginTotp } from "@/lib/api/auth";
-import { setAccessToken, setCurrentUser } from "@/lib/api/helper";
+import {
+  clearPendingTotpToken,
+  getPendingTotpToken,
+  setAccessToken,
+  setCurrentUser,
+} from "@/lib/api/helper";
 import LoginTotpForm, {
   LoginTotpFormData,
 } from "@/components/auth/LoginTotpForm";
@@ -13,6 +18,8 @@ function LoginTotpPageContent() {
   const router = useRouter();
   const searchParams = useSearchParams();
   const email = searchParams.get("email") || "";
+  // set by the login page, read after mount since storage is client-only
+  const [tempToken, setTempToken] = useState<string | null>(null);
 
   const [formData, setFormData] = useState<LoginTotpFormData>({
     code: "",
@@ -20,10 +27,13 @@ function LoginTotpPageContent() {
   const [verifying, setVerifying] = useState(false);
 
   useEffect(() => {
-    if (!email) {
+    const pending = getPendingTotpToken();
+    if (!email || !pending) {
       toast.error("No email provided for TOTP verification.");
       router.push("/login");
+      return;
     }
+    setTempToken(pending);
   }, [email, router]);
 
   const updateField = (field: keyof LoginTotpFormData, value: string) => {
@@ -35,11 +45,12 @@ function LoginTotpPageContent() {
     setVerifying(true);
     try {
       const res = await loginTotp({
-        email,
+        tempToken: tempToken || "",
         code: formData.code,
       });
 
       if ("accessToken" in res) {
+        clearPendingTotpToken();
         setAccessToken(res.accessToken);
         setCurrentUser(res.user);
         toast.success("Đăng nhập thành công!");
@@ -2,6 +2,7 @@ import { User } from "@/lib/components/schemas";
 
 const ACCESS_TOKEN_KEY = "fs_access_token";
 const USER_KEY = "fs_user";
+const PENDING_TOTP_KEY = "fs_pending_totp";
 
 /**
  * Helpers: localStorage-safe (avoid SSR crash)
@@ -51,6 +52,26 @@ export function setCurrentUser(user: User) {
     safeSetItem(USER_KEY, JSON.stringify(user));
 }
 
+/**
+ * tempToken of a login waiting for its TOTP code. Kept in sessionStorage
+ * (this tab only) rather than the URL, so it does not end up in history,
+ * logs or Referer headers.
+ */
+export function getPendingTotpToken(): string | null {
+    if (typeof window === "undefined") return null;
+    return sessionStorage.getItem(PENDING_TOTP_KEY);
+}
+
+export function setPendingTotpToken(tempToken: string) {
+    if (typeof window === "undefined") return;
+    sessionStorage.setItem(PENDING_TOTP_KEY, tempToken);
+}
+
+export function clearPendingTotpToken() {
+    if (typeof window === "undefined") return;
+    sessionStorage.removeItem(PENDING_TOTP_KEY);
+}
+
 export function _isLoggedIn(): boolean {
     // return true;
     return !!getAccessToken();
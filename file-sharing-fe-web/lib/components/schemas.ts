@@ -63,6 +63,7 @@ export type LoginSuccessResponse = {
 
 export type TOTPRequiredResponse = {
   requireTOTP: boolean;
+  tempToken: string;
   message?: string;
 };
 
@@ -88,7 +89,7 @@ export interface TotpVerifyResponse {
 }
 
 export interface TotpLoginRequest {
-  email: string;
+  tempToken: string;
   code: string;
 }
 
@@ -0,0 +1,98 @@
+"""
+Bytes per file record: the old 13-key dict with ISO-8601 strings versus
+file_record.FileRecord.
+
+    python benchmarks/bench_file_memory.py --count 1000000
+
+Measured with tracemalloc, so it includes every object a record owns
+(strings, lists, floats) but not the bytes shared between records.
+"""
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from file_record import FileRecord  # noqa: E402
+
+OWNERS = [f"user{i}@hcmut.edu.vn" for i in range(1000)]
+DIGESTS = [uuid.uuid4().hex * 2 for _ in range(5000)]
+
+
+def dict_record(i: int, now: datetime) -> dict:
+    # layout of files[...] before FileRecord
+    file_id = str(uuid.uuid4())
+    created_at = now - timedelta(seconds=i)
+    return {
+        "id": file_id,
+        "filename": f"report-{i}.pdf",
+        "size": 1024 + i,
+        "shareToken": file_id,
+        "ownerEmail": "".join(OWNERS[i % len(OWNERS)]),  # a fresh str per request
+        "isPublic": False,
+        "passwordProtected": False,
+        "availableFrom": None,
+        "availableTo": (created_at + timedelta(days=7)).isoformat(),
+        "sharedWith": [],
+        "shareLink": f"http://localhost:3000/f/{file_id}",
+        "createdAt": created_at.isoformat(),
+        "totpEnabled": False,
+        "sha256": "".join(DIGESTS[i % len(DIGESTS)]),
+        "password": None,
+        "totpSecret": None,
+        "status": "active",
+    }
+
+
+def slotted_record(i: int, now: datetime) -> FileRecord:
+    file_id = str(uuid.uuid4())
+    created_at = now.timestamp() - i
+    return FileRecord(
+        id=file_id,
+        filename=f"report-{i}.pdf",
+        size=1024 + i,
+        share_token=file_id,
+        owner_email="".join(OWNERS[i % len(OWNERS)]),
+        is_public=False,
+        available_from=None,
+        available_to=created_at + 7 * 86400,
+        created_at=created_at,
+        shared_with=[],
+        sha256="".join(DIGESTS[i % len(DIGESTS)]),
+    )
+
+
+def measure(factory, count: int) -> float:
+    now = datetime.now(timezone.utc)
+    gc.collect()
+    tracemalloc.start()
+    records = {}
+    for i in range(count):
+        record = factory(i, now)
+        records[i] = record
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del records
+    gc.collect()
+    return current / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--count", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    dict_bytes = measure(dict_record, args.count)
+    slotted_bytes = measure(slotted_record, args.count)
+    print(f"records: {args.count:,}")
+    print(f"dict + ISO strings : {dict_bytes:8.1f} bytes/file")
+    print(f"FileRecord         : {slotted_bytes:8.1f} bytes/file")
+    print(f"saved              : {100 * (1 - slotted_bytes / dict_bytes):8.1f} %")
+
+
+if __name__ == "__main__":
+    main()
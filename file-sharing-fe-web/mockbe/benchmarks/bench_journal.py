@@ -0,0 +1,79 @@
+"""
+Journaled memory store: durable write throughput and restart time.
+
+    python benchmarks/bench_journal.py --writes 2000 --threads 1 8 32 --files 100000
+
+Writes are create_session calls that each wait for their fsync, so with more
+threads more entries share one group commit. Recovery is timed from a
+snapshot of --files records plus a journal tail of growing length.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bench_list_files import make_record  # noqa: E402
+from journal import Journal  # noqa: E402
+from memory_store import MemoryStore  # noqa: E402
+
+POLICY = {"id": 1, "maxFileSizeMB": 50}
+
+
+def write_throughput(directory: str, writes: int, threads: int) -> float:
+    store = MemoryStore({}, POLICY, journal=Journal(directory))
+    per_thread = writes // threads
+
+    def worker(n):
+        for i in range(per_thread):
+            store.create_session(f"token-{n}-{i}", "user@example.com")
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return per_thread * threads / (time.perf_counter() - start)
+
+
+def recovery_seconds(directory: str, files: int, tail: int) -> float:
+    store = MemoryStore({}, POLICY, journal=Journal(directory, group_commit_seconds=0))
+    now = datetime.now(timezone.utc)
+    for i in range(files):
+        store.add_file(make_record(f"user{i % 100}@example.com", now))
+    store.snapshot()
+    for i in range(tail):
+        store.create_session(f"token-{i}", "user@example.com")
+
+    start = time.perf_counter()
+    MemoryStore({}, POLICY, journal=Journal(directory))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--writes", type=int, default=2000)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--files", type=int, default=100_000)
+    parser.add_argument("--tails", type=int, nargs="+", default=[0, 1000, 10_000])
+    args = parser.parse_args()
+
+    print(f"{'threads':>8} {'durable writes/s':>17}")
+    for threads in args.threads:
+        with tempfile.TemporaryDirectory() as tmp:
+            print(f"{threads:>8} {write_throughput(tmp, args.writes, threads):>17,.0f}")
+
+    print(f"\n{'snapshot files':>15} {'journal tail':>13} {'recovery s':>11}")
+    for tail in args.tails:
+        with tempfile.TemporaryDirectory() as tmp:
+            seconds = recovery_seconds(tmp, args.files, tail)
+            print(f"{args.files:>15,} {tail:>13,} {seconds:>11.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Latency of GET /api/files/my as the total number of files grows while the
+caller owns the same few files.
+
+    python benchmarks/bench_list_files.py --sizes 10000 100000 300000 1000000
+
+The "full scan" column times the old files.values() filter for comparison,
+so run it with the default memory metadata backend. The "status filter"
+column asks for page 5 of the caller's expired files while all of them are
+active, which used to walk every owned file:
+
+    python benchmarks/bench_list_files.py --sizes 100000 1000000 --owned 100000
+"""
+import argparse
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import server  # noqa: E402
+from file_record import FileRecord  # noqa: E402
+
+USER_EMAIL = "bigbluewhale@hcmut.edu.vn"
+USER_PASSWORD = "bigbluewhale@123"
+
+
+def make_record(owner_email: str, created_at: datetime) -> FileRecord:
+    file_id = str(uuid.uuid4())
+    return FileRecord(
+        id=file_id,
+        filename=f"file-{file_id[:8]}.pdf",
+        size=1024,
+        share_token=file_id,
+        owner_email=owner_email,
+        is_public=False,
+        available_from=None,
+        available_to=(created_at + timedelta(days=7)).timestamp(),
+        created_at=created_at.timestamp(),
+        shared_with=(),
+        sha256="0" * 64,
+    )
+
+
+def populate(total: int, owned: int, owners: int):
+    now = datetime.now(timezone.utc)
+    current = server.store.file_count()
+    for i in range(current, total):
+        if i < owned:
+            owner = USER_EMAIL
+        else:
+            owner = f"user{i % owners}@example.com"
+        server.store.add_file(make_record(owner, now - timedelta(seconds=i)))
+
+
+def time_call(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 300_000, 1_000_000])
+    parser.add_argument("--owned", type=int, default=3, help="files owned by the caller")
+    parser.add_argument("--owners", type=int, default=10_000, help="distinct other owners")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    client = server.app.test_client()
+    token = client.post(
+        "/api/auth/login", json={"email": USER_EMAIL, "password": USER_PASSWORD}
+    ).json["accessToken"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    def list_files():
+        response = client.get("/api/files/my?limit=20", headers=headers)
+        assert response.status_code == 200, response.status_code
+
+    def list_filtered():
+        response = client.get("/api/files/my?limit=20&status=expired&page=5", headers=headers)
+        assert response.status_code == 200, response.status_code
+
+    def full_scan():
+        return [f for f in server.store.files.values() if f.owner_email == USER_EMAIL]
+
+    print(f"{'total files':>12} {'/api/files/my ms':>17} {'status filter ms':>17} {'full scan ms':>13}")
+    for size in sorted(args.sizes):
+        populate(size, args.owned, args.owners)
+        endpoint_ms = time_call(list_files, args.repeat)
+        filtered_ms = time_call(list_filtered, args.repeat)
+        scan_ms = time_call(full_scan, max(1, args.repeat // 4))
+        print(f"{size:>12,} {endpoint_ms:>17.3f} {filtered_ms:>17.3f} {scan_ms:>13.3f}")
+
+
+if __name__ == "__main__":
+    main()
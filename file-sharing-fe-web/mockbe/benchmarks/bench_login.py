@@ -0,0 +1,124 @@
+"""
+Login throughput at several scrypt costs, and download latency while a
+login burst is in progress.
+
+    python benchmarks/bench_login.py --logins 200 --clients 16 --costs 12,14,15
+    PASSWORD_HASH_WORKERS=2 python benchmarks/bench_login.py
+
+For each cost (log2 of scrypt N) users are registered with that cost, then
+--clients threads log in --logins times through the Flask test client while
+another thread keeps downloading a public file. Logins turned away with 503
+because the hash queue was full are counted separately.
+"""
+import argparse
+import io
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+# measure hashing, not the login rate limiter
+os.environ.setdefault("LOGIN_IP_BURST", "1e9")
+os.environ.setdefault("LOGIN_EMAIL_BURST", "1e9")
+
+import server  # noqa: E402
+from password_hashing import PasswordHasher  # noqa: E402
+
+USERS = 20
+
+
+def percentile(samples: list, share: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * share))] if samples else 0.0
+
+
+def download_latencies(client, url: str, stop: threading.Event) -> list:
+    samples = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        response = client.get(url)
+        response.get_data()
+        assert response.status_code == 200, response.status_code
+        samples.append(time.perf_counter() - start)
+        time.sleep(0.005)
+    return samples
+
+
+def login_burst(client, emails: list, logins: int, clients: int) -> dict:
+    counts = {200: 0, 503: 0}
+    lock = threading.Lock()
+    remaining = iter(range(logins))
+
+    def run():
+        for i in remaining:
+            email = emails[i % len(emails)]
+            response = client.post("/api/auth/login", json={"email": email, "password": f"{email}-secret"})
+            with lock:
+                counts[response.status_code] = counts.get(response.status_code, 0) + 1
+
+    threads = [threading.Thread(target=run) for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    counts["seconds"] = time.perf_counter() - start
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--costs", default="12,14,15", help="comma separated log2(N) values")
+    args = parser.parse_args()
+
+    client = server.app.test_client()
+    token = client.post(
+        "/api/auth/login", json={"email": "bigbluewhale@hcmut.edu.vn", "password": "bigbluewhale@123"}
+    ).json["accessToken"]
+    shared = client.post(
+        "/api/files/upload",
+        headers={"Authorization": f"Bearer {token}"},
+        data={"file": (io.BytesIO(os.urandom(256 * 1024)), "bench.bin"), "isPublic": "true"},
+        content_type="multipart/form-data",
+    ).json["file"]
+    url = f"/api/files/{shared['shareToken']}/download"
+
+    stop = threading.Event()
+    idle = []
+    idle_thread = threading.Thread(target=lambda: idle.extend(download_latencies(client, url, stop)))
+    idle_thread.start()
+    time.sleep(1)
+    stop.set()
+    idle_thread.join()
+
+    workers = server.password_hasher.workers
+    print(f"hash workers={workers} clients={args.clients} logins={args.logins}")
+    print(f"download p50/p99 idle: {percentile(idle, 0.5) * 1e3:.1f} / {percentile(idle, 0.99) * 1e3:.1f} ms")
+    print(f"{'log2 N':>7} {'logins/s':>9} {'ok':>5} {'503':>5} {'dl p50 ms':>10} {'dl p99 ms':>10}")
+    for cost in (int(value) for value in args.costs.split(",")):
+        server.password_hasher = PasswordHasher(
+            n=2**cost, workers=workers, max_pending=int(os.environ.get("PASSWORD_HASH_MAX_PENDING", 32))
+        )
+        emails = [f"bench-{cost}-{i}@example.com" for i in range(USERS)]
+        for email in emails:
+            client.post("/api/auth/register", json={"email": email, "password": f"{email}-secret"})
+
+        stop = threading.Event()
+        busy = []
+        download_thread = threading.Thread(target=lambda: busy.extend(download_latencies(client, url, stop)))
+        download_thread.start()
+        counts = login_burst(client, emails, args.logins, args.clients)
+        stop.set()
+        download_thread.join()
+
+        print(
+            f"{cost:>7} {counts[200] / counts['seconds']:>9,.1f} {counts[200]:>5} {counts[503]:>5} "
+            f"{percentile(busy, 0.5) * 1e3:>10.1f} {percentile(busy, 0.99) * 1e3:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
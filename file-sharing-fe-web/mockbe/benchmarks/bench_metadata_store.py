@@ -0,0 +1,92 @@
+"""
+Read / write throughput of the metadata backends (memory vs SQLite WAL).
+
+    python benchmarks/bench_metadata_store.py --files 20000 --reads 20000
+
+Writes insert file records; reads are the hot request paths: session lookup,
+file lookup by share token and one /api/files/my page.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bench_list_files import make_record  # noqa: E402
+from memory_store import MemoryStore  # noqa: E402
+from sqlite_store import SQLiteStore  # noqa: E402
+
+OWNERS = 100
+POLICY = {"id": 1, "maxFileSizeMB": 50}
+
+
+def ops_per_second(fn, count: int) -> float:
+    start = time.perf_counter()
+    fn()
+    return count / (time.perf_counter() - start)
+
+
+def run(store, files: int, reads: int) -> dict:
+    now = datetime.now(timezone.utc)
+    owners = [f"user{i}@example.com" for i in range(OWNERS)]
+    records = [make_record(owners[i % OWNERS], now) for i in range(files)]
+    tokens = [f"token-{i}" for i in range(OWNERS)]
+
+    def write_files():
+        for record in records:
+            store.add_file(record)
+
+    def write_sessions():
+        for token, owner in zip(tokens, owners):
+            store.create_session(token, owner)
+
+    rng = random.Random(1)
+    share_tokens = [rng.choice(records).share_token for _ in range(reads)]
+    session_tokens = [rng.choice(tokens) for _ in range(reads)]
+    page_owners = [rng.choice(owners) for _ in range(reads // 10)]
+
+    def read_sessions():
+        for token in session_tokens:
+            store.get_session(token)
+
+    def read_files():
+        for token in share_tokens:
+            store.get_file_by_share_token(token)
+
+    def list_pages():
+        for owner in page_owners:
+            store.list_owner_files(owner, "createdAt", True, limit=21)
+
+    write_sessions()
+    return {
+        "insert file": ops_per_second(write_files, files),
+        "get session": ops_per_second(read_sessions, reads),
+        "get file": ops_per_second(read_files, reads),
+        "list page": ops_per_second(list_pages, len(page_owners)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=20_000)
+    parser.add_argument("--reads", type=int, default=20_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = {
+            "memory": MemoryStore({}, POLICY),
+            "sqlite": SQLiteStore(os.path.join(tmp, "metadata.db"), {}, POLICY),
+        }
+        results = {name: run(store, args.files, args.reads) for name, store in backends.items()}
+
+    print(f"{'ops/s':>12}" + "".join(f"{name:>14}" for name in results))
+    for op in results["memory"]:
+        print(f"{op:>12}" + "".join(f"{results[name][op]:>14,.0f}" for name in results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Auth-check latency of the session stores: in-process dict, MemoryStore and
+the SQLite file shared by worker processes (METADATA_BACKEND=sqlite).
+
+    python benchmarks/bench_session_store.py --sessions 10000 --checks 50000 --writers 4
+
+An auth check is what get_current_user() does per request: get_session(),
+plus renew_session() for the share of sessions due for renewal. The SQLite
+store is measured idle and again while --writers processes log in, renew
+and log out against the same file; tokens they create are checked from this
+process to confirm every worker sees them.
+"""
+import argparse
+import multiprocessing
+import os
+import queue
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from memory_store import MemoryStore  # noqa: E402
+from sqlite_store import SQLiteStore  # noqa: E402
+
+RENEW_SHARE = 0.02
+IDLE_TIMEOUT_SECONDS = 1800
+
+
+def populate(store, sessions: int) -> list:
+    now = time.time()
+    tokens = [f"token-{i}" for i in range(sessions)]
+    for i, token in enumerate(tokens):
+        store.create_session(token, f"user{i % 1000}@example.com", now + IDLE_TIMEOUT_SECONDS, now + 86400)
+    return tokens
+
+
+def latencies(check, tokens: list) -> list:
+    samples = []
+    for token in tokens:
+        start = time.perf_counter()
+        check(token)
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples
+
+
+def store_check(store, rng: random.Random):
+    def check(token):
+        now = time.time()
+        session = store.get_session(token, now)
+        assert session is not None, token
+        if rng.random() < RENEW_SHARE:
+            store.renew_session(token, now + IDLE_TIMEOUT_SECONDS)
+
+    return check
+
+
+def writer(path: str, worker: int, stop, created):
+    # one gunicorn worker's worth of logins, renewals and logouts
+    store = SQLiteStore(path, {}, {})
+    i = 0
+    while not stop.is_set():
+        now = time.time()
+        token = f"writer-{worker}-{i}"
+        store.create_session(token, f"writer{worker}@example.com", now + IDLE_TIMEOUT_SECONDS, now + 86400)
+        store.renew_session(token, now + IDLE_TIMEOUT_SECONDS)
+        if i % 2:
+            store.delete_session(token)
+        elif i < 400:
+            created.put(token)
+        i += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=10_000)
+    parser.add_argument("--checks", type=int, default=50_000)
+    parser.add_argument("--writers", type=int, default=4)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "sessions.db")
+        memory = MemoryStore({}, {})
+        sqlite = SQLiteStore(path, {}, {})
+        tokens = populate(memory, args.sessions)
+        populate(sqlite, args.sessions)
+        checks = [rng.choice(tokens) for _ in range(args.checks)]
+
+        sessions = {token: memory.sessions[token] for token in tokens}
+        results["dict"] = latencies(sessions.__getitem__, checks)
+        results["memory store"] = latencies(store_check(memory, rng), checks)
+        results["sqlite idle"] = latencies(store_check(sqlite, rng), checks)
+
+        context = multiprocessing.get_context("spawn")
+        stop = context.Event()
+        created = context.Queue()
+        writers = [context.Process(target=writer, args=(path, i, stop, created)) for i in range(args.writers)]
+        for process in writers:
+            process.start()
+        time.sleep(1)  # let the writers get going
+        results[f"sqlite +{args.writers} writers"] = latencies(store_check(sqlite, rng), checks)
+        stop.set()
+        seen = []
+        try:
+            while True:
+                seen.append(created.get(timeout=1))
+        except queue.Empty:
+            pass
+        for process in writers:
+            process.join()
+        missing = [token for token in seen if sqlite.get_session(token) is None]
+
+    print(f"{'':>20} {'p50 us':>8} {'p99 us':>8} {'checks/s':>10}")
+    for label, samples in results.items():
+        p50 = samples[len(samples) // 2] * 1e6
+        p99 = samples[int(len(samples) * 0.99)] * 1e6
+        print(f"{label:>20} {p50:>8.1f} {p99:>8.1f} {len(samples) / sum(samples):>10,.0f}")
+    print(f"writer sessions checked from this process: {len(seen)}, missing: {len(missing)}")
+
+
+if __name__ == "__main__":
+    main()
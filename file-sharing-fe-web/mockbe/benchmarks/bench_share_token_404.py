@@ -0,0 +1,74 @@
+"""
+404 storm on the share endpoints: random tokens against a large store, with
+and without the share token Bloom filter.
+
+    python benchmarks/bench_share_token_404.py --files 1000000 --requests 20000
+    METADATA_BACKEND=sqlite python benchmarks/bench_share_token_404.py
+
+Times GET /api/files/<token> through the Flask test client and the bare
+lookup (filter check, then store) for tokens that do not exist.
+"""
+import argparse
+import os
+import secrets
+import sys
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import server  # noqa: E402
+from bench_list_files import make_record  # noqa: E402
+from bloom_filter import CountingBloomFilter  # noqa: E402
+
+
+def populate(total: int) -> CountingBloomFilter:
+    now = datetime.now(timezone.utc)
+    bloom = CountingBloomFilter(max(server.SHARE_TOKEN_FILTER_CAPACITY, 2 * total))
+    for i in range(server.store.file_count(), total):
+        record = make_record(f"user{i % 1000}@example.com", now)
+        server.store.add_file(record)
+    for share_token in server.store.share_tokens():
+        bloom.add(share_token)
+    return bloom
+
+
+def per_second(fn, items) -> float:
+    start = time.perf_counter()
+    for item in items:
+        fn(item)
+    return len(items) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=1_000_000)
+    parser.add_argument("--requests", type=int, default=20_000)
+    args = parser.parse_args()
+
+    bloom = populate(args.files)
+    client = server.app.test_client()
+    tokens = [secrets.token_urlsafe(12) for _ in range(args.requests)]
+
+    def request(token):
+        response = client.get(f"/api/files/{token}")
+        assert response.status_code == 404, response.status_code
+
+    results = {}
+    for label, active in (("without filter", None), ("with filter", bloom)):
+        server.share_token_filter = active
+        results[label] = (
+            per_second(request, tokens),
+            per_second(server.get_shared_file, tokens),
+        )
+    false_positives = sum(bloom.might_contain(token) for token in tokens)
+
+    print(f"backend={server.METADATA_BACKEND} files={server.store.file_count():,}")
+    print(f"{'':>15} {'requests/s':>12} {'lookups/s':>12}")
+    for label, (requests_per_second, lookups_per_second) in results.items():
+        print(f"{label:>15} {requests_per_second:>12,.0f} {lookups_per_second:>12,.0f}")
+    print(f"filter false positives: {false_positives}/{len(tokens)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import os
+import threading
+import time
+
+
+class BlobStore:
+    """
+    Content-addressed file store for the mock backend.
+    Blobs are keyed by the SHA-256 of their content and reference counted, so
+    identical uploads share one file on disk. Releasing the last reference
+    only marks the blob as orphaned; reap_orphans() removes it later.
+
+    When several processes share the directory, pass count_refs(digest) -> int
+    backed by the shared metadata: the local refCount only sees this
+    process's uploads, so the reaper asks count_refs instead and leaves
+    recently touched blobs alone for reap_grace_seconds.
+    """
+
+    def __init__(self, root: str, count_refs=None, reap_grace_seconds: float = 60):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        # blobs[digest] = { "path": str, "size": int, "refCount": int }
+        self.blobs = {}
+        self.orphans = set()
+        self.lock = threading.Lock()
+        self.count_refs = count_refs
+        self.reap_grace_seconds = reap_grace_seconds
+
+    def path_for(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def _lookup(self, digest: str):
+        """
+        Blob entry for digest, picking up blobs written by another process
+        (or before a restart) from disk. Caller holds the lock.
+        """
+        blob = self.blobs.get(digest)
+        if blob is None:
+            path = self.path_for(digest)
+            try:
+                size = os.path.getsize(path)
+            except FileNotFoundError:
+                return None
+            blob = {"path": path, "size": size, "refCount": 0}
+            self.blobs[digest] = blob
+        return blob
+
+    def put(self, digest: str, src_path: str, size: int) -> dict:
+        """
+        Take ownership of src_path as the content for digest. If the blob
+        already exists the source file is removed and only the count changes.
+        """
+        with self.lock:
+            blob = self._lookup(digest)
+            if blob:
+                blob["refCount"] += 1
+                self.orphans.discard(digest)
+                os.remove(src_path)
+                # refresh mtime so other processes' reapers see it in use
+                os.utime(blob["path"])
+                return blob
+
+            path = self.path_for(digest)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(src_path, path)
+            blob = {"path": path, "size": size, "refCount": 1}
+            self.blobs[digest] = blob
+            return blob
+
+    def get(self, digest: str):
+        with self.lock:
+            return self._lookup(digest)
+
+    def restore_refs(self, digests):
+        """
+        Count one reference per digest, for file records that were loaded
+        back from disk rather than uploaded in this process.
+        """
+        with self.lock:
+            for digest in digests:
+                blob = self._lookup(digest)
+                if blob:
+                    blob["refCount"] += 1
+
+    def release(self, digest: str):
+        with self.lock:
+            blob = self._lookup(digest)
+            if not blob:
+                return
+            blob["refCount"] -= 1
+            if blob["refCount"] <= 0 or self.count_refs is not None:
+                self.orphans.add(digest)
+
+    def reap_orphans(self, digests=None) -> tuple:
+        """
+        Delete every blob that still has no references, or only those among
+        `digests` so callers can bound the work done per call.
+        Returns (blobs_removed, bytes_freed, bytes_deferred): deferred bytes
+        belong to unreferenced blobs still inside reap_grace_seconds, which
+        stay orphaned and are removed by a later call.
+        """
+        removed = 0
+        freed = 0
+        deferred = 0
+        retry = set()
+        with self.lock:
+            candidates = self.orphans if digests is None else self.orphans.intersection(digests)
+            for digest in candidates:
+                blob = self.blobs.get(digest)
+                if blob is None:
+                    continue
+                if self.count_refs is not None:
+                    if self.count_refs(digest) > 0:
+                        continue
+                    try:
+                        age = time.time() - os.path.getmtime(blob["path"])
+                    except FileNotFoundError:
+                        del self.blobs[digest]
+                        continue
+                    if age < self.reap_grace_seconds:
+                        # another process may be about to record a reference
+                        retry.add(digest)
+                        deferred += blob["size"]
+                        continue
+                elif blob["refCount"] > 0:
+                    continue
+                # unlink under the lock so a concurrent put() of the same
+                # content can't land on the path we are deleting
+                try:
+                    os.remove(blob["path"])
+                except FileNotFoundError:
+                    pass
+                del self.blobs[digest]
+                removed += 1
+                freed += blob["size"]
+            self.orphans = (self.orphans - candidates) | retry
+        return removed, freed, deferred
+
+    def start_reaper(self, interval_seconds: float):
+        def run():
+            while True:
+                time.sleep(interval_seconds)
+                self.reap_orphans()
+
+        thread = threading.Thread(target=run, name="blob-reaper", daemon=True)
+        thread.start()
+        return thread
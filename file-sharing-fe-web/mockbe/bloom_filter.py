@@ -0,0 +1,67 @@
+import hashlib
+import math
+import threading
+
+
+class CountingBloomFilter:
+    """
+    Compact set of strings answering "definitely absent" or "maybe present".
+    One byte counter per slot instead of one bit, so entries can be removed
+    as well as added. A counter that reaches 255 sticks there, which can only
+    cost a false positive, never a false negative.
+
+    Sized for `capacity` entries at `error_rate` false positives; past that
+    the false positive rate climbs, answers stay correct.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        capacity = max(1, capacity)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.counters = bytearray(self.size)
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def _hashes(self, item: str) -> tuple:
+        # double hashing: slot i is (h1 + i * h2) % size, from one digest
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+
+    def _slots(self, item: str):
+        h1, h2 = self._hashes(item)
+        size = self.size
+        return [(h1 + i * h2) % size for i in range(self.hash_count)]
+
+    def add(self, item: str):
+        slots = self._slots(item)
+        with self.lock:
+            counters = self.counters
+            for slot in slots:
+                if counters[slot] < 255:
+                    counters[slot] += 1
+            self.count += 1
+
+    def remove(self, item: str):
+        """
+        Remove an item that was added before. Removing something never added
+        would corrupt the counters.
+        """
+        slots = self._slots(item)
+        with self.lock:
+            counters = self.counters
+            for slot in slots:
+                if 0 < counters[slot] < 255:
+                    counters[slot] -= 1
+            self.count -= 1
+
+    def might_contain(self, item: str) -> bool:
+        # most absent items hit an empty slot within the first one or two
+        h1, h2 = self._hashes(item)
+        counters = self.counters
+        size = self.size
+        for i in range(self.hash_count):
+            if not counters[(h1 + i * h2) % size]:
+                return False
+        return True
@@ -0,0 +1,115 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# wait after a failed batch, doubled per consecutive failure
+ERROR_BACKOFF_SECONDS = 1
+MAX_ERROR_BACKOFF_SECONDS = 60
+
+
+class ExpirySweeper:
+    """
+    Background thread that keeps deleting expired files between cron
+    cleanups. Work is done in small batches paced to files_per_second and
+    bytes_per_second, so draining a large backlog does not compete with
+    downloads for disk I/O.
+
+    delete_batch(limit) -> (files_deleted, bytes_freed) does the deleting,
+    oldest_expiry() -> epoch | None gives the earliest availableTo still
+    stored, which is what the lag metric is measured from. A batch that
+    raises is logged and retried after a backoff; the thread keeps going.
+    """
+
+    def __init__(
+        self,
+        delete_batch,
+        oldest_expiry,
+        files_per_second: float,
+        bytes_per_second: float,
+        idle_seconds: float = 5,
+    ):
+        if files_per_second <= 0 or bytes_per_second <= 0:
+            raise ValueError("files_per_second and bytes_per_second must be positive")
+        self.delete_batch = delete_batch
+        self.oldest_expiry = oldest_expiry
+        self.files_per_second = files_per_second
+        self.bytes_per_second = bytes_per_second
+        self.idle_seconds = idle_seconds
+        # about ten batches a second at full speed
+        self.batch_size = max(1, int(files_per_second / 10))
+        self.lock = threading.Lock()
+        self.stats = {
+            "running": False,
+            "deletedFiles": 0,
+            "freedBytes": 0,
+            "batches": 0,
+            "throttledSeconds": 0.0,
+            "lastBatchAt": None,
+            "errors": 0,
+            "lastError": None,
+        }
+
+    def sweep_once(self) -> tuple:
+        """
+        Delete one batch, then sleep long enough to stay under both rate
+        limits. Returns (files_deleted, bytes_freed).
+        """
+        started = time.monotonic()
+        deleted, freed = self.delete_batch(self.batch_size)
+        if deleted:
+            with self.lock:
+                self.stats["deletedFiles"] += deleted
+                self.stats["freedBytes"] += freed
+                self.stats["batches"] += 1
+                self.stats["lastBatchAt"] = time.time()
+            budget = max(deleted / self.files_per_second, freed / self.bytes_per_second)
+            pause = budget - (time.monotonic() - started)
+            if pause > 0:
+                with self.lock:
+                    self.stats["throttledSeconds"] += pause
+                time.sleep(pause)
+        return deleted, freed
+
+    def run(self):
+        backoff = ERROR_BACKOFF_SECONDS
+        try:
+            while True:
+                try:
+                    deleted, _ = self.sweep_once()
+                except Exception as exc:
+                    logger.exception("expiry sweep batch failed, retrying in %ss", backoff)
+                    with self.lock:
+                        self.stats["errors"] += 1
+                        self.stats["lastError"] = repr(exc)
+                    time.sleep(backoff)
+                    backoff = min(backoff * 2, MAX_ERROR_BACKOFF_SECONDS)
+                    continue
+                backoff = ERROR_BACKOFF_SECONDS
+                if deleted < self.batch_size:
+                    # backlog drained, check back later
+                    time.sleep(self.idle_seconds)
+        finally:
+            with self.lock:
+                self.stats["running"] = False
+
+    def start(self):
+        self.stats["running"] = True
+        thread = threading.Thread(target=self.run, name="expiry-sweeper", daemon=True)
+        thread.start()
+        return thread
+
+    def metrics(self) -> dict:
+        """
+        Progress counters plus lagSeconds: how long the oldest expired file
+        still stored has been expired (0 when the sweeper is caught up).
+        """
+        with self.lock:
+            metrics = dict(self.stats)
+        now = time.time()
+        oldest = self.oldest_expiry()
+        metrics["lagSeconds"] = max(0.0, now - oldest) if oldest is not None else 0.0
+        metrics["filesPerSecondLimit"] = self.files_per_second
+        metrics["bytesPerSecondLimit"] = self.bytes_per_second
+        return metrics
@@ -0,0 +1,101 @@
+import sys
+from datetime import datetime, timezone
+
+SHARE_LINK_BASE = "http://localhost:3000/f/"
+
+
+def to_iso(timestamp):
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+
+class FileRecord:
+    """
+    Metadata of one uploaded file.
+    Slotted, with epoch-second timestamps and interned owner / hash strings,
+    to keep the per-file footprint small when holding millions of records.
+    Derived and JSON-shaped fields (ISO dates, shareLink, ...) are only built
+    in to_dict().
+    """
+
+    __slots__ = (
+        "id",
+        "filename",
+        "size",
+        "share_token",
+        "owner_email",
+        "is_public",
+        "available_from",
+        "available_to",
+        "created_at",
+        "shared_with",
+        "sha256",
+        "password",
+        "totp_enabled",
+        "totp_secret",
+        "status",
+    )
+
+    def __init__(
+        self,
+        id: str,
+        filename: str,
+        size: int,
+        share_token: str,
+        owner_email,
+        is_public: bool,
+        available_from,
+        available_to,
+        created_at: float,
+        shared_with,
+        sha256: str,
+        password=None,
+        totp_enabled: bool = False,
+        totp_secret=None,
+        status: str = "active",
+    ):
+        self.id = id
+        self.filename = filename
+        self.size = size
+        self.share_token = share_token
+        self.owner_email = sys.intern(owner_email) if owner_email else None
+        self.is_public = bool(is_public)
+        self.available_from = available_from
+        self.available_to = available_to
+        self.created_at = created_at
+        # most files are not shared with anyone: () is a singleton
+        self.shared_with = tuple(shared_with) if shared_with else ()
+        self.sha256 = sys.intern(sha256)
+        self.password = password
+        self.totp_enabled = bool(totp_enabled)
+        self.totp_secret = totp_secret
+        self.status = status
+
+    @property
+    def password_protected(self) -> bool:
+        return bool(self.password)
+
+    @property
+    def share_link(self) -> str:
+        return SHARE_LINK_BASE + self.share_token
+
+    def to_dict(self) -> dict:
+        # password and TOTP secret never leave the server
+        return {
+            "id": self.id,
+            "filename": self.filename,
+            "size": self.size,
+            "shareToken": self.share_token,
+            "ownerEmail": self.owner_email,
+            "isPublic": self.is_public,
+            "passwordProtected": self.password_protected,
+            "availableFrom": to_iso(self.available_from),
+            "availableTo": to_iso(self.available_to),
+            "sharedWith": list(self.shared_with),
+            "shareLink": self.share_link,
+            "createdAt": to_iso(self.created_at),
+            "totpEnabled": self.totp_enabled,
+            "sha256": self.sha256,
+            "status": self.status,
+        }
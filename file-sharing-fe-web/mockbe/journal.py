@@ -0,0 +1,186 @@
+import json
+import os
+import re
+import threading
+import time
+
+SEGMENT_PATTERN = re.compile(r"^journal-(\d+)\.log$")
+SNAPSHOT_PATTERN = re.compile(r"^snapshot-(\d+)\.json$")
+
+
+class Journal:
+    """
+    Append-only operation log with group commit, plus snapshots, so an
+    in-memory store survives restarts.
+
+    Files in `directory`:
+      journal-<first_seq>.log  one entry per line: [seq, op, args]
+      snapshot-<seq>.json      full store state after entry seq
+
+    append() only queues an entry; a flusher thread writes everything queued
+    with a single fsync, and wait_durable(seq) blocks until seq is on disk.
+    A snapshot starts a new segment, after which older segments and
+    snapshots are deleted, so recovery reads the newest snapshot plus the
+    entries written since.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        group_commit_seconds: float = 0.002,
+        snapshot_interval_seconds: float = 300,
+        snapshot_min_entries: int = 10000,
+    ):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.group_commit_seconds = group_commit_seconds
+        self.snapshot_interval_seconds = snapshot_interval_seconds
+        self.snapshot_min_entries = snapshot_min_entries
+
+        # lock guards seq / pending / durable_seq; io_lock serializes writes
+        # to the segment file. Lock order is always io_lock -> lock.
+        self.lock = threading.Lock()
+        self.durable = threading.Condition(self.lock)
+        self.io_lock = threading.Lock()
+        self.seq = 0
+        self.durable_seq = 0
+        self.snapshot_seq = 0
+        self.pending = []
+        self.fh = None
+
+    def _files(self, pattern):
+        found = []
+        for name in os.listdir(self.directory):
+            match = pattern.match(name)
+            if match:
+                found.append((int(match.group(1)), os.path.join(self.directory, name)))
+        return sorted(found)
+
+    def load(self):
+        """
+        Read what is on disk. Returns (snapshot_state or None, entries) where
+        entries is a list of (op, args) written after the snapshot, in order.
+        Call once, before open().
+        """
+        state = None
+        for seq, path in reversed(self._files(SNAPSHOT_PATTERN)):
+            try:
+                with open(path, encoding="utf-8") as fh:
+                    state = json.load(fh)
+            except ValueError:
+                continue  # unfinished snapshot, fall back to an older one
+            self.snapshot_seq = seq
+            break
+
+        entries = []
+        last_seq = self.snapshot_seq
+        for _, path in self._files(SEGMENT_PATTERN):
+            with open(path, encoding="utf-8") as fh:
+                for line in fh:
+                    try:
+                        seq, op, args = json.loads(line)
+                    except ValueError:
+                        break  # torn write at the tail of a segment
+                    if seq > last_seq:
+                        entries.append((op, args))
+                        last_seq = seq
+        self.seq = self.durable_seq = last_seq
+        return state, entries
+
+    def open(self):
+        """
+        Start a fresh segment after the recovered entries and the flusher.
+        """
+        self.fh = self._open_segment(self.seq + 1)
+        thread = threading.Thread(target=self._run_flusher, name="journal-flusher", daemon=True)
+        thread.start()
+        return thread
+
+    def _open_segment(self, first_seq: int):
+        path = os.path.join(self.directory, f"journal-{first_seq:012d}.log")
+        return open(path, "a", encoding="utf-8")
+
+    def append(self, op: str, *args) -> int:
+        """
+        Queue one entry and return its seq. Callers append while holding the
+        store's write lock so seq order matches the order changes were applied.
+        """
+        # serialize outside the lock, only the seq is spliced in under it
+        line = json.dumps([0, op, args], separators=(",", ":"))
+        with self.lock:
+            self.seq += 1
+            self.pending.append(f"[{self.seq}{line[2:]}\n")
+            if len(self.pending) == 1:
+                self.durable.notify_all()
+            return self.seq
+
+    def wait_durable(self, seq: int):
+        with self.lock:
+            while self.durable_seq < seq:
+                self.durable.wait()
+
+    def _write_pending(self):
+        # caller holds io_lock
+        with self.lock:
+            batch = self.pending
+            self.pending = []
+            last = self.seq
+        if batch:
+            self.fh.write("".join(batch))
+            self.fh.flush()
+            os.fsync(self.fh.fileno())
+        with self.lock:
+            self.durable_seq = max(self.durable_seq, last)
+            self.durable.notify_all()
+
+    def _run_flusher(self):
+        while True:
+            with self.lock:
+                while not self.pending:
+                    self.durable.wait()
+            # let concurrent writers join this commit
+            time.sleep(self.group_commit_seconds)
+            with self.io_lock:
+                self._write_pending()
+
+    def entries_since_snapshot(self) -> int:
+        return self.seq - self.snapshot_seq
+
+    def rotate(self) -> int:
+        """
+        Flush, close the current segment and start a new one. Returns the seq
+        a snapshot taken right now covers. Call with the store's write lock
+        held so nothing is appended meanwhile.
+        """
+        with self.io_lock:
+            self._write_pending()
+            self.fh.close()
+            seq = self.seq
+            self.fh = self._open_segment(seq + 1)
+        return seq
+
+    def write_snapshot(self, seq: int, state: dict):
+        """
+        Durably write the state as of seq, then drop the snapshots and
+        segments it makes redundant.
+        """
+        path = os.path.join(self.directory, f"snapshot-{seq:012d}.json")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump(state, fh, separators=(",", ":"))
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp_path, path)
+        dir_fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+        self.snapshot_seq = seq
+
+        for old_seq, old_path in self._files(SNAPSHOT_PATTERN):
+            if old_seq < seq:
+                os.remove(old_path)
+        for first_seq, old_path in self._files(SEGMENT_PATTERN):
+            if first_seq <= seq:
+                os.remove(old_path)
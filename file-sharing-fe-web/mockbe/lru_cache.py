@@ -0,0 +1,58 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Thread-safe LRU map holding at most max_entries values. Each entry may
+    carry an expiry (epoch seconds) and is dropped once it passes, on top of
+    the cache-wide ttl_seconds if one is set.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # entries[key] = (value, expires_at | None), least recently used first
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, now: float = None):
+        if now is None:
+            now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at is not None and now >= expires_at:
+                del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, expires_at: float = None, now: float = None):
+        if self.max_entries <= 0:
+            return
+        if self.ttl_seconds is not None:
+            if now is None:
+                now = time.time()
+            ttl_expiry = now + self.ttl_seconds
+            expires_at = ttl_expiry if expires_at is None else min(expires_at, ttl_expiry)
+        with self.lock:
+            self.entries[key] = (value, expires_at)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self.entries)
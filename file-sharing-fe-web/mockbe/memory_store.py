@@ -0,0 +1,596 @@
+import copy
+import heapq
+import itertools
+import threading
+import time
+
+from file_record import FileRecord
+from metadata_store import MetadataStore, file_sort_key, status_at
+from sorted_index import SortedIndex
+
+# transitions only move forward: pending -> active -> expired
+STATUS_ORDER = {"pending": 0, "active": 1, "expired": 2}
+
+# granularity of the session expiry wheel
+SESSION_WHEEL_TICK_SECONDS = 1
+
+
+class MemoryStore(MetadataStore):
+    """
+    Process-local metadata backend: plain dicts plus the secondary indexes
+    that keep the hot paths of the API away from full scans.
+    Not shared between worker processes. Lost on restart unless a
+    journal.Journal is given: every mutation is then appended to it before
+    the call returns, and the state is recovered from it on construction.
+    """
+
+    def __init__(self, default_users: dict, default_policy: dict, journal=None):
+        super().__init__(default_users, default_policy)
+
+        # users[email] = { id, username, email, password, role, totp_enabled, totp_secret }
+        self.users = copy.deepcopy(self.default_users)
+        # sessions[token] = [email, expires_at | None, max_expires_at | None]
+        self.sessions = {}
+        # Timing wheel of session expiries: session_wheel[slot] = {token},
+        # slot = expiry // SESSION_WHEEL_TICK_SECONDS. Slots are swept in
+        # order up to now, so expiring costs O(1) per session, no dict scan.
+        # Renewals don't move a token; it is rescheduled when its old slot
+        # comes up and the session turns out to be still alive.
+        self.session_wheel = {}
+        self.session_wheel_slot = int(time.time() // SESSION_WHEEL_TICK_SECONDS)
+        # pending_logins[key] = (email, expires_at), expiry order in the heap
+        # pending_login_queue = [(expires_at, key)]. Not journaled: after a
+        # restart the user just logs in again.
+        self.pending_logins = {}
+        self.pending_login_queue = []
+        self.pending_lock = threading.Lock()
+        # download_tokens[token] = (file_id, expires_at), expiry order in
+        # download_token_queue = [(expires_at, token)], under pending_lock
+        self.download_tokens = {}
+        self.download_token_queue = []
+        # upload_sessions[upload_id] = session dict plus "received": set[int]
+        # and "inFlight": int. Not journaled, like pending logins.
+        self.upload_sessions = {}
+        self.upload_lock = threading.Lock()
+        self.policy = dict(self.default_policy)
+
+        # files[file_id] = FileRecord
+        self.files = {}
+        # files_by_share_token[share_token] = FileRecord, for the public share endpoints
+        self.files_by_share_token = {}
+        # files_by_owner[email] = { file_id: FileRecord }, so listing costs O(files owned)
+        self.files_by_owner = {}
+        # files_sorted_by_owner[email][status] = { "createdAt": SortedIndex, "fileName": SortedIndex }
+        # status None indexes all of the owner's files, "active" / "pending" /
+        # "expired" only files in that status, so status filters page
+        # directly instead of walking past files in other statuses
+        self.files_sorted_by_owner = {}
+        # owner_summaries[email] = { "active", "pending", "expired", "deleted" }
+        self.owner_summaries = {}
+
+        # Status is stored on each record and moved forward by a min-heap of
+        # upcoming transitions: [(due_epoch, file_id, new_status)]
+        self.status_transitions = []
+        self.status_lock = threading.RLock()
+        self.status_wakeup = threading.Event()
+
+        # Expiry order for cleanup: [(available_to, file_id)], entries of
+        # files deleted in the meantime are skipped when they surface
+        self.expiry_queue = []
+
+        # Held while a mutation is applied and journaled, so journal order is
+        # apply order and a snapshot sees a consistent state.
+        self.write_lock = threading.RLock()
+        self.journal = None
+        if journal is not None:
+            self.recover(journal)
+            self.journal = journal
+            journal.open()
+
+    def _log(self, op: str, *args):
+        # caller holds write_lock; returns what _sync() waits on
+        if self.journal is None:
+            return None
+        return self.journal.append(op, *args)
+
+    def _sync(self, seq):
+        if seq is not None:
+            self.journal.wait_durable(seq)
+
+    def recover(self, journal):
+        """
+        Rebuild the state from the newest snapshot and replay the journal
+        entries written after it.
+        """
+        state, entries = journal.load()
+        if state is not None:
+            self.users = state["users"]
+            for token, (email, expires_at, max_expires_at) in state["sessions"].items():
+                self.create_session(token, email, expires_at, max_expires_at)
+            self.policy = state["policy"]
+            for row in state["files"]:
+                self.add_file(FileRecord(*row))
+            for owner_email, deleted in state["deleted"].items():
+                self.count_status(owner_email, "deleted", deleted)
+        for op, args in entries:
+            if op == "remove_file":
+                record = self.files.get(args[0])
+                if record:
+                    self.remove_file(record)
+            elif op == "add_file":
+                self.add_file(FileRecord(*args[0]))
+            else:
+                getattr(self, op)(*args)
+
+    def snapshot(self):
+        """
+        Write a snapshot and truncate the journal behind it. State is copied
+        under the write lock; serializing and fsyncing happen outside it.
+        """
+        with self.write_lock:
+            seq = self.journal.rotate()
+            state = {
+                "users": {email: dict(user) for email, user in self.users.items()},
+                "sessions": {token: list(session) for token, session in self.sessions.items()},
+                "policy": dict(self.policy),
+                "files": [self.file_row(record) for record in self.files.values()],
+                "deleted": {
+                    owner_email: summary["deleted"]
+                    for owner_email, summary in self.owner_summaries.items()
+                    if summary["deleted"]
+                },
+            }
+        self.journal.write_snapshot(seq, state)
+        return seq
+
+    @staticmethod
+    def file_row(record) -> list:
+        # FileRecord(*row) rebuilds the record, __slots__ follow __init__ order
+        row = [getattr(record, name) for name in FileRecord.__slots__]
+        row[FileRecord.__slots__.index("shared_with")] = list(record.shared_with)
+        return row
+
+    def start(self):
+        if self.journal is not None:
+            self.start_snapshotter()
+
+        def run():
+            while True:
+                with self.status_lock:
+                    next_due = self.status_transitions[0][0] if self.status_transitions else None
+                timeout = 60 if next_due is None else max(0.0, next_due - time.time())
+                self.status_wakeup.wait(min(timeout, 60))
+                self.status_wakeup.clear()
+                self.advance_statuses()
+
+        thread = threading.Thread(target=run, name="file-status-scheduler", daemon=True)
+        thread.start()
+        return thread
+
+    def start_snapshotter(self):
+        journal = self.journal
+
+        def run():
+            while True:
+                time.sleep(journal.snapshot_interval_seconds)
+                if journal.entries_since_snapshot() >= journal.snapshot_min_entries:
+                    self.snapshot()
+
+        thread = threading.Thread(target=run, name="journal-snapshotter", daemon=True)
+        thread.start()
+        return thread
+
+    # users
+    def get_user(self, email: str):
+        return self.users.get(email)
+
+    def add_user(self, user: dict) -> bool:
+        with self.write_lock:
+            if user["email"] in self.users:
+                return False
+            self.users[user["email"]] = user
+            seq = self._log("add_user", user)
+        self._sync(seq)
+        return True
+
+    def save_user(self, user: dict):
+        with self.write_lock:
+            self.users[user["email"]] = user
+            seq = self._log("save_user", user)
+        self._sync(seq)
+
+    # sessions
+    def _schedule_session(self, token: str, expires_at):
+        # caller holds write_lock
+        if expires_at is None:
+            return
+        # swept once the whole slot lies in the past
+        slot = max(int(expires_at // SESSION_WHEEL_TICK_SECONDS) + 1, self.session_wheel_slot)
+        self.session_wheel.setdefault(slot, set()).add(token)
+
+    def create_session(self, token: str, email: str, expires_at: float = None, max_expires_at: float = None):
+        with self.write_lock:
+            self.sessions[token] = [email, expires_at, max_expires_at]
+            self._schedule_session(token, expires_at)
+            seq = self._log("create_session", token, email, expires_at, max_expires_at)
+        self._sync(seq)
+
+    def get_session(self, token: str, now: float = None):
+        session = self.sessions.get(token)
+        if session is None:
+            return None
+        email, expires_at, max_expires_at = session
+        if expires_at is not None and expires_at <= (time.time() if now is None else now):
+            return None  # removed by the next expire_sessions()
+        return {"email": email, "expiresAt": expires_at, "maxExpiresAt": max_expires_at}
+
+    def renew_session(self, token: str, expires_at: float):
+        with self.write_lock:
+            session = self.sessions.get(token)
+            if session is None:
+                return
+            session[1] = expires_at
+            seq = self._log("renew_session", token, expires_at)
+        self._sync(seq)
+
+    def delete_session(self, token: str):
+        with self.write_lock:
+            if self.sessions.pop(token, None) is None:
+                return
+            seq = self._log("delete_session", token)
+        self._sync(seq)
+
+    def expire_sessions(self, now: float = None) -> int:
+        """
+        Drop sessions whose expiry has passed by sweeping the wheel slots up
+        to now. Not journaled: replaying the journal reaches the same
+        expiries.
+        """
+        if now is None:
+            now = time.time()
+        now_slot = int(now // SESSION_WHEEL_TICK_SECONDS)
+        removed = 0
+        with self.write_lock:
+            while self.session_wheel_slot <= now_slot:
+                tokens = self.session_wheel.pop(self.session_wheel_slot, ())
+                self.session_wheel_slot += 1
+                for token in tokens:
+                    session = self.sessions.get(token)
+                    if session is None:
+                        continue
+                    if session[1] <= now:
+                        del self.sessions[token]
+                        removed += 1
+                    else:
+                        self._schedule_session(token, session[1])
+        return removed
+
+    def session_count(self) -> int:
+        return len(self.sessions)
+
+    def _pop_pending_login(self) -> int:
+        # caller holds pending_lock; entries deleted or replaced since they
+        # were queued are skipped
+        expires_at, key = heapq.heappop(self.pending_login_queue)
+        pending = self.pending_logins.get(key)
+        if pending is None or pending[1] != expires_at:
+            return 0
+        del self.pending_logins[key]
+        return 1
+
+    def put_pending_login(self, key: str, email: str, expires_at: float, max_entries: int):
+        with self.pending_lock:
+            self.pending_logins[key] = (email, expires_at)
+            heapq.heappush(self.pending_login_queue, (expires_at, key))
+            while len(self.pending_logins) > max_entries:
+                self._pop_pending_login()
+            if len(self.pending_login_queue) > 2 * max_entries:
+                # mostly logins completed before they expired
+                self.pending_login_queue = [(exp, k) for k, (_, exp) in self.pending_logins.items()]
+                heapq.heapify(self.pending_login_queue)
+
+    def get_pending_login(self, key: str, now: float = None):
+        pending = self.pending_logins.get(key)
+        if pending is None or pending[1] <= (time.time() if now is None else now):
+            return None
+        return pending[0]
+
+    def delete_pending_login(self, key: str):
+        with self.pending_lock:
+            self.pending_logins.pop(key, None)
+
+    def expire_pending_logins(self, now: float = None) -> int:
+        if now is None:
+            now = time.time()
+        removed = 0
+        with self.pending_lock:
+            queue = self.pending_login_queue
+            while queue and queue[0][0] <= now:
+                removed += self._pop_pending_login()
+        return removed
+
+    def put_download_token(self, token: str, file_id: str, expires_at: float):
+        with self.pending_lock:
+            self.download_tokens[token] = (file_id, expires_at)
+            heapq.heappush(self.download_token_queue, (expires_at, token))
+
+    def get_download_token(self, token: str, now: float = None):
+        grant = self.download_tokens.get(token)
+        if grant is None or grant[1] <= (time.time() if now is None else now):
+            return None
+        return grant[0]
+
+    def expire_download_tokens(self, now: float = None) -> int:
+        if now is None:
+            now = time.time()
+        removed = 0
+        with self.pending_lock:
+            queue = self.download_token_queue
+            while queue and queue[0][0] <= now:
+                _, token = heapq.heappop(queue)
+                if self.download_tokens.pop(token, None) is not None:
+                    removed += 1
+        return removed
+
+    # upload sessions
+    @staticmethod
+    def _upload_state(session: dict) -> dict:
+        # caller holds upload_lock; callers get a copy they can read unlocked
+        return dict(session, received=set(session["received"]))
+
+    def create_upload_session(self, session: dict):
+        with self.upload_lock:
+            self.upload_sessions[session["id"]] = dict(session, received=set(), inFlight=0)
+
+    def get_upload_session(self, upload_id: str, now: float = None):
+        with self.upload_lock:
+            session = self.upload_sessions.get(upload_id)
+            if session is None or session["expiresAt"] <= (time.time() if now is None else now):
+                return None
+            return self._upload_state(session)
+
+    def begin_chunk(self, upload_id: str, index: int) -> bool:
+        with self.upload_lock:
+            session = self.upload_sessions.get(upload_id)
+            if session is None:
+                return False
+            session["inFlight"] += 1
+            session["received"].discard(index)
+            return True
+
+    def end_chunk(self, upload_id: str, index: int, received: bool, expires_at: float):
+        with self.upload_lock:
+            session = self.upload_sessions.get(upload_id)
+            if session is None:
+                return None
+            session["inFlight"] -= 1
+            if received:
+                session["received"].add(index)
+                session["expiresAt"] = expires_at
+            return len(session["received"])
+
+    def take_upload_session(self, upload_id: str):
+        with self.upload_lock:
+            session = self.upload_sessions.get(upload_id)
+            if session is None:
+                return False, None
+            if session["inFlight"] or len(session["received"]) < session["totalChunks"]:
+                return False, self._upload_state(session)
+            del self.upload_sessions[upload_id]
+            return True, session
+
+    def restore_upload_session(self, session: dict):
+        with self.upload_lock:
+            self.upload_sessions[session["id"]] = dict(session, received=set(session["received"]), inFlight=0)
+
+    def delete_upload_session(self, upload_id: str) -> bool:
+        with self.upload_lock:
+            return self.upload_sessions.pop(upload_id, None) is not None
+
+    def pop_expired_upload_sessions(self, now: float = None) -> list:
+        if now is None:
+            now = time.time()
+        with self.upload_lock:
+            # open uploads are few, a scan is fine
+            expired = [s for s in self.upload_sessions.values() if s["expiresAt"] <= now]
+            for session in expired:
+                del self.upload_sessions[session["id"]]
+        return expired
+
+    # files
+    def count_status(self, owner_email, status: str, delta: int):
+        if owner_email:
+            summary = self.owner_summaries.setdefault(
+                owner_email, {"active": 0, "pending": 0, "expired": 0, "deleted": 0}
+            )
+            summary[status] += delta
+
+    def schedule_status(self, record):
+        """
+        Set the initial status of a new record and queue its future transitions.
+        """
+        record.status = status_at(record, time.time())
+        wake = False
+        if record.status == "pending":
+            heapq.heappush(self.status_transitions, (record.available_from, record.id, "active"))
+            wake = True
+        if record.available_to is not None and record.status != "expired":
+            heapq.heappush(self.status_transitions, (record.available_to, record.id, "expired"))
+            wake = True
+        if wake:
+            self.status_wakeup.set()
+
+    def advance_statuses(self, now: float = None) -> int:
+        """
+        Apply every transition that is due. Cost is O(k log n) for k due
+        transitions; entries of deleted files are dropped when they surface.
+        """
+        if now is None:
+            now = time.time()
+        transitions = self.status_transitions
+        if not transitions or transitions[0][0] > now:
+            return 0  # nothing due, skip the locks
+        applied = 0
+        # write_lock too: records move between the per-status owner indexes
+        with self.write_lock, self.status_lock:
+            while transitions and transitions[0][0] <= now:
+                _, file_id, new_status = heapq.heappop(transitions)
+                record = self.files.get(file_id)
+                if not record:
+                    continue
+                if STATUS_ORDER[new_status] > STATUS_ORDER[record.status]:
+                    self.count_status(record.owner_email, record.status, -1)
+                    self.count_status(record.owner_email, new_status, 1)
+                    if record.owner_email:
+                        self._unindex_owner_file(record, record.status)
+                        self._index_owner_file(record, new_status)
+                    record.status = new_status
+                    applied += 1
+        return applied
+
+    def _index_owner_file(self, record, status):
+        # caller holds write_lock
+        sorted_ids = self.files_sorted_by_owner.setdefault(record.owner_email, {}).setdefault(
+            status, {"createdAt": SortedIndex(), "fileName": SortedIndex()}
+        )
+        for sort_key, index in sorted_ids.items():
+            index.insert(file_sort_key(record, sort_key), record.id)
+
+    def _unindex_owner_file(self, record, status):
+        # caller holds write_lock
+        owner_indexes = self.files_sorted_by_owner.get(record.owner_email)
+        sorted_ids = owner_indexes.get(status) if owner_indexes else None
+        if sorted_ids is None:
+            return
+        for index in sorted_ids.values():
+            index.remove(record.id)
+        if not sorted_ids["createdAt"]:
+            del owner_indexes[status]
+            if not owner_indexes:
+                del self.files_sorted_by_owner[record.owner_email]
+
+    def add_file(self, record):
+        with self.write_lock:
+            with self.status_lock:
+                self.schedule_status(record)
+                self.files[record.id] = record
+                self.files_by_share_token[record.share_token] = record
+                self.count_status(record.owner_email, record.status, 1)
+                if record.available_to is not None:
+                    heapq.heappush(self.expiry_queue, (record.available_to, record.id))
+            owner_email = record.owner_email
+            if owner_email:
+                self.files_by_owner.setdefault(owner_email, {})[record.id] = record
+                self._index_owner_file(record, None)
+                self._index_owner_file(record, record.status)
+            seq = self._log("add_file", self.file_row(record))
+        self._sync(seq)
+
+    def remove_file(self, record) -> bool:
+        with self.write_lock:
+            if not self._remove_file(record):
+                return False
+            seq = self._log("remove_file", record.id)
+        self._sync(seq)
+        return True
+
+    def pop_expired(self, now: float, limit: int) -> list:
+        with self.write_lock:
+            removed = []
+            seq = None
+            while self.expiry_queue and len(removed) < limit and self.expiry_queue[0][0] < now:
+                _, file_id = heapq.heappop(self.expiry_queue)
+                record = self.files.get(file_id)
+                if record is None or not self._remove_file(record):
+                    continue
+                removed.append(record)
+                seq = self._log("remove_file", record.id)
+        self._sync(seq)
+        return removed
+
+    def oldest_expiry(self):
+        with self.write_lock:
+            while self.expiry_queue and self.expiry_queue[0][1] not in self.files:
+                heapq.heappop(self.expiry_queue)
+            return self.expiry_queue[0][0] if self.expiry_queue else None
+
+    def _remove_file(self, record) -> bool:
+        # caller holds write_lock. Indexes go before the record, so an id
+        # found in an index always has its record.
+        if record.id not in self.files:
+            return False
+        owner_files = self.files_by_owner.get(record.owner_email)
+        if owner_files is not None:
+            owner_files.pop(record.id, None)
+            if not owner_files:
+                del self.files_by_owner[record.owner_email]
+        if record.owner_email:
+            self._unindex_owner_file(record, record.status)
+            self._unindex_owner_file(record, None)
+        with self.status_lock:
+            self.files.pop(record.id, None)
+            self.files_by_share_token.pop(record.share_token, None)
+            self.count_status(record.owner_email, record.status, -1)
+            self.count_status(record.owner_email, "deleted", 1)
+        return True
+
+    def share_tokens(self):
+        return list(self.files_by_share_token)
+
+    def get_file(self, file_id: str):
+        self.advance_statuses()
+        return self.files.get(file_id)
+
+    def get_file_by_share_token(self, share_token: str):
+        self.advance_statuses()
+        return self.files_by_share_token.get(share_token)
+
+    def list_owner_files(
+        self,
+        owner_email: str,
+        sort_key: str,
+        reverse: bool,
+        status: str = None,
+        offset: int = 0,
+        limit: int = 20,
+        after: tuple = None,
+    ) -> list:
+        self.advance_statuses()
+        if limit <= 0 or offset < 0:
+            return []
+        # the indexes are lists that add_file / remove_file shift around,
+        # walking one while it changes would skip or repeat entries
+        with self.write_lock:
+            owner_files = self.files_by_owner.get(owner_email, {})
+            sorted_ids = self.files_sorted_by_owner.get(owner_email, {}).get(status, {}).get(sort_key)
+            if sorted_ids is None:
+                return []
+            if after is None:
+                # Page straight out of the sorted index
+                file_ids = sorted_ids.page(offset, limit, reverse)
+            else:
+                # Continue from the cursor position
+                file_ids = itertools.islice(sorted_ids.iter_ids(reverse, after), limit)
+            return [owner_files[file_id] for file_id in file_ids]
+
+    def owner_summary(self, owner_email: str) -> dict:
+        self.advance_statuses()
+        return dict(
+            self.owner_summaries.get(
+                owner_email, {"active": 0, "pending": 0, "expired": 0, "deleted": 0}
+            )
+        )
+
+    def file_count(self) -> int:
+        return len(self.files)
+
+    # policy
+    def get_policy(self) -> dict:
+        return self.policy
+
+    def update_policy(self, changes: dict) -> dict:
+        with self.write_lock:
+            self.policy.update(changes)
+            seq = self._log("update_policy", changes)
+        self._sync(seq)
+        return self.policy
@@ -0,0 +1,261 @@
+import copy
+
+STATUSES = ("pending", "active", "expired")
+
+
+def status_at(record, now: float) -> str:
+    """
+    Status of a FileRecord at epoch time `now` (pending / active / expired).
+    """
+    if record.available_to is not None and now > record.available_to:
+        return "expired"
+    if record.available_from is not None and now < record.available_from:
+        return "pending"
+    return "active"
+
+
+def next_status_change(record):
+    """
+    Epoch time at which the record's status next changes, or None if it
+    never will again.
+    """
+    if record.status == "pending":
+        return record.available_from
+    if record.status == "active":
+        return record.available_to
+    return None
+
+
+def file_sort_key(record, sort_key: str):
+    """
+    Key a record is ordered by for /api/files/my. The file name collation
+    key is computed here once, when the record is indexed.
+    """
+    if sort_key == "fileName":
+        return record.filename.lower()
+    return record.created_at
+
+
+class MetadataStore:
+    """
+    Interface shared by the metadata backends (memory_store.MemoryStore,
+    sqlite_store.SQLiteStore). Users are plain dicts, files are FileRecord.
+    Callers that change a user dict must hand it back through save_user().
+    Everything a request may need on another worker lives here, so with a
+    shared backend any worker can serve any request.
+    """
+
+    def __init__(self, default_users: dict, default_policy: dict):
+        self.default_users = copy.deepcopy(default_users)
+        self.default_policy = dict(default_policy)
+
+    def start(self):
+        """
+        Start background work owned by the backend, if any.
+        """
+
+    # users
+    def get_user(self, email: str):
+        raise NotImplementedError
+
+    def add_user(self, user: dict) -> bool:
+        """
+        Insert a new user; False if the email is already registered.
+        """
+        raise NotImplementedError
+
+    def save_user(self, user: dict):
+        raise NotImplementedError
+
+    # sessions
+    def create_session(self, token: str, email: str, expires_at: float = None, max_expires_at: float = None):
+        """
+        expires_at is the idle deadline, pushed forward by renew_session()
+        but never past max_expires_at. None means the session never expires.
+        """
+        raise NotImplementedError
+
+    def get_session(self, token: str, now: float = None):
+        """
+        { "email", "expiresAt", "maxExpiresAt" } of a live session, or None
+        if it does not exist or has expired.
+        """
+        raise NotImplementedError
+
+    def renew_session(self, token: str, expires_at: float):
+        raise NotImplementedError
+
+    def delete_session(self, token: str):
+        raise NotImplementedError
+
+    def expire_sessions(self, now: float = None) -> int:
+        """
+        Remove expired sessions without scanning all of them. Returns how
+        many were removed.
+        """
+        raise NotImplementedError
+
+    def session_count(self) -> int:
+        raise NotImplementedError
+
+    # logins whose password checked out, waiting for the TOTP code
+    def put_pending_login(self, key: str, email: str, expires_at: float, max_entries: int):
+        """
+        Keep a pending login until expires_at. Past max_entries the oldest
+        pending logins are dropped to make room.
+        """
+        raise NotImplementedError
+
+    def get_pending_login(self, key: str, now: float = None):
+        """
+        Email of the live pending login stored under key, or None.
+        """
+        raise NotImplementedError
+
+    def delete_pending_login(self, key: str):
+        raise NotImplementedError
+
+    def expire_pending_logins(self, now: float = None) -> int:
+        """
+        Remove expired pending logins without scanning all of them. Returns
+        how many were removed.
+        """
+        raise NotImplementedError
+
+    # download tokens issued after a file's TOTP code checked out
+    def put_download_token(self, token: str, file_id: str, expires_at: float):
+        raise NotImplementedError
+
+    def get_download_token(self, token: str, now: float = None):
+        """
+        File id the live download token was issued for, or None.
+        """
+        raise NotImplementedError
+
+    def expire_download_tokens(self, now: float = None) -> int:
+        raise NotImplementedError
+
+    # resumable chunked uploads
+    def create_upload_session(self, session: dict):
+        """
+        session = { "id", "ownerEmail", "filename", "size", "chunkSize",
+        "totalChunks", "options", "dir", "dataPath", "expiresAt" }, options
+        must be JSON serializable. It starts with no chunks received.
+        """
+        raise NotImplementedError
+
+    def get_upload_session(self, upload_id: str, now: float = None):
+        """
+        Copy of a live upload session with "received" (set of chunk indexes)
+        and "inFlight" (chunks being written) added, or None.
+        """
+        raise NotImplementedError
+
+    def begin_chunk(self, upload_id: str, index: int) -> bool:
+        """
+        Count a chunk write as in flight and forget any earlier copy of the
+        chunk. False if the session is gone.
+        """
+        raise NotImplementedError
+
+    def end_chunk(self, upload_id: str, index: int, received: bool, expires_at: float):
+        """
+        Finish a chunk write started by begin_chunk(). If received, mark the
+        chunk received and push the session expiry to expires_at. Returns
+        the number of chunks received so far, or None if the session is gone.
+        """
+        raise NotImplementedError
+
+    def take_upload_session(self, upload_id: str):
+        """
+        Remove a session once every chunk is received and none is in
+        flight. Returns (taken, session): session is None if it does not
+        exist, otherwise its state as get_upload_session() returns it.
+        """
+        raise NotImplementedError
+
+    def restore_upload_session(self, session: dict):
+        """
+        Put back a session removed by take_upload_session(), with the chunks
+        it had received, e.g. when the assembled file fails its checksum.
+        """
+        raise NotImplementedError
+
+    def delete_upload_session(self, upload_id: str) -> bool:
+        raise NotImplementedError
+
+    def pop_expired_upload_sessions(self, now: float = None) -> list:
+        """
+        Remove expired upload sessions and return them, so their partial
+        data can be deleted.
+        """
+        raise NotImplementedError
+
+    # files
+    def add_file(self, record):
+        raise NotImplementedError
+
+    def remove_file(self, record) -> bool:
+        """
+        Delete a file record; False if it was already gone.
+        """
+        raise NotImplementedError
+
+    def pop_expired(self, now: float, limit: int) -> list:
+        """
+        Delete up to `limit` files whose availableTo is before `now`, oldest
+        expiry first, and return their records. Found through an expiry
+        index, never a scan of all files.
+        """
+        raise NotImplementedError
+
+    def oldest_expiry(self):
+        """
+        Earliest availableTo among stored files (epoch), or None.
+        """
+        raise NotImplementedError
+
+    def share_tokens(self):
+        """
+        Iterate over the share tokens of all stored files.
+        """
+        raise NotImplementedError
+
+    def get_file(self, file_id: str):
+        raise NotImplementedError
+
+    def get_file_by_share_token(self, share_token: str):
+        raise NotImplementedError
+
+    def list_owner_files(
+        self,
+        owner_email: str,
+        sort_key: str,
+        reverse: bool,
+        status: str = None,
+        offset: int = 0,
+        limit: int = 20,
+        after: tuple = None,
+    ) -> list:
+        """
+        One page of an owner's files ordered by (file_sort_key, id).
+        status filters to one status; after=(key, id) starts just past that
+        position (keyset pagination) and then offset is ignored.
+        """
+        raise NotImplementedError
+
+    def owner_summary(self, owner_email: str) -> dict:
+        """
+        { "active", "pending", "expired", "deleted" } counts for one owner.
+        """
+        raise NotImplementedError
+
+    def file_count(self) -> int:
+        raise NotImplementedError
+
+    # policy
+    def get_policy(self) -> dict:
+        raise NotImplementedError
+
+    def update_policy(self, changes: dict) -> dict:
+        raise NotImplementedError
@@ -0,0 +1,96 @@
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+PREFIX = "scrypt"
+
+
+class HasherBusy(Exception):
+    """
+    Raised instead of queueing when max_pending hashes are already waiting.
+    """
+
+
+class PasswordHasher:
+    """
+    scrypt password hashes computed on a bounded thread pool. hashlib.scrypt
+    releases the GIL, so request threads waiting on a hash don't hold up the
+    rest of the process, and `workers` caps how many cores hashing can take
+    however many logins arrive at once. At most max_pending hashes are queued
+    or running; past that HasherBusy is raised straight away, so a login
+    burst is turned away early rather than tying up request threads.
+
+    Stored format: scrypt$<n>$<r>$<p>$<salt>$<hash> (base64url). Any other
+    stored value is a plain-text password from before hashing.
+    """
+
+    def __init__(self, n: int = 2**14, r: int = 8, p: int = 1, workers: int = 2, max_pending: int = 64):
+        self.n = n
+        self.r = r
+        self.p = p
+        self.workers = workers
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self.slots = threading.BoundedSemaphore(max_pending)
+        # stands in for the stored hash of accounts that don't exist
+        self._dummy = self._hash(secrets.token_urlsafe(16))
+
+    def _run(self, fn, *args):
+        if not self.slots.acquire(blocking=False):
+            raise HasherBusy()
+        try:
+            future = self.pool.submit(fn, *args)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        return future.result()
+
+    @staticmethod
+    def _derive(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+        # scrypt needs 128 * r * (n + p + 2) bytes, leave some headroom
+        maxmem = 128 * r * (n + p + 2) + 1024 * 1024
+        return hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p, maxmem=maxmem, dklen=32)
+
+    def _hash(self, password: str) -> str:
+        salt = os.urandom(16)
+        digest = self._derive(password, salt, self.n, self.r, self.p)
+        encoded = (base64.urlsafe_b64encode(part).decode("ascii") for part in (salt, digest))
+        return "$".join((PREFIX, str(self.n), str(self.r), str(self.p), *encoded))
+
+    def _verify(self, password: str, stored: str) -> tuple:
+        _, n, r, p, salt, digest = stored.split("$")
+        params = (int(n), int(r), int(p))
+        derived = self._derive(password, base64.urlsafe_b64decode(salt), *params)
+        if not hmac.compare_digest(derived, base64.urlsafe_b64decode(digest)):
+            return False, None
+        if params != (self.n, self.r, self.p):
+            return True, self._hash(password)
+        return True, None
+
+    def hash(self, password: str) -> str:
+        return self._run(self._hash, password)
+
+    def verify(self, password: str, stored: str) -> tuple:
+        """
+        Check password against a stored value. Returns (matches, upgraded):
+        upgraded is a fresh hash to store in place of a plain-text password
+        or a hash made with other cost parameters, otherwise None.
+        """
+        if not stored.startswith(PREFIX + "$"):
+            if not hmac.compare_digest(password.encode("utf-8"), stored.encode("utf-8")):
+                return False, None
+            return True, self.hash(password)
+        return self._run(self._verify, password, stored)
+
+    def verify_dummy(self, password: str) -> bool:
+        """
+        Do the work of a failed verify() against a random hash, for logins
+        to unknown accounts, so response times don't reveal which emails
+        are registered. Always False.
+        """
+        self._run(self._verify, password, self._dummy)
+        return False
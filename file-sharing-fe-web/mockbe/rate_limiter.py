@@ -0,0 +1,51 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenBucketLimiter:
+    """
+    Token buckets keyed by arbitrary strings (an email, a client IP): each key
+    may spend `burst` requests at once and regains `rate` per second.
+
+    Buckets live in `shards` LRU maps of at most max_keys / shards entries,
+    each with its own lock, so memory stays fixed however many distinct
+    keys arrive and concurrent requests rarely contend. An evicted key
+    simply starts again with a full bucket; the least recently seen keys
+    are the ones evicted, so a key being hammered stays put.
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 100000, shards: int = 16):
+        self.rate = rate
+        self.burst = burst
+        self.shard_size = max(1, max_keys // shards)
+        # shards[i][key] = [tokens, updated_at], least recently used first
+        self.shards = [OrderedDict() for _ in range(shards)]
+        self.locks = [threading.Lock() for _ in range(shards)]
+
+    def acquire(self, key: str, now: float = None) -> float:
+        """
+        Take one token for key. Returns 0 if allowed, otherwise the seconds
+        until a token will be available (nothing is taken).
+        """
+        if now is None:
+            now = time.monotonic()
+        index = hash(key) % len(self.shards)
+        buckets = self.shards[index]
+        with self.locks[index]:
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = [self.burst, now]
+                if len(buckets) > self.shard_size:
+                    buckets.popitem(last=False)
+            else:
+                buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0.0
+            return (1 - bucket[0]) / self.rate
+
+    def __len__(self) -> int:
+        return sum(len(buckets) for buckets in self.shards)
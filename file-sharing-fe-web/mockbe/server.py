@@ -1,10 +1,38 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
 
 from datetime import datetime, timezone
+import hashlib
+import hmac
+import json
+import mimetypes
+import secrets
+import os
+import shutil
+import tempfile
+import threading
+import time
 import uuid
 import base64
+from werkzeug.datastructures import MultiDict
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NEED_DATA
 from werkzeug.utils import secure_filename
+from werkzeug.wsgi import wrap_file
+
+from blobstore import BlobStore
+from bloom_filter import CountingBloomFilter
+from expiry_sweeper import ExpirySweeper
+from file_record import FileRecord, to_iso
+from journal import Journal
+from lru_cache import LRUCache
+from memory_store import MemoryStore
+from metadata_store import file_sort_key, next_status_change
+from password_hashing import HasherBusy, PasswordHasher
+from rate_limiter import TokenBucketLimiter
+from signed_tokens import sign_token, verify_token
+from sqlite_store import SQLiteStore
+from totp import TOTPVerifier, generate_secret, provisioning_uri
 
 app = Flask(__name__)
 
@@ -17,14 +45,14 @@ CORS(
 
 # Mock "database"
 
-# Users stored in memory:
-# users[email] = {
+# Seed users, loaded into the metadata store (see `store` below):
+# DEFAULT_USERS[email] = {
 #   "email": str,
-#   "password": str,
+#   "password": str,  # scrypt hash, or plain text until the first login
 #   "totp_enabled": bool,
 #   "totp_secret": str | None,
 # }
-users = {
+DEFAULT_USERS = {
     "jitensha@hcmut.edu.vn": {
         "id": str(uuid.uuid4()),
         "username": "jitensha",
@@ -41,7 +69,8 @@ users = {
         "password": "eenose@123",
         "role": "user",
         "totp_enabled": True,
-        "totp_secret": None,
+        # RFC 4648 test secret, add it to an authenticator app to log in
+        "totp_secret": "JBSWY3DPEHPK3PXP",
     },
     "bigbluewhale@hcmut.edu.vn": {
         "id": str(uuid.uuid4()),
@@ -54,21 +83,201 @@ users = {
     },
 }
 
-# Active sessions:
-# sessions[token] = email
-sessions = {}
+# Upload policy, editable through /api/admin/policy
+DEFAULT_POLICY = {
+    "id": 1,
+    "maxFileSizeMB": 50,
+    "minValidityHours": 1,
+    "maxValidityDays": 30,
+    "defaultValidityDays": 7,
+    "requirePasswordMinLength": 6,
+}
+
+# Uploads are read from the request stream in chunks of this size and spooled
+# to disk, so memory per upload does not depend on the file size.
+UPLOAD_CHUNK_SIZE = 64 * 1024
+STORAGE_DIR = os.environ.get(
+    "MOCKBE_STORAGE_DIR", os.path.join(tempfile.gettempdir(), "mockbe-storage")
+)
+SPOOL_DIR = os.path.join(STORAGE_DIR, "spool")
+os.makedirs(SPOOL_DIR, exist_ok=True)
+
+# Users, sessions, file records and policy live in a metadata store:
+#   "memory" -> memory_store.MemoryStore, dicts in this process only
+#   "sqlite" -> sqlite_store.SQLiteStore on SQLITE_PATH (WAL mode), shared by
+#               every worker process, e.g. `gunicorn -w 4 server:app`
+# File records: store.get_file(file_id) -> FileRecord (see file_record.py)
+# Setting JOURNAL_DIR makes the memory backend durable: mutations are
+# journaled with group-commit fsync and snapshotted every
+# JOURNAL_SNAPSHOT_INTERVAL_SECONDS once JOURNAL_SNAPSHOT_MIN_ENTRIES piled up.
+METADATA_BACKEND = os.environ.get("METADATA_BACKEND", "memory").lower()
+SQLITE_PATH = os.environ.get("SQLITE_PATH", os.path.join(STORAGE_DIR, "metadata.db"))
+JOURNAL_DIR = os.environ.get("JOURNAL_DIR")
+# Login sessions and logins waiting for their TOTP code live in the metadata
+# store as well:
+# store.get_session(token) -> { "email", "expiresAt", "maxExpiresAt" }
+# store.get_pending_login(key) -> email
+# They are only shared across worker processes with METADATA_BACKEND=sqlite.
+# With the memory backend every worker has its own sessions, so run a single
+# worker or a token issued by one worker is refused by the others.
+if METADATA_BACKEND == "sqlite":
+    store = SQLiteStore(SQLITE_PATH, DEFAULT_USERS, DEFAULT_POLICY)
+elif JOURNAL_DIR:
+    journal = Journal(
+        JOURNAL_DIR,
+        group_commit_seconds=float(os.environ.get("JOURNAL_GROUP_COMMIT_SECONDS", 0.002)),
+        snapshot_interval_seconds=float(os.environ.get("JOURNAL_SNAPSHOT_INTERVAL_SECONDS", 300)),
+        snapshot_min_entries=int(os.environ.get("JOURNAL_SNAPSHOT_MIN_ENTRIES", 10000)),
+    )
+    store = MemoryStore(DEFAULT_USERS, DEFAULT_POLICY, journal=journal)
+else:
+    store = MemoryStore(DEFAULT_USERS, DEFAULT_POLICY)
+store.start()
+
+# RFC 6238 codes for user 2FA and TOTP-protected files. TOTP_DRIFT_STEPS
+# 30 second steps either side of now are accepted, each code only once per
+# user or file. With SQLite the accepted steps are recorded in the database,
+# so a code used on one worker is refused by the others.
+totp_verifier = TOTPVerifier(
+    drift_steps=int(os.environ.get("TOTP_DRIFT_STEPS", 1)),
+    max_secrets=int(os.environ.get("TOTP_CODE_CACHE_SIZE", 10000)),
+    max_scopes=int(os.environ.get("TOTP_REPLAY_CACHE_SIZE", 100000)),
+    claim_step=store.claim_totp_step if METADATA_BACKEND == "sqlite" else None,
+)
+TOTP_ISSUER = os.environ.get("TOTP_ISSUER", "File Sharing")
 
-# Temp sessions waiting for TOTP:
-# totp_temp_sessions[temp_token] = email
-totp_temp_sessions = {}
+# File bytes, deduplicated by SHA-256. FileRecord.sha256 points here. With a
+# shared metadata store the reference counts come from the file records.
+blob_store = BlobStore(
+    os.path.join(STORAGE_DIR, "blobs"),
+    count_refs=store.count_refs if METADATA_BACKEND == "sqlite" else None,
+)
+if METADATA_BACKEND != "sqlite":
+    # reference counts are not persisted, recount them from recovered records
+    blob_store.restore_refs(record.sha256 for record in store.files.values())
+blob_store.start_reaper(float(os.environ.get("BLOB_REAP_INTERVAL_SECONDS", 60)))
+
+# Counting Bloom filter over live share tokens, so share endpoints can answer
+# 404 for random tokens (bots scanning for links) without an index probe.
+# Off unless SHARE_TOKEN_FILTER=on. Each process builds its own filter at
+# startup and only adds the uploads it handles itself, so only turn it on
+# when a single process serves the API (e.g. SQLite behind one worker);
+# with several workers, links uploaded through another worker would 404.
+# With the memory backend a miss is a dict lookup, cheaper than the filter.
+SHARE_TOKEN_FILTER = os.environ.get("SHARE_TOKEN_FILTER", "off").lower() in ("1", "true", "yes", "on")
+SHARE_TOKEN_FILTER_CAPACITY = int(os.environ.get("SHARE_TOKEN_FILTER_CAPACITY", 1_000_000))
+share_token_filter = None
+if SHARE_TOKEN_FILTER:
+    live_tokens = list(store.share_tokens())
+    share_token_filter = CountingBloomFilter(max(SHARE_TOKEN_FILTER_CAPACITY, 2 * len(live_tokens)))
+    for live_token in live_tokens:
+        share_token_filter.add(live_token)
+    del live_tokens
+
+# Resumable chunked uploads. Chunks may arrive in any order and in parallel,
+# each one is written at its offset into the preallocated dataPath file.
+# Session state lives in the metadata store, so with SQLite a chunk can land
+# on any worker (STORAGE_DIR must then be shared too):
+# store.get_upload_session(upload_id) -> {
+#   "id", "ownerEmail", "filename", "size", "chunkSize", "totalChunks",
+#   "received": set[int], "inFlight": int, "options": dict, "dir": str,
+#   "dataPath": str, "expiresAt": float,
+# }
+UPLOAD_SESSION_DIR = os.path.join(STORAGE_DIR, "sessions")
+UPLOAD_SESSION_TTL_SECONDS = int(os.environ.get("UPLOAD_SESSION_TTL_SECONDS", 3600))
+DEFAULT_SESSION_CHUNK_SIZE = 5 * 1024 * 1024
+MAX_SESSION_CHUNK_SIZE = 64 * 1024 * 1024
+
+# Login sessions end after SESSION_IDLE_TIMEOUT_SECONDS without a request and
+# at the latest SESSION_MAX_LIFETIME_SECONDS after login. Requests push the
+# idle deadline forward (sliding expiry), at most once per
+# SESSION_RENEW_INTERVAL_SECONDS so busy clients don't write on every call.
+SESSION_IDLE_TIMEOUT_SECONDS = int(os.environ.get("SESSION_IDLE_TIMEOUT_SECONDS", 30 * 60))
+SESSION_MAX_LIFETIME_SECONDS = int(os.environ.get("SESSION_MAX_LIFETIME_SECONDS", 7 * 24 * 3600))
+SESSION_RENEW_INTERVAL_SECONDS = int(os.environ.get("SESSION_RENEW_INTERVAL_SECONDS", 60))
+
+# Logins waiting for their TOTP code are keyed by the random tempToken that
+# /api/auth/login returns and dropped after PENDING_LOGIN_TTL_SECONDS. At most
+# PENDING_LOGIN_MAX_ENTRIES are kept, the oldest go first.
+PENDING_LOGIN_TTL_SECONDS = int(os.environ.get("PENDING_LOGIN_TTL_SECONDS", 5 * 60))
+PENDING_LOGIN_MAX_ENTRIES = int(os.environ.get("PENDING_LOGIN_MAX_ENTRIES", 10000))
+
+# ACCESS_TOKEN_MODE=signed issues HMAC-signed access tokens carrying user id,
+# email, role and expiry instead of opaque session ids, so checking a request
+# needs no session lookup. They are valid for ACCESS_TOKEN_TTL_SECONDS and
+# cannot be renewed. Every worker must share ACCESS_TOKEN_SECRET; without it a
+# random per-process secret is used and tokens die with the process.
+# Revocations live on the user record, which requests load anyway:
+#   user["revoked_tokens"][jti] = exp        (logout, dropped once exp passes)
+#   user["tokens_valid_after"] = epoch float (password change)
+# Every worker has to see those, so signed mode requires
+# METADATA_BACKEND=sqlite; with per-process users a logout on one worker
+# would leave the token valid on the others.
+ACCESS_TOKEN_MODE = os.environ.get("ACCESS_TOKEN_MODE", "session").lower()
+ACCESS_TOKEN_TTL_SECONDS = int(os.environ.get("ACCESS_TOKEN_TTL_SECONDS", 12 * 3600))
+ACCESS_TOKEN_SECRET = os.environ.get("ACCESS_TOKEN_SECRET", "").encode("utf-8")
+if ACCESS_TOKEN_MODE == "signed" and METADATA_BACKEND != "sqlite":
+    raise RuntimeError(
+        "ACCESS_TOKEN_MODE=signed requires METADATA_BACKEND=sqlite, token revocations are kept on the user records"
+    )
+if ACCESS_TOKEN_MODE == "signed" and not ACCESS_TOKEN_SECRET:
+    app.logger.warning("ACCESS_TOKEN_SECRET not set, signed tokens will only be valid in this process")
+    ACCESS_TOKEN_SECRET = secrets.token_bytes(32)
+
+# User passwords are stored as scrypt hashes (password_hashing.py) with cost
+# PASSWORD_SCRYPT_N / _R / _P. Hashing runs on PASSWORD_HASH_WORKERS threads,
+# so a login burst cannot take every core away from downloads; logins past
+# PASSWORD_HASH_MAX_PENDING queued hashes get 503 with Retry-After. Plain-text
+# passwords (the seeded users, older records) and hashes made with other cost
+# parameters are rehashed on the next successful login.
+password_hasher = PasswordHasher(
+    n=int(os.environ.get("PASSWORD_SCRYPT_N", 2**14)),
+    r=int(os.environ.get("PASSWORD_SCRYPT_R", 8)),
+    p=int(os.environ.get("PASSWORD_SCRYPT_P", 1)),
+    workers=int(os.environ.get("PASSWORD_HASH_WORKERS", max(1, (os.cpu_count() or 2) // 2))),
+    max_pending=int(os.environ.get("PASSWORD_HASH_MAX_PENDING", 32)),
+)
 
-# Very simple TOTP code for all users in this mock
-MOCK_TOTP_CODE = "123456"
+# Login throttling, token buckets per client IP and per email shared by
+# /api/auth/login and /api/auth/login/totp. Checked before any password or
+# TOTP work, so a rejected attempt costs a dict lookup. Each limiter keeps at
+# most LOGIN_LIMITER_MAX_KEYS buckets, evicting the least recently seen.
+# Buckets are per process: with N workers a client can get up to N times the
+# configured rate, so divide the rates by the worker count when it matters.
+login_ip_limiter = TokenBucketLimiter(
+    rate=float(os.environ.get("LOGIN_IP_RATE_PER_MINUTE", 60)) / 60,
+    burst=float(os.environ.get("LOGIN_IP_BURST", 20)),
+    max_keys=int(os.environ.get("LOGIN_LIMITER_MAX_KEYS", 100000)),
+)
+login_email_limiter = TokenBucketLimiter(
+    rate=float(os.environ.get("LOGIN_EMAIL_RATE_PER_MINUTE", 10)) / 60,
+    burst=float(os.environ.get("LOGIN_EMAIL_BURST", 10)),
+    max_keys=int(os.environ.get("LOGIN_LIMITER_MAX_KEYS", 100000)),
+)
 
+# Download tokens issued by /api/files/<shareToken>/totp/validate are kept in
+# the metadata store: store.get_download_token(token) -> file id
+DOWNLOAD_TOKEN_TTL_SECONDS = 5 * 60
+
+# Serialized GET /api/files/<shareToken> responses, so share links hit in
+# bursts are answered from memory: share_token -> (body bytes, status code).
+# Entries are dropped when the file is deleted and stop being served at the
+# file's next status transition. The TTL bounds how long another worker's
+# delete can go unnoticed when the metadata store is shared.
+public_file_cache = LRUCache(
+    int(os.environ.get("PUBLIC_FILE_CACHE_SIZE", 10000)),
+    float(os.environ.get("PUBLIC_FILE_CACHE_TTL_SECONDS", 30)),
+)
 
-# In-memory file store for uploaded files (mock)
-# files[file_id] = { id, filename, size, ownerEmail, isPublic, passwordProtected, availableFrom, availableTo, sharedWith, shareLink, totpEnabled }
-files = {}
+# How download bytes leave the process:
+#   ""                 -> wsgi.file_wrapper (sendfile under gunicorn)
+#   "x-sendfile"       -> X-Sendfile header for Apache / lighttpd
+#   "x-accel-redirect" -> X-Accel-Redirect for nginx, X_ACCEL_PREFIX must be an
+#                         internal location aliased to the blob directory
+DOWNLOAD_OFFLOAD = os.environ.get("DOWNLOAD_OFFLOAD", "").lower()
+X_ACCEL_PREFIX = os.environ.get("X_ACCEL_PREFIX", "/protected-blobs")
+# More ranges than this in one request are ignored and the full file is sent
+MAX_RANGES = 16
 
 
 # Helper functions
@@ -85,17 +294,224 @@ def get_current_user():
         return None, None
 
     token = auth_header.split(" ", 1)[1].strip()
-    email = sessions.get(token)
-    if not email:
+    now = time.time()
+    if ACCESS_TOKEN_MODE == "signed":
+        return token, get_signed_token_user(token, now)
+
+    session = store.get_session(token, now)
+    if not session:
         return None, None
 
-    user = users.get(email)
+    user = store.get_user(session["email"])
     if not user:
         return None, None
 
+    # sliding expiry, capped by the session's maximum lifetime
+    expires_at = session["expiresAt"]
+    if expires_at is not None and expires_at - now < SESSION_IDLE_TIMEOUT_SECONDS - SESSION_RENEW_INTERVAL_SECONDS:
+        store.renew_session(token, min(now + SESSION_IDLE_TIMEOUT_SECONDS, session["maxExpiresAt"]))
+
     return token, user
 
 
+def get_signed_token_user(token: str, now: float):
+    """
+    Return the user a signed access token was issued to, or None if the token
+    is invalid, expired or revoked.
+    """
+    claims = verify_token(ACCESS_TOKEN_SECRET, token, now)
+    if not claims:
+        return None
+    user = store.get_user(claims.get("email"))
+    if not user or user["id"] != claims.get("sub"):
+        return None
+    if claims.get("iat", 0) < user.get("tokens_valid_after", 0):
+        return None
+    if claims.get("jti") in user.get("revoked_tokens", ()):
+        return None
+    return user
+
+
+def revoke_signed_token(token: str, user: dict):
+    """
+    Revoke one signed access token of user until it would have expired.
+    """
+    now = time.time()
+    claims = verify_token(ACCESS_TOKEN_SECRET, token, now)
+    if not claims:
+        return
+    revoked = {jti: exp for jti, exp in user.get("revoked_tokens", {}).items() if exp > now}
+    revoked[claims["jti"]] = claims["exp"]
+    user["revoked_tokens"] = revoked
+    store.save_user(user)
+
+
+def start_session(email: str) -> str:
+    """
+    Create a login session for email and return its bearer token.
+    """
+    now = time.time()
+    if ACCESS_TOKEN_MODE == "signed":
+        user = store.get_user(email)
+        claims = {
+            "sub": user["id"],
+            "email": email,
+            "role": user.get("role", "user"),
+            "iat": now,
+            "exp": int(now + ACCESS_TOKEN_TTL_SECONDS),
+            "jti": secrets.token_urlsafe(9),
+        }
+        return sign_token(ACCESS_TOKEN_SECRET, claims)
+
+    token = create_token("token")
+    max_expires_at = now + SESSION_MAX_LIFETIME_SECONDS
+    store.create_session(token, email, min(now + SESSION_IDLE_TIMEOUT_SECONDS, max_expires_at), max_expires_at)
+    return token
+
+
+def start_session_sweeper(interval_seconds: float):
+    def run():
+        while True:
+            time.sleep(interval_seconds)
+            store.expire_sessions()
+            store.expire_pending_logins()
+            store.expire_download_tokens()
+            if METADATA_BACKEND == "sqlite":
+                store.expire_totp_steps()
+
+    thread = threading.Thread(target=run, name="login-session-sweeper", daemon=True)
+    thread.start()
+    return thread
+
+
+start_session_sweeper(float(os.environ.get("SESSION_SWEEP_INTERVAL_SECONDS", 10)))
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class UploadSpool:
+    """
+    Sink for an incoming file part: chunks are appended to a temp file,
+    counted and hashed, and the size limit is enforced on every write.
+    """
+
+    def __init__(self, filename: str, max_bytes: int, path: str = None):
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.sha256 = hashlib.sha256()
+        self._fh = None
+        if path is None:
+            fd, path = tempfile.mkstemp(dir=SPOOL_DIR)
+            self._fh = os.fdopen(fd, "wb")
+        self.path = path
+
+    def write(self, chunk: bytes):
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise UploadTooLarge()
+        self._fh.write(chunk)
+        self.sha256.update(chunk)
+
+    @classmethod
+    def adopt(cls, filename: str, path: str):
+        """
+        Wrap a file that was already written in place (chunked uploads) so it
+        can be registered like a streamed upload. Only hashes it, no copy.
+        """
+        spool = cls(filename, os.path.getsize(path), path=path)
+        with open(path, "rb") as fh:
+            while True:
+                chunk = fh.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                spool.size += len(chunk)
+                spool.sha256.update(chunk)
+        return spool
+
+    def close(self):
+        if self._fh and not self._fh.closed:
+            self._fh.close()
+
+    def discard(self):
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def read_multipart_upload(max_bytes: int):
+    """
+    Parse a multipart/form-data body straight from the request stream.
+    Form fields are collected into a MultiDict, the "file" part is streamed
+    into an UploadSpool. Returns (form, spool); spool is None when no file
+    part was sent. Raises UploadTooLarge as soon as the file passes max_bytes,
+    and RequestEntityTooLarge past MAX_FORM_PARTS parts or MAX_FORM_MEMORY_SIZE
+    bytes of form fields (app.config, read through the request as Flask does).
+    """
+    form = MultiDict()
+    spool = None
+    boundary = request.mimetype_params.get("boundary")
+    if request.mimetype != "multipart/form-data" or not boundary:
+        return form, None
+
+    content_length = request.content_length
+    if content_length is not None and content_length > max_bytes + UPLOAD_CHUNK_SIZE:
+        # Body can't fit even with multipart overhead, reject before reading it
+        raise UploadTooLarge()
+
+    decoder = MultipartDecoder(boundary.encode("latin-1"), max_form_memory_size=2 * UPLOAD_CHUNK_SIZE)
+    stream = request.stream
+    current_field = None
+    field_buffer = bytearray()
+    max_parts = request.max_form_parts
+    max_form_bytes = request.max_form_memory_size
+    parts = 0
+    form_bytes = 0
+    try:
+        while True:
+            chunk = stream.read(UPLOAD_CHUNK_SIZE)
+            decoder.receive_data(chunk or None)
+            event = decoder.next_event()
+            while event is not NEED_DATA and not isinstance(event, Epilogue):
+                if isinstance(event, (Field, File)):
+                    parts += 1
+                    if max_parts is not None and parts > max_parts:
+                        raise RequestEntityTooLarge()
+                if isinstance(event, File) and event.name == "file" and spool is None:
+                    spool = UploadSpool(event.filename, max_bytes)
+                    current_field = spool
+                elif isinstance(event, File):
+                    current_field = None  # ignore extra file parts
+                elif isinstance(event, Field):
+                    current_field = event.name
+                    field_buffer.clear()
+                elif isinstance(event, Data):
+                    if isinstance(current_field, UploadSpool):
+                        current_field.write(event.data)
+                    elif current_field is not None:
+                        field_buffer.extend(event.data)
+                        form_bytes += len(event.data)
+                        if max_form_bytes is not None and form_bytes > max_form_bytes:
+                            raise RequestEntityTooLarge()
+                        if not event.more_data:
+                            form.add(current_field, field_buffer.decode("utf-8", "replace"))
+                event = decoder.next_event()
+            if not chunk or isinstance(event, Epilogue):
+                break
+    except Exception:
+        if spool:
+            spool.discard()
+        raise
+
+    if spool:
+        spool.close()
+    return form, spool
+
+
 def serialize_user(user: dict) -> dict:
     return {
         "id": user["id"],
@@ -106,30 +522,85 @@ def serialize_user(user: dict) -> dict:
     }
 
 
-def get_file_status(file_meta: dict) -> str:
+def remove_file(file_meta: FileRecord):
     """
-    Determines the status of a file based on its availableFrom and availableTo dates.
+    Drop a file record and release its blob.
     """
-    now = datetime.now(timezone.utc)
-    available_from_str = file_meta.get("availableFrom")
-    available_to_str = file_meta.get("availableTo")
+    if store.remove_file(file_meta):
+        forget_share_token(file_meta.share_token)
+        blob_store.release(file_meta.sha256)
 
-    available_from = None
-    available_to = None
 
-    if available_from_str:
-        available_from = datetime.fromisoformat(
-            available_from_str.replace("Z", "+00:00")
-        )
-    if available_to_str:
-        available_to = datetime.fromisoformat(available_to_str.replace("Z", "+00:00"))
+def forget_share_token(share_token: str):
+    public_file_cache.invalidate(share_token)
+    if share_token_filter is not None:
+        share_token_filter.remove(share_token)
+
+
+def login_throttled(email):
+    """
+    429 response if the client IP or the email is over its login rate,
+    otherwise None.
+    """
+    wait = login_ip_limiter.acquire(request.remote_addr or "")
+    if not wait and isinstance(email, str):
+        wait = login_email_limiter.acquire(email.strip().lower())
+    if not wait:
+        return None
+    response = jsonify({"message": "Too many login attempts, try again later"})
+    response.headers["Retry-After"] = str(int(wait) + 1)
+    return response, 429
 
-    if available_from and now < available_from:
-        return "pending"
-    if available_to and now > available_to:
-        return "expired"
 
-    return "active"
+def password_hasher_busy():
+    response = jsonify({"message": "Too many password checks in progress, try again shortly"})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
+
+def unknown_share_token(share_token: str) -> bool:
+    """
+    True when share_token certainly belongs to no file (filter says absent).
+    """
+    return share_token_filter is not None and not share_token_filter.might_contain(share_token)
+
+
+def encode_cursor(sort_key: str, order: str, key, file_id: str) -> str:
+    """
+    Opaque keyset cursor for /api/files/my: the last row's sort key and id.
+    """
+    raw = json.dumps([sort_key, order, key, file_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_key: str, order: str):
+    """
+    Return the (key, id) position encoded in cursor, or None if the cursor is
+    malformed or was issued for a different sortBy/order.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort_key, cursor_order, key, file_id = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    if cursor_sort_key != sort_key or cursor_order != order:
+        return None
+    # the key is compared against stored sort keys, so it must have their type
+    if sort_key == "fileName":
+        valid_key = isinstance(key, str)
+    else:
+        valid_key = isinstance(key, (int, float)) and not isinstance(key, bool)
+    if not valid_key or not isinstance(file_id, str):
+        return None
+    return key, file_id
+
+
+def get_file_status(file_meta: FileRecord) -> str:
+    """
+    Status of a file (pending / active / expired), kept on the record by the
+    transition queue instead of being recomputed from its dates.
+    """
+    return file_meta.status
 
 
 # temporary /auth endpoints
@@ -143,21 +614,30 @@ def register():
     email = data.get("email")
     password = data.get("password")
 
-    if not email or not password:
+    if not isinstance(email, str) or not isinstance(password, str) or not email or not password:
         return jsonify({"error": "email and password are required"}), 400
-
-    if email in users:
+    # cheap check first, don't spend a hash on a taken email
+    if store.get_user(email):
         return jsonify({"error": "User already exists"}), 400
 
-    users[email] = {
-        "id": str(uuid.uuid4()),
-        "email": email,
-        "username": data.get("username", ""),
-        "password": password,
-        "role": "user",
-        "totp_enabled": False,
-        "totp_secret": None,
-    }
+    try:
+        password_hash = password_hasher.hash(password)
+    except HasherBusy:
+        return password_hasher_busy()
+
+    created = store.add_user(
+        {
+            "id": str(uuid.uuid4()),
+            "email": email,
+            "username": data.get("username", ""),
+            "password": password_hash,
+            "role": "user",
+            "totp_enabled": False,
+            "totp_secret": None,
+        }
+    )
+    if not created:
+        return jsonify({"error": "User already exists"}), 400
 
     return jsonify(
         {
@@ -179,26 +659,43 @@ def login():
     email = data.get("email")
     password = data.get("password")
 
-    print(f"got {email} with {password}")
-    user = users.get(email)
-    if not user or user["password"] != password:
+    if not isinstance(email, (str, type(None))) or not isinstance(password, (str, type(None))):
+        return jsonify({"message": "email and password must be strings"}), 400
+    throttled = login_throttled(email)
+    if throttled:
+        return throttled
+
+    if not email or not password:
         return jsonify({"message": "Invalid email or password"}), 401
-    global totp_temp_sessions
+    user = store.get_user(email)
+    try:
+        if user:
+            matches, upgraded = password_hasher.verify(password, user["password"])
+        else:
+            matches, upgraded = password_hasher.verify_dummy(password), None
+    except HasherBusy:
+        return password_hasher_busy()
+    if not matches:
+        return jsonify({"message": "Invalid email or password"}), 401
+    if upgraded:
+        user["password"] = upgraded
+        store.save_user(user)
     if user["totp_enabled"]:
         # Require TOTP step
-        # temp_token = create_token("temp")
-        totp_temp_sessions[email] = email
+        temp_token = create_token("temp")
+        store.put_pending_login(
+            temp_token, email, time.time() + PENDING_LOGIN_TTL_SECONDS, PENDING_LOGIN_MAX_ENTRIES
+        )
         return jsonify(
             {
                 "requireTOTP": True,
-                # "tempToken": temp_token,
+                "tempToken": temp_token,
                 "message": "TOTP required (mock)",
             }
         ), 200
     else:
         # Direct login
-        token = create_token("token")
-        sessions[token] = email
+        token = start_session(email)
         return jsonify(
             {
                 # "requireTOTP": False,
@@ -214,27 +711,29 @@ def login_totp():
     """
     Mock TOTP validation after /auth/login.
     Body: { "tempToken": string, "code": string }
-    For this mock, valid TOTP code is always "123456".
+    code is the current code of the user's authenticator app.
     """
     data = request.get_json(silent=True) or {}
-    email = data.get("email")
+    temp_token = data.get("tempToken")
     code = data.get("code")
 
-    if not email or not code:
-        return jsonify({"error": "email and code are required"}), 400
-    email = totp_temp_sessions.get(email)  # Should be a temp session token
+    if not isinstance(temp_token, str) or not temp_token or not code:
+        return jsonify({"error": "tempToken and code are required"}), 400
+    email = store.get_pending_login(temp_token)
+    # per IP always, per email once the tempToken is known to be live
+    throttled = login_throttled(email)
+    if throttled:
+        return throttled
     if not email:
         return jsonify({"error": "Invalid or expired tempToken"}), 401
 
-    if code != MOCK_TOTP_CODE:
-        return jsonify({"error": "Invalid TOTP code (mock: use 123456)"}), 401
+    user = store.get_user(email)
+    if not user or not totp_verifier.verify(user.get("totp_secret"), code, f"user:{user['id']}"):
+        return jsonify({"error": "Invalid TOTP code"}), 401
 
     # Successful TOTP -> create real session token
-    token = create_token("token")
-    sessions[token] = email
-    del totp_temp_sessions[email]
-
-    user = users.get(email)
+    token = start_session(email)
+    store.delete_pending_login(temp_token)
 
     return jsonify(
         {
@@ -255,25 +754,29 @@ def totp_setup():
     """
     Mock TOTP setup.
     Requires Authorization: Bearer <token>.
-    Returns a fake secret and QR code string (base64 placeholder).
+    Returns a new secret, its otpauth:// URL and a QR code string (base64
+    placeholder).
     """
     token, user = get_current_user()
     if not user:
         return jsonify({"error": "Unauthorized"}), 401
+    if user.get("totp_enabled"):
+        return jsonify({"error": "TOTP already enabled for this account"}), 400
 
-    # For mock: just generate a fake secret and QR placeholder
-    secret = "MOCK-SECRET-SECRET"
+    secret = generate_secret()
     qr_code = "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAPoAAAD6CAYAAACI7Fo9AAAQAElEQVR4Aeydi3XcNhOFedSF0kZchqIypDJilSGXIbsMpYwkZeT3l5i/9VjOHS2GWJC8PhmvxQHm8YF342NguVe//vrrP0eyp6enf9SvCh7Pz89hmj///FNyf3x8DGNknNTR2s/NzY1MRa2tee7u7mSeigHcA621bm3+1eRfJmACuydgoe9+id2gCUyThe67wAQOQGBNoR8An1s0gW0QsNC3sU6u0gSaCFjoTfg82QS2QcBC38Y6uUoTaCIghX59fT1930cdzRbraaLxY3JFv3/99df09evXRfv27dtiD3P+73u1Pypa94U8c85Tr7/99ttiH3OP9Htq7strmS7meC2vmTxqjGLysq9L/xmNqn6k0Gn48+fP0+cNGDekajjjr+gVIT88PExLxo2s8sA+U2/rmLu7u3B9uZGX+piv//LLL2EMelU35B9//LHIa86TeW3lwXzFhH5Gscx9IoVO0zYTMIFtE7DQt71+rt4EUgQs9PeYfMUEdkfAQt/dkrohE3hPwEJ/z8RXTGB3BCz03S2pGzKB9wQs9PdM1rzi2CZwEQIlQv/y5ct0f3+/unEo4yKU3iRlv1f1y5g301b5kb3cqBb8qyQ+Iyi1PD4+Tkv2+++/y6jsby/Nn6/LIEUDIu5VPphVlFsidG7qHlbRcEUM3nBUvxV5MjFUHX///XcmTJcxHOyIjEM3qhAO3UQx8KkYFf7MPaDWJuOvWr8SoVeAcwwTMIH1CFjo67HtHdn5TGCRgIW+iMYOE9gPAQt9P2vpTkxgkYCFvojGDhPYDwELfT9ruWYnjr1xAhb6GQvINhDbPJGdEfbdFLZwlL2bdKELqk78FaWx3USsyCry7C2GhX7GirJXy4MjImPMGaFfTeHhFbe3t1Nk3PivJl3oh0ytiLO1PA5nRTzwtebY43wLfY+r6p5M4A0BC/0NEP/YnYATdiBgoXeA7BQmcGkCFvqlV8D5TaADAQu9A2SnMIFLE7DQL70Czr8mAcf+QcBC/wHCLyawZwIW+kqry5ce8JCEyNgTjozSovn4GNNqnAeI6sDXmqNqfoZrVa49xbHQV1pNvjUGIS4ZB2oQUGSUtjR/vs7pPMa1GIddojrwt8SvnAu3ufel18p8e4lloe9lJd1HbwKbymehb2q5XKwJnEfAQj+Pm2eZwKYIWOibWi4XawLnEbDQz+PmWSawJoHy2BZ6OVIHNIHxCFjo462JKzKBcgIlQucbNp6enqa1jSe7lBM4IyAP3mefPDLGnBH61RQOskQ58PFNHhF3vr3kVdATP/Rav4eHh4mal0z1Qp88aGNp/nz9RIurXKKetS2zfpnmSoSOAHtYpqEeY3hSCjdcZBV1RPFnHwdmIvaZOqL5lT7FLZNLxYBLpufWMZlaK8a01jnPfyH0+ZJfTcAE9kbAQt/birofEzhBwEI/AcWXTGBvBCz0va2o+zGBEwQ6Cf1EZl8yARPoRsBC74baiUzgcgSk0NmuYE94K1aBUvVKDj4XHRljVJxoPj62zogzgqle2PYaoc6qGuhH9TyKH42qvqXQaeb+/n7agvHwBNVwxq96hQkHGSKjligO/mg+Pg6AZOpdeww3fdQLvpEeTlHBg8M99LUF435UPUuhqwCX97sCEzABRcBCV4TsN4EdELDQd7CIbsEEFAELXRGy3wR2QMBCDxfRThPYBwELfR/r6C5MICRgoYd47DSBfRC44qEDRzIOorQuHfuWPCQhMg67RFyjubOPB0+oWtmPn8efeiVGVAc+9slPzZ2vsaes6tiSn3uAvo9kVxzKOJLxMIDWm5KTSBwQiUwxvb6+nqL5+MijamVcZMRQtUTz8fHGpurYkp97QDHZm99/dd/SHepaTeBMAhb6meA8zQS2RMBC39JquVYTOJOAhX4muLGnuToTeE3AQn/Nwz+ZwC4JWOi7XFY3ZQKvCVjor3n4JxPYJYGrT58+Ta2m9lk5kNGag/nEiVaBOhgXGQdIohj4np+fp8g4aMG4FmMvN8qR9XEwJ6ojw+Tu7i7sl28jmf7/6/QfOLgTccfHwzSivqiDcZGxr3+6gvxV7oEoBz645SNediQHm6g5Mv8f/bJr5Owm0IWAhd4Fs5OYwGUJWOiX5e/sJtCFgIXeBbOT5Ah41FoELPS1yDquCQxEwEIfaDFcigmsRcBCX4us45rAQARKhM6eI3uTS8be583NzdRqxFnKMV9XOdi/VvznWEuvfMZb5WHPf2n+fF3VkfHzuWlVi/KrvXjqUDEy/sz6kSsyHhqhcs18X79+neafq9Zvjrf0ii6iXvAtzX15nXGRZZiUCJ3DEjyFZMkomk39ViPOUg6us4AqB1AiaPiIFRkiVnm4qaMYMCNXq3HIRNWi/OrND7+KkfGr9YOZ4oHIVa6IO76K9SOOsozQuQ+iOBkmvNkrJiVCV4tjvwmYwGUJWOiX5e/sJtCFgIXeBbOT7JvA+N1Z6OOvkSs0gWYCFnozQgcwgfEJWOjjr5ErNIFmAhZ6M0IHMIE1CdTEvuJhAK2W2Zu+v7+fWo198qht9kdVjszeZpQDHzFUHpgorioG+87ki4z9UxVnFD97/oqJ8sM14oFPxaAOxkXGGBVH+Ymv2Kt7mhgVdgW4VlOF0AziaLWKPLwZqDjKn+lHMSWH4kEexkWmYozkV0wyfg7vRDzwqTgVMVQO/NSi+DOmh/mv7j0oO4cJXJiAhX7hBXB6E+hB4LTQe2R2DhMwgW4ELPRuqJ3IBC5HwEK/HHtnNoFuBCz0bqidyAQuR0AKne0oZTy4IG3X19OpsRkEp+Z99NqW8iju+NkqUgxUz2p+xq9yVPnpWZnKpebjVzGq/BVsqVeZFDr7gLe3t1NkfPCdwx0txgEFBY8DCi05mEutKg/jWm3eR13KhUBVDsZE3PHxrTFRHA7ULNUwX2dMFCPjy6zfnK/llQc10HdkKn7mnmaMilPhV/c0a6PyZJhIoask9puACYxPwEIff41coQk0E9iX0JtxOIAJ7JOAhb7PdXVXJvCKgIX+Cod/MIF9ErDQ97mu7soEXhGw0F/hCH6wywQ2TEAKnf1g9kgjY9NfMWCvL7KKfUsODUQ58DFG1ar81EqstY08qhZVAzGitcNXsX7USazIVK3s1xNnBKMWVa+qM6MdFYP7VdWReW6BFDqHNqLFw8eYqOBMsdyQUYyMj4YVlIo8mX5UHRl/pla+ySOKRQzWKLKK9WN9ohz4qCWqlV6IM4JRS1QrbwSqzozQFfuqe1oKXTVjvwmYwPgELPQR1sg1mMDKBCz0lQE7vAmMQMBCH2EVXIMJrEzAQl8ZsMObwAgELPQRVmHNGhzbBL4TsNC/Q/B/JrB3At2E/vT0NLXaw8PDxIMjlowP6asc7EsuzZ+v91p0VWvGrw67sOc/97X0yv52a8/sKy/Fn6+r9eEhDK11MH/Ot/TKfcS4VluKP19nH17l4Jtc5vGnXvGrGBl/F6FzKKDCuGkR6pJlcqgYxM6Aax2DQDP1qjGqDvpRpmJk/CoHftVzJk9mDLkiy8RQY6L4s0/FwK/uR8ZUWBehVxTqGAMScEmbIWChb2apXKgJnE/AQj+fnWeawGYIWOibWSoXagLnE7DQz2fnmWsScOxSAhZ6KU4HM4ExCUih88//7LO2WkX7fL5XmaqTOlpjsH1CnMjYSlJ5ovk9fZk1Vr3Qb0XNav0y7CvqoB/Vc0UelSPjp1ZVixQ64Nm0bzEOSqhCMn7icKhiyYCi6mTM0vz5uoqROQihasWf6bnHGA6QRD3T78xm6ZXDHq21Zu41xrTmycxnfZZ65TrfkJOJo8aoPORSxj2t8kihqwD2m8DmCBywYAv9gIvulo9HwEI/3pq74wMSsNAPuOhu+XgELPTjrbk7XpPAoLEt9EEXxmWZQCUBC72SpmOZwKAEugk92qfFx4MLFCP2HBm7ZJn9XvZhl+bP11UdGT+1zPGWXjNx1BiYqH3WCr+q4+bmZlJ5+Gz9FPzi4IeKUeHnyySCMv51Vawf9/TS2mevs77/FtT4Wxehc5oJgUXGGNVLNB8f8zk8EBljGBsZY1otio+P02itOZgf9VrlUwKlDsaofIyLLBND5cj4eUOJ6sDHGkWWuV8ZE8XI+IhBPf9aw29dhN5Qn6eagAkUELDQCyA6hAmMTsBCH32FXJ8JFBCw0AsgOoQJjE5ACn30BlyfCZiAJmCha0YeYQKbJyCFzpYH2xGR9aKQqYVtq8gyMSr6iXjho46ozqyvotZMDFVPJkbFGFVHxg971mBty/SbqUHFyfQjhc6+JBv/kTFGFVPh57BEVAcPP7i9vZ0iA2wUA19FrRx0INaS8eCCqM6sjxu7ot4oBjlUPRwwiWJU+cijalH+pTWpvp45mKPuae4jxY48qnYpdJWkxe+5JmACfQhY6H04O4sJXJSAhX5R/E5uAn0IWOh9ODuLCVyUwG6FflGqTm4CgxGw0AdbEJdjAmsQsNDXoOqYJjAYgSv2JSPjM7OqZh46wF5ei5EjqgMfYyJjj1zVQD/EiizK0dPH+QTVT0U97MFGPPCpPBVc2a8nV2SZz2crZnBV/WT8UZ34YJKJE43JMGFMFAOfFDo3AQMj46CKgqv8xAdOZKohTghV5KGWyHr5uCFVP/TcWs+3b9+miDt+lYObOoqBT60fImZcZORRtShm3K8qhvLTS1QnvkytKk8VE//VXZG23wR2QMBC38EiugUTUAQsdEXIfhPYAQELfbBFdDkmsAYBC30Nqo5pAoMRsNAHWxCXYwJrELDQ16DqmCYwGAEpdPYC2XdsNdU3h26enp6myNSeMXubqs7MnrCqlf3tqE58nD+IauHhCCpPhf8lk6V6WOPWXJn1e3h4mJZq4DrfXtJaR8/5rHNk7OereuiZ3peMB09EOfCx1740f74uhU6QVlPN4kfEyhgXWabOaH7Wxwk8VauqJZurdZyqA39rDuYrHvh50yHfkhFnK0Y/yjK9LLGYr6sc+BVXYkmhZ4r1GBMwgbEJWOhjr4+rM4ESAhZ6CUYHMYGxCVjoY6+PqzOBEgIWeglGBzGBsQlY6GOvj6szgRICuxM6e9ytpsiyXcHec2Rseag4yk+MKEfW18qD+arWjJ84yk7FeXmNrU0VI8ulddzLuk79OVPrqXlvr6k6uR/fznn7866Ezg3AN1+02ltIb38GPAcdIsvAfxv37c8c7olyZHzU2sqDb5V5W9s5P3P4I6olc8CEMVEMfBkurWPoRTHgsAr1RMabQRSH9VO1MiaKgW9XQqchmwmYwHsCFvp7Jr5iArsjYKHvbknd0EcIHGWshX6UlXafhyZgoR96+d38UQhY6EdZafd5aAIW+qGX382vSWCk2CVC56ED7LUuWWbPkb1Axo1gaoHYr1/qdb7OGBVnHtvyqvZhOXTTypQHRqgaqUPloZaICTFUHs4nqDxRjkqfqiPjp5+opgwTxQx/idA5GBBZ5qZH6BwQGcEi8PiAH/WLj3GRo6xyFwAABddJREFUZWIQR1mUAx83UitTBKrqyOShnsh4iILKQy2qnyhHlS/Tr6oTv6onw0Qxw18idFWs/SZgApclYKFflr+zm8BZBD46yUL/KDGPN4ENErDQN7hoLtkEPkrAQv8oMY83gQ0SsNA3uGgu2QQ+SuAjQv9obI83ARMYhMDV8/Pz1GqZfXLVLw8UaK2jar6qNePnYQNRPXyTSyaOGkOcKE/G12v9eIDCp0+fpiXDr/rN+DM9t47hG1JULRX3NPeRypPx+//oGUoeYwIbJ2Chb3wBXb4JZAiMIvRMrR5jAiZwJgEL/UxwnmYCWyJgoW9ptVyrCZxJwEI/E5ynmcCWCBxB6FtaD9dqAqsQuGIf9kjG55kVSR6kERmfEe7BjM/oq1or6sgwqcjD56IjrvhUHj4HrpgoP/2qPIxRcSr8qg78FXmueHrIkSwjHvVkEB4a0YNZptYvX75MrbUo8eBvzcF8hByx5Q2UcZFlmChhECPKgY+eVZwKv1q/zMMpMnX4r+4ZSh5jAhsnYKG3LaBnm8AmCFjom1gmF2kCbQQs9DZ+nm0CmyBgoW9imVykCbQRsNDb+K0527FNoIyAhV6G0oFMYFwCUug8lIAPv2/B+EaKHqgzTBjToxb2pUdYG/bIe/RbkYO1UcwYU5FLxVDrx8MreCBHZJwLUHmk0DkcQtNbMA5cqIYr/ORRPCryZGKoOnr5YZKpd4Qx1Kq49KozUwdCjixzik8KvVfDztOVgJMdjICFfrAFd7vHJGChH3Pd3fXBCFjoB1twt3tMAhb6Mdd9za4de0ACFvqAi+KSTKCaQInQ+ef9Hlbd/FK8il7Ylmy1ijqIsdTnfJ0xrZbpdc639mtrL5n5vT6vnmFFLarmEqHzQf3b29tpbaOZTOOtYyr64GkqPB2kxdjvba2FtVE8GNOah5tN9Uo/qpYKf2svmfkcYKmotSIGD69QNZcIvaJYxzCBBAEPOZOAhX4mOE8zgS0RsNC3tFqu1QTOJGChnwnO00xgSwQs9C2tlmtdk8CuY1vou15eN2cC/xGw0P/j4N9NYNcELPSVlpc9ZfY3W4zPILeWx9kDVQNjWvNk5qs66JcHLUTGwZxMrmgMnwGPclT5qEH1zJgeZqGvRJlv2FCLrPzc+K3lcZBF5WFMa57MfPXmR79KZIg0kysaw5uFylPhp4Yf7Kel115vshY6q2EzgZ0TsNB3vsBuzwQgYKFDwWYCOydgoe98gd3e7gmkGrTQU5g8yAS2TcBC3/b6uXoTSBGw0FOYPMgEtk3AQj+xfk9PT1NkVd8IE+XAx17uifKGvMQeOQ/biEzt17OnHM3Hx/mEUQBQT2TsnataeYBFFAO/ipHxnyn0TOjtjuFJKJFVdMahjSgHvoo8vWIgYmWqFjUfv4rRy8+bEvVElqklmo8vEyMzxkLPUPIYE9g4AQt94wvo8k0gQ8BCz1DyGBPYOIEBhb5xoi7fBAYkYKEPuCguyQSqCVjo1UQdzwQGJFAidLaK+Jzw2taLH5+Ljow6KnolTmS9uJInqiPjI0YFk4oYql62raL1zfp61EovKg/sGRdZidA/f/48PT4+rm7te8sRip8+DilExo3Q2i/MfmY8/ScOUrTmycyv4Nqr1kw/p2n+vMr6Reub8XEYJlOLGqNEishVDMb87O70n0qEfjq0r5qACYxCwEIfZSVchwmsSMBCXxGuQ5vAKAQs9LKVcCATGJeAhT7u2rgyEygjYKGXoXQgExiXgIU+7tq4MhMoIyCFzp4je75bMPY2y8h0CKSY8jCH/8o4xu98xlsxyfgraN3c3Ew8YGTJqKMiDw8XWcrBdfwqD2cYGBuZFDqniHiqxxaMNyUFZRQ/N7ViCvtR6u1RB/0qJhl/Ra2IJ7LMIZVMHVEOfJk8jGFsZFLomWI9xgRMYGwCFvrY6+PqTKCEgIVegnHLQVz7EQhY6EdYZfd4eAIW+uFvAQM4AgEL/Qir7B4PT8BCP/wtsCYAxx6FwP8AAAD//6cPWSkAAAAGSURBVAMAucMxNdUfgfYAAAAASUVORK5CYII="
 
     user["totp_secret"] = secret  # mark secret stored, but not yet enabled
+    store.save_user(user)
 
     return jsonify(
         {
             "totpSetup": {
                 "secret": secret,
+                "otpauthUrl": provisioning_uri(secret, user["email"], TOTP_ISSUER),
                 "qrCode": qr_code,
             },
-            "message": "TOTP setup generated (mock). Use code 123456 in /auth/totp/verify.",
+            "message": "TOTP setup generated. Confirm a code from your app in /auth/totp/verify.",
         }
     ), 200
 
@@ -284,7 +787,7 @@ def totp_verify():
     Mock TOTP verify to enable 2FA.
     Requires Authorization: Bearer <token>.
     Body: { "code": string }
-    Accepts code "123456" for everyone.
+    code must be valid for the secret from /auth/totp/setup.
     """
     token, user = get_current_user()
     if not user:
@@ -296,10 +799,14 @@ def totp_verify():
     if not code:
         return jsonify({"error": "code is required"}), 400
 
-    if code != MOCK_TOTP_CODE:
-        return jsonify({"error": "Invalid TOTP code (mock: use 123456)"}), 401
+    if not user.get("totp_secret"):
+        return jsonify({"error": "Call /auth/totp/setup first"}), 400
+
+    if not totp_verifier.verify(user["totp_secret"], code, f"user:{user['id']}"):
+        return jsonify({"error": "Invalid TOTP code"}), 401
 
     user["totp_enabled"] = True
+    store.save_user(user)
 
     return jsonify(
         {
@@ -315,7 +822,7 @@ def totp_disable():
     Mock TOTP disable.
     Requires Authorization: Bearer <token>.
     Body: { "code": string }
-    Accepts code "123456" for everyone.
+    code must be valid for the user's current secret.
     """
     token, user = get_current_user()
     if not user:
@@ -330,11 +837,12 @@ def totp_disable():
     if not user.get("totp_enabled"):
         return jsonify({"error": "TOTP not enabled for this account"}), 400
 
-    if code != MOCK_TOTP_CODE:
-        return jsonify({"error": "Invalid TOTP code (mock: use 123456)"}), 400
+    if not totp_verifier.verify(user.get("totp_secret"), code, f"user:{user['id']}"):
+        return jsonify({"error": "Invalid TOTP code"}), 400
 
     user["totp_enabled"] = False
     user["totp_secret"] = None  # Clear secret on disable
+    store.save_user(user)
 
     return jsonify(
         {
@@ -349,7 +857,7 @@ def logout():
     """
     Mock logout.
     Requires Authorization: Bearer <token>.
-    Simply removes the token from sessions dict.
+    Simply removes the token from the session store.
     """
     token, user = get_current_user()
     if not user:
@@ -361,8 +869,10 @@ def logout():
         ), 401
 
     # Remove token from sessions
-    if token in sessions:
-        del sessions[token]
+    if ACCESS_TOKEN_MODE == "signed":
+        revoke_signed_token(token, user)
+    else:
+        store.delete_session(token)
 
     return jsonify(
         {
@@ -387,23 +897,37 @@ def change_password():
     totp_code = data.get("totpCode")
     new_password = data.get("newPassword")
 
-    if not new_password or len(new_password) < 6:
+    if not isinstance(new_password, str) or len(new_password) < 6:
         return jsonify({"message": "New password must be at least 6 characters"}), 400
+    if old_password is not None and not isinstance(old_password, str):
+        return jsonify({"message": "oldPassword must be a string"}), 400
 
     if old_password:
-        if user["password"] != old_password:
+        try:
+            matches, _ = password_hasher.verify(old_password, user["password"])
+        except HasherBusy:
+            return password_hasher_busy()
+        if not matches:
             return jsonify({"message": "The old password is incorrect"}), 400
     elif totp_code:
         if not user.get("totp_enabled"):
             return jsonify({"message": "This account does not have TOTP enabled"}), 400
-        if totp_code != MOCK_TOTP_CODE:
+        if not totp_verifier.verify(user.get("totp_secret"), totp_code, f"user:{user['id']}"):
             return jsonify({"message": "Invalid TOTP code"}), 400
     else:
         return jsonify({"message": "Either oldPassword or totpCode is required"}), 400
 
     # Update password
-    user["password"] = new_password
-    
+    try:
+        user["password"] = password_hasher.hash(new_password)
+    except HasherBusy:
+        return password_hasher_busy()
+    if ACCESS_TOKEN_MODE == "signed":
+        # signed tokens issued before the change stop working, including this one
+        user["tokens_valid_after"] = time.time()
+        user.pop("revoked_tokens", None)
+    store.save_user(user)
+
     return jsonify({"message": "Password changed successfully"}), 200
 
 @app.get("/api/files/my")
@@ -421,73 +945,72 @@ def get_user_files():
     sort_by = request.args.get("sortBy", "createdAt")
     order = request.args.get("order", "desc")
 
-    # In a real app, this would be a database query. Here, we filter the in-memory dict.
-    user_files_with_status = [
-        (file_meta, get_file_status(file_meta))
-        for file_meta in files.values()
-        if file_meta.get("ownerEmail") == user_email
-    ]
-
-    # Filter by status
-    if status_filter != "all":
-        user_files_with_status = [
-            (file, status) for file, status in user_files_with_status if status == status_filter
-        ]
+    cursor = request.args.get("cursor")
 
-    # Sort files
+    # In a real app, this would be a database query. Here, the metadata store
+    # pages out of its per-owner orderings.
+    sort_key = "fileName" if sort_by == "fileName" else "createdAt"
     reverse_order = order == "desc"
-    if sort_by == "fileName":
-        user_files_with_status.sort(
-            key=lambda item: item[0].get("filename", "").lower(), reverse=reverse_order
-        )
-    else:  # Default to sorting by createdAt
-        user_files_with_status.sort(
-            key=lambda item: item[0]["createdAt"], reverse=reverse_order
-        )
-
-    # Paginate files
-    total_files = len(user_files_with_status)
     start_index = (page - 1) * limit
-    end_index = start_index + limit
-    paginated_files_with_status = user_files_with_status[start_index:end_index]
 
-    # Process files and calculate summary
+    after = None
+    if cursor:
+        after = decode_cursor(cursor, sort_key, order)
+        if after is None:
+            return jsonify({"message": "Invalid cursor"}), 400
+
+    counts = store.owner_summary(user_email)
+    if status_filter == "all":
+        total_files = counts["active"] + counts["pending"] + counts["expired"]
+    else:
+        total_files = counts.get(status_filter, 0)
+
+    # Fetch one extra row to know whether there is a next page
+    paginated_files = store.list_owner_files(
+        user_email,
+        sort_key,
+        reverse_order,
+        status=None if status_filter == "all" else status_filter,
+        offset=start_index,
+        limit=limit + 1,
+        after=after,
+    )
+
+    next_cursor = None
+    if len(paginated_files) > limit:
+        paginated_files = paginated_files[:limit]
+        last = paginated_files[-1]
+        next_cursor = encode_cursor(sort_key, order, file_sort_key(last, sort_key), last.id)
+
+    # Process files and read the summary counters
     serialized_files = []
     summary = {
-        "activeFiles": 0,
-        "pendingFiles": 0,
-        "expiredFiles": 0,
-        "deletedFiles": 0,
+        "activeFiles": counts.get("active", 0),
+        "pendingFiles": counts.get("pending", 0),
+        "expiredFiles": counts.get("expired", 0),
+        "deletedFiles": counts.get("deleted", 0),
     }
 
-    # Calculate summary based on all user files (pre-pagination)
-    for _, status in user_files_with_status:
-        if status == "active":
-            summary["activeFiles"] += 1
-        elif status == "pending":
-            summary["pendingFiles"] += 1
-        elif status == "expired":
-            summary["expiredFiles"] += 1
-
     # Serialize only the paginated files
-    for file_meta, status in paginated_files_with_status:
+    for file_meta in paginated_files:
         serialized_files.append(
             {
-                "id": file_meta["id"],
-                "fileName": file_meta.get("filename", "N/A"),
-                "status": status,
-                "createdAt": file_meta["createdAt"],
-                "shareToken": file_meta.get("shareToken"),
+                "id": file_meta.id,
+                "fileName": file_meta.filename or "N/A",
+                "status": get_file_status(file_meta),
+                "createdAt": to_iso(file_meta.created_at),
+                "shareToken": file_meta.share_token,
             }
         )
 
     # Mock pagination
     total_pages = (total_files + limit - 1) // limit
     pagination = {
-        "currentPage": page,
+        "currentPage": None if cursor else page,
         "totalPages": total_pages,
         "totalFiles": total_files,
         "limit": limit,
+        "nextCursor": next_cursor,
     }
 
     return jsonify(
@@ -517,15 +1040,6 @@ def get_user_profile():
 
 
 # /admin endpoints
-policy = {
-    "id": 1,
-    "maxFileSizeMB": 50,
-    "minValidityHours": 1,
-    "maxValidityDays": 30,
-    "defaultValidityDays": 7,
-    "requirePasswordMinLength": 6,
-}
-
 UPDATABLE_FIELDS = {
     "maxFileSizeMB",
     "minValidityHours",
@@ -537,16 +1051,15 @@ UPDATABLE_FIELDS = {
 
 @app.get("/api/admin/policy")
 def get_policy():
-    return jsonify(policy), 200
+    return jsonify(store.get_policy()), 200
 
 
 @app.patch("/api/admin/policy")
 def update_policy():
     data = request.get_json(silent=True) or {}
 
-    for key in UPDATABLE_FIELDS:
-        if key in data:
-            policy[key] = data[key]
+    changes = {key: data[key] for key in UPDATABLE_FIELDS if key in data}
+    policy = store.update_policy(changes)
 
     return jsonify(
         {
@@ -556,18 +1069,134 @@ def update_policy():
     ), 200
 
 
+# Expired-file cleanup works in batches of CLEANUP_BATCH_SIZE and stops
+# starting new batches after CLEANUP_TIME_BUDGET_SECONDS, so a large backlog
+# is drained over several calls instead of stalling one request.
+CRON_SECRET = os.environ.get("CRON_SECRET")
+CLEANUP_BATCH_SIZE = int(os.environ.get("CLEANUP_BATCH_SIZE", 500))
+CLEANUP_TIME_BUDGET_SECONDS = float(os.environ.get("CLEANUP_TIME_BUDGET_SECONDS", 2))
+
+
+def expire_batch(limit: int) -> tuple:
+    """
+    Delete up to `limit` expired files and the blobs no other file uses.
+    Returns (files_deleted, bytes_freed, bytes_deferred); with a shared
+    metadata store, blobs written less than the reaper's grace period ago
+    are left to the background reaper and counted as deferred.
+    """
+    expired = store.pop_expired(time.time(), limit)
+    for file_meta in expired:
+        forget_share_token(file_meta.share_token)
+        blob_store.release(file_meta.sha256)
+    _, freed, deferred = blob_store.reap_orphans({file_meta.sha256 for file_meta in expired})
+    return len(expired), freed, deferred
+
+
+def delete_expired_batch(limit: int) -> tuple:
+    """
+    expire_batch() as the expiry sweeper wants it: (files_deleted, bytes_freed).
+    """
+    deleted, freed, _ = expire_batch(limit)
+    return deleted, freed
+
+
+def cleanup_expired_files(time_budget: float, batch_size: int) -> dict:
+    deadline = time.monotonic() + time_budget
+    deleted_files = 0
+    freed_bytes = 0
+    deferred_bytes = 0
+    has_more = True
+    while time.monotonic() < deadline:
+        deleted, freed, deferred = expire_batch(batch_size)
+        deleted_files += deleted
+        freed_bytes += freed
+        deferred_bytes += deferred
+        if deleted < batch_size:
+            has_more = False
+            break
+    return {
+        "deletedFiles": deleted_files,
+        "freedBytes": freed_bytes,
+        "deferredBytes": deferred_bytes,
+        "hasMore": has_more,
+    }
+
+
+# Optional background sweeper deleting expired files between cron runs,
+# paced so unlinking a backlog does not hurt download latency.
+# EXPIRY_SWEEPER=1 enables it.
+expiry_sweeper = ExpirySweeper(
+    delete_expired_batch,
+    store.oldest_expiry,
+    files_per_second=float(os.environ.get("EXPIRY_SWEEPER_FILES_PER_SECOND", 50)),
+    bytes_per_second=float(os.environ.get("EXPIRY_SWEEPER_BYTES_PER_SECOND", 50 * 1024 * 1024)),
+    idle_seconds=float(os.environ.get("EXPIRY_SWEEPER_IDLE_SECONDS", 5)),
+)
+if os.environ.get("EXPIRY_SWEEPER", "").lower() in ("1", "true", "yes", "on"):
+    expiry_sweeper.start()
+
+
+def check_cleanup_access():
+    """
+    X-Cron-Secret: <CRON_SECRET> or an admin Bearer token.
+    Returns None when allowed, otherwise the error response.
+    """
+    cron_secret = request.headers.get("X-Cron-Secret")
+    if cron_secret is not None:
+        if not CRON_SECRET or not hmac.compare_digest(cron_secret, CRON_SECRET):
+            return jsonify({"error": "Forbidden", "message": "Invalid cron secret"}), 403
+    else:
+        token, user = get_current_user()
+        if not user:
+            if request.headers.get("Authorization"):
+                return jsonify({"error": "Unauthorized", "message": "Invalid or expired admin token"}), 401
+            return jsonify({"error": "Unauthorized", "message": "X-Cron-Secret header is required"}), 401
+        if user.get("role") != "admin":
+            return jsonify(
+                {"error": "Forbidden", "message": "You don't have permission to perform cleanup"}
+            ), 403
+    return None
+
+
 @app.post("/api/admin/cleanup")
 def admin_cleanup():
-    deleted_files = 100
+    """
+    Delete expired files (cron job or admin).
+    Requires X-Cron-Secret: <CRON_SECRET> or an admin Bearer token.
+    Returns the real number of files deleted and bytes freed; hasMore is
+    true when the time budget ran out before the backlog was empty.
+    deferredBytes counts blobs that are no longer referenced but were
+    written too recently to delete safely with a shared metadata store;
+    the background blob reaper removes them later, they are not in
+    freedBytes.
+    """
+    error = check_cleanup_access()
+    if error:
+        return error
+
+    result = cleanup_expired_files(CLEANUP_TIME_BUDGET_SECONDS, CLEANUP_BATCH_SIZE)
+    app.logger.info("cleanup from %s: %s", request.remote_addr, result)
     return jsonify(
         {
             "message": "Cleanup hoàn tất (mock)",
-            "deletedFiles": deleted_files,
+            **result,
             "timestamp": datetime.utcnow().isoformat() + "Z",
         }
     ), 200
 
 
+@app.get("/api/admin/cleanup/metrics")
+def cleanup_metrics():
+    """
+    Progress and lag of the background expiry sweeper.
+    Same access rules as /api/admin/cleanup.
+    """
+    error = check_cleanup_access()
+    if error:
+        return error
+    return jsonify(expiry_sweeper.metrics()), 200
+
+
 @app.post("/api/files/upload")
 def upload_file():
     """
@@ -584,17 +1213,12 @@ def upload_file():
     """
     token, user = get_current_user()
 
-    upload_file = request.files.get("file")
-    if not upload_file:
-        return jsonify({"error": "file is required"}), 400
-
-    filename = secure_filename(upload_file.filename or f"upload-{uuid.uuid4().hex}")
-    data = upload_file.read()
-    size = len(data)
-
-    # Validate size against policy
+    # Validate size against policy while the body streams in
+    policy = store.get_policy()
     max_bytes = policy.get("maxFileSizeMB", 50) * 1024 * 1024
-    if size > max_bytes:
+    try:
+        form, spool = read_multipart_upload(max_bytes)
+    except UploadTooLarge:
         return (
             jsonify(
                 {
@@ -604,17 +1228,50 @@ def upload_file():
             ),
             413,
         )
+    except RequestEntityTooLarge:
+        return jsonify({"error": "Too many form fields or form data too large"}), 413
+
+    if not spool:
+        return jsonify({"error": "file is required"}), 400
 
+    try:
+        return finish_upload(user, form, spool)
+    finally:
+        # no-op once the spool file has been moved into the blob store
+        spool.discard()
+
+
+def finish_upload(user, form, spool):
+    """
+    Validate the upload form fields and register the spooled file.
+    """
+    options, error = parse_upload_options(form)
+    if error:
+        return error
+    filename = secure_filename(spool.filename or f"upload-{uuid.uuid4().hex}")
+    return register_upload(user, options, filename, spool)
+
+
+def parse_upload_options(form):
+    """
+    Parse and validate the non-file upload fields from a MultiDict.
+    Returns (options, None) or (None, error_response). options is JSON
+    serializable (availability as epoch seconds, password already hashed),
+    upload sessions store it.
+    """
     # Parse form fields
-    is_public = str(request.form.get("isPublic", "false")).lower() in (
+    is_public = str(form.get("isPublic", "false")).lower() in (
         "1",
         "true",
         "yes",
         "on",
     )
-    password = request.form.get("password") or None
+    policy = store.get_policy()
+    password = form.get("password") or None
+    if password is not None and not isinstance(password, str):
+        return None, (jsonify({"error": "password must be a string"}), 400)
     if password and len(password) < policy.get("requirePasswordMinLength", 6):
-        return (
+        return None, (
             jsonify(
                 {
                     "error": "Password too short",
@@ -624,68 +1281,109 @@ def upload_file():
             400,
         )
 
-    available_from_raw = request.form.get("availableFrom")
-    available_to_raw = request.form.get("availableTo")
+    available_from_raw = form.get("availableFrom")
+    available_to_raw = form.get("availableTo")
     available_from = None
     available_to = None
     try:
         if available_from_raw:
-            available_from = datetime.fromisoformat(available_from_raw)
+            available_from = datetime.fromisoformat(available_from_raw.replace("Z", "+00:00"))
+            if available_from.tzinfo is None:
+                available_from = available_from.replace(tzinfo=timezone.utc)
         if available_to_raw:
-            available_to = datetime.fromisoformat(available_to_raw)
+            available_to = datetime.fromisoformat(available_to_raw.replace("Z", "+00:00"))
+            if available_to.tzinfo is None:
+                available_to = available_to.replace(tzinfo=timezone.utc)
         if available_from and available_to and available_from >= available_to:
-            return jsonify(
-                {"error": "availableFrom must be earlier than availableTo"}
-            ), 400
+            return None, (
+                jsonify({"error": "availableFrom must be earlier than availableTo"}),
+                400,
+            )
     except Exception:
-        return jsonify({"error": "Invalid datetime format, use ISO format"}), 400
+        return None, (jsonify({"error": "Invalid datetime format, use ISO format"}), 400)
 
-    shared_with = request.form.getlist("sharedWith") or []
-    enable_totp = str(request.form.get("enableTOTP", "false")).lower() in (
+    shared_with = form.getlist("sharedWith") or []
+    if not all(isinstance(email, str) for email in shared_with):
+        return None, (jsonify({"error": "sharedWith must be a list of emails"}), 400)
+    enable_totp = str(form.get("enableTOTP", "false")).lower() in (
         "1",
         "true",
         "yes",
         "on",
     )
+    if password:
+        # file passwords are stored as scrypt hashes, like account passwords
+        try:
+            password = password_hasher.hash(password)
+        except HasherBusy:
+            return None, password_hasher_busy()
 
-    # build file metadata
-    file_id = str(uuid.uuid4())
-    share_token = file_id  # Use file_id as share_token for simplicity
-    owner_email = user.get("email") if user else None
-    share_link = f"http://localhost:3000/f/{share_token}"
-
-    file_meta = {
-        "id": file_id,
-        "filename": filename,
-        "size": size,
-        "shareToken": share_token,
-        "ownerEmail": owner_email,
-        "isPublic": bool(is_public),
-        "passwordProtected": bool(password),
-        "availableFrom": available_from.isoformat() if available_from else None,
-        "availableTo": available_to.isoformat() if available_to else None,
+    return {
+        "isPublic": is_public,
+        "password": password,
+        "availableFrom": available_from.timestamp() if available_from else None,
+        "availableTo": available_to.timestamp() if available_to else None,
         "sharedWith": shared_with,
-        "shareLink": share_link,
-        "createdAt": datetime.now(timezone.utc).isoformat(),
-        "totpEnabled": bool(enable_totp),
-    }
+        "enableTOTP": enable_totp,
+    }, None
+
 
-    print(file_meta)
+def register_upload(user, options, filename, spool):
+    """
+    Move a completed spool into the blob store and create its file record.
+    Returns the upload response.
+    """
+    size = spool.size
+    available_from = options["availableFrom"]
+    available_to = options["availableTo"]
+    enable_totp = options["enableTOTP"]
 
-    # store metadata (not storing file bytes permanently in this mock)
-    files[file_id] = file_meta
+    # build file metadata
+    file_id = str(uuid.uuid4())
+    # unguessable and unrelated to the id, share links must not leak file ids
+    share_token = secrets.token_urlsafe(12)
+    owner_email = user.get("email") if user else None
 
     totp_setup = None
+    totp_secret = None
     if enable_totp:
-        # generate a mock secret and QR placeholder
-        secret = "MOCK-FILE-SECRET-" + uuid.uuid4().hex[:8]
+        # per-file secret, the QR code is still a placeholder
+        totp_secret = generate_secret()
         # small base64 placeholder image (reuse simple qrcode-like placeholder)
         qr_code = "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAPoAAAD6CAYAAACI7Fo9AAAQAElEQVR4Aeydi3XcNhOFedSF0kZchqIypDJilSGXIbsMpYwkZeT3l5i/9VjOHS2GWJC8PhmvxQHm8YF342NguVe//vrrP0eyp6enf9SvCh7Pz89hmj///FNyf3x8DGNknNTR2s/NzY1MRa2tee7u7mSeigHcA621bm3+1eRfJmACuydgoe9+id2gCUyThe67wAQOQGBNoR8An1s0gW0QsNC3sU6u0gSaCFjoTfg82QS2QcBC38Y6uUoTaCIghX59fT1930cdzRbraaLxY3JFv3/99df09evXRfv27dtiD3P+73u1Pypa94U8c85Tr7/99ttiH3OP9Htq7strmS7meC2vmTxqjGLysq9L/xmNqn6k0Gn48+fP0+cNGDekajjjr+gVIT88PExLxo2s8sA+U2/rmLu7u3B9uZGX+piv//LLL2EMelU35B9//LHIa86TeW3lwXzFhH5Gscx9IoVO0zYTMIFtE7DQt71+rt4EUgQs9PeYfMUEdkfAQt/dkrohE3hPwEJ/z8RXTGB3BCz03S2pGzKB9wQs9PdM1rzi2CZwEQIlQv/y5ct0f3+/unEo4yKU3iRlv1f1y5g301b5kb3cqBb8qyQ+Iyi1PD4+Tkv2+++/y6jsby/Nn6/LIEUDIu5VPphVlFsidG7qHlbRcEUM3nBUvxV5MjFUHX///XcmTJcxHOyIjEM3qhAO3UQx8KkYFf7MPaDWJuOvWr8SoVeAcwwTMIH1CFjo67HtHdn5TGCRgIW+iMYOE9gPAQt9P2vpTkxgkYCFvojGDhPYDwELfT9ruWYnjr1xAhb6GQvINhDbPJGdEfbdFLZwlL2bdKELqk78FaWx3USsyCry7C2GhX7GirJXy4MjImPMGaFfTeHhFbe3t1Nk3PivJl3oh0ytiLO1PA5nRTzwtebY43wLfY+r6p5M4A0BC/0NEP/YnYATdiBgoXeA7BQmcGkCFvqlV8D5TaADAQu9A2SnMIFLE7DQL70Czr8mAcf+QcBC/wHCLyawZwIW+kqry5ce8JCEyNgTjozSovn4GNNqnAeI6sDXmqNqfoZrVa49xbHQV1pNvjUGIS4ZB2oQUGSUtjR/vs7pPMa1GIddojrwt8SvnAu3ufel18p8e4lloe9lJd1HbwKbymehb2q5XKwJnEfAQj+Pm2eZwKYIWOibWi4XawLnEbDQz+PmWSawJoHy2BZ6OVIHNIHxCFjo462JKzKBcgIlQucbNp6enqa1jSe7lBM4IyAP3mefPDLGnBH61RQOskQ58PFNHhF3vr3kVdATP/Rav4eHh4mal0z1Qp88aGNp/nz9RIurXKKetS2zfpnmSoSOAHtYpqEeY3hSCjdcZBV1RPFnHwdmIvaZOqL5lT7FLZNLxYBLpufWMZlaK8a01jnPfyH0+ZJfTcAE9kbAQt/birofEzhBwEI/AcWXTGBvBCz0va2o+zGBEwQ6Cf1EZl8yARPoRsBC74baiUzgcgSk0NmuYE94K1aBUvVKDj4XHRljVJxoPj62zogzgqle2PYaoc6qGuhH9TyKH42qvqXQaeb+/n7agvHwBNVwxq96hQkHGSKjligO/mg+Pg6AZOpdeww3fdQLvpEeTlHBg8M99LUF435UPUuhqwCX97sCEzABRcBCV4TsN4EdELDQd7CIbsEEFAELXRGy3wR2QMBCDxfRThPYBwELfR/r6C5MICRgoYd47DSBfRC44qEDRzIOorQuHfuWPCQhMg67RFyjubOPB0+oWtmPn8efeiVGVAc+9slPzZ2vsaes6tiSn3uAvo9kVxzKOJLxMIDWm5KTSBwQiUwxvb6+nqL5+MijamVcZMRQtUTz8fHGpurYkp97QDHZm99/dd/SHepaTeBMAhb6meA8zQS2RMBC39JquVYTOJOAhX4muLGnuToTeE3AQn/Nwz+ZwC4JWOi7XFY3ZQKvCVjor3n4JxPYJYGrT58+Ta2m9lk5kNGag/nEiVaBOhgXGQdIohj4np+fp8g4aMG4FmMvN8qR9XEwJ6ojw+Tu7i7sl28jmf7/6/QfOLgTccfHwzSivqiDcZGxr3+6gvxV7oEoBz645SNediQHm6g5Mv8f/bJr5Owm0IWAhd4Fs5OYwGUJWOiX5e/sJtCFgIXeBbOT5Ah41FoELPS1yDquCQxEwEIfaDFcigmsRcBCX4us45rAQARKhM6eI3uTS8be583NzdRqxFnKMV9XOdi/VvznWEuvfMZb5WHPf2n+fF3VkfHzuWlVi/KrvXjqUDEy/sz6kSsyHhqhcs18X79+neafq9Zvjrf0ii6iXvAtzX15nXGRZZiUCJ3DEjyFZMkomk39ViPOUg6us4AqB1AiaPiIFRkiVnm4qaMYMCNXq3HIRNWi/OrND7+KkfGr9YOZ4oHIVa6IO76K9SOOsozQuQ+iOBkmvNkrJiVCV4tjvwmYwGUJWOiX5e/sJtCFgIXeBbOT7JvA+N1Z6OOvkSs0gWYCFnozQgcwgfEJWOjjr5ErNIFmAhZ6M0IHMIE1CdTEvuJhAK2W2Zu+v7+fWo198qht9kdVjszeZpQDHzFUHpgorioG+87ki4z9UxVnFD97/oqJ8sM14oFPxaAOxkXGGBVH+Ymv2Kt7mhgVdgW4VlOF0AziaLWKPLwZqDjKn+lHMSWH4kEexkWmYozkV0wyfg7vRDzwqTgVMVQO/NSi+DOmh/mv7j0oO4cJXJiAhX7hBXB6E+hB4LTQe2R2DhMwgW4ELPRuqJ3IBC5HwEK/HHtnNoFuBCz0bqidyAQuR0AKne0oZTy4IG3X19OpsRkEp+Z99NqW8iju+NkqUgxUz2p+xq9yVPnpWZnKpebjVzGq/BVsqVeZFDr7gLe3t1NkfPCdwx0txgEFBY8DCi05mEutKg/jWm3eR13KhUBVDsZE3PHxrTFRHA7ULNUwX2dMFCPjy6zfnK/llQc10HdkKn7mnmaMilPhV/c0a6PyZJhIoask9puACYxPwEIff41coQk0E9iX0JtxOIAJ7JOAhb7PdXVXJvCKgIX+Cod/MIF9ErDQ97mu7soEXhGw0F/hCH6wywQ2TEAKnf1g9kgjY9NfMWCvL7KKfUsODUQ58DFG1ar81EqstY08qhZVAzGitcNXsX7USazIVK3s1xNnBKMWVa+qM6MdFYP7VdWReW6BFDqHNqLFw8eYqOBMsdyQUYyMj4YVlIo8mX5UHRl/pla+ySOKRQzWKLKK9WN9ohz4qCWqlV6IM4JRS1QrbwSqzozQFfuqe1oKXTVjvwmYwPgELPQR1sg1mMDKBCz0lQE7vAmMQMBCH2EVXIMJrEzAQl8ZsMObwAgELPQRVmHNGhzbBL4TsNC/Q/B/JrB3At2E/vT0NLXaw8PDxIMjlowP6asc7EsuzZ+v91p0VWvGrw67sOc/97X0yv52a8/sKy/Fn6+r9eEhDK11MH/Ot/TKfcS4VluKP19nH17l4Jtc5vGnXvGrGBl/F6FzKKDCuGkR6pJlcqgYxM6Aax2DQDP1qjGqDvpRpmJk/CoHftVzJk9mDLkiy8RQY6L4s0/FwK/uR8ZUWBehVxTqGAMScEmbIWChb2apXKgJnE/AQj+fnWeawGYIWOibWSoXagLnE7DQz2fnmWsScOxSAhZ6KU4HM4ExCUih88//7LO2WkX7fL5XmaqTOlpjsH1CnMjYSlJ5ovk9fZk1Vr3Qb0XNav0y7CvqoB/Vc0UelSPjp1ZVixQ64Nm0bzEOSqhCMn7icKhiyYCi6mTM0vz5uoqROQihasWf6bnHGA6QRD3T78xm6ZXDHq21Zu41xrTmycxnfZZ65TrfkJOJo8aoPORSxj2t8kihqwD2m8DmCBywYAv9gIvulo9HwEI/3pq74wMSsNAPuOhu+XgELPTjrbk7XpPAoLEt9EEXxmWZQCUBC72SpmOZwKAEugk92qfFx4MLFCP2HBm7ZJn9XvZhl+bP11UdGT+1zPGWXjNx1BiYqH3WCr+q4+bmZlJ5+Gz9FPzi4IeKUeHnyySCMv51Vawf9/TS2mevs77/FtT4Wxehc5oJgUXGGNVLNB8f8zk8EBljGBsZY1otio+P02itOZgf9VrlUwKlDsaofIyLLBND5cj4eUOJ6sDHGkWWuV8ZE8XI+IhBPf9aw29dhN5Qn6eagAkUELDQCyA6hAmMTsBCH32FXJ8JFBCw0AsgOoQJjE5ACn30BlyfCZiAJmCha0YeYQKbJyCFzpYH2xGR9aKQqYVtq8gyMSr6iXjho46ozqyvotZMDFVPJkbFGFVHxg971mBty/SbqUHFyfQjhc6+JBv/kTFGFVPh57BEVAcPP7i9vZ0iA2wUA19FrRx0INaS8eCCqM6sjxu7ot4oBjlUPRwwiWJU+cijalH+pTWpvp45mKPuae4jxY48qnYpdJWkxe+5JmACfQhY6H04O4sJXJSAhX5R/E5uAn0IWOh9ODuLCVyUwG6FflGqTm4CgxGw0AdbEJdjAmsQsNDXoOqYJjAYgSv2JSPjM7OqZh46wF5ei5EjqgMfYyJjj1zVQD/EiizK0dPH+QTVT0U97MFGPPCpPBVc2a8nV2SZz2crZnBV/WT8UZ34YJKJE43JMGFMFAOfFDo3AQMj46CKgqv8xAdOZKohTghV5KGWyHr5uCFVP/TcWs+3b9+miDt+lYObOoqBT60fImZcZORRtShm3K8qhvLTS1QnvkytKk8VE//VXZG23wR2QMBC38EiugUTUAQsdEXIfhPYAQELfbBFdDkmsAYBC30Nqo5pAoMRsNAHWxCXYwJrELDQ16DqmCYwGAEpdPYC2XdsNdU3h26enp6myNSeMXubqs7MnrCqlf3tqE58nD+IauHhCCpPhf8lk6V6WOPWXJn1e3h4mJZq4DrfXtJaR8/5rHNk7OereuiZ3peMB09EOfCx1740f74uhU6QVlPN4kfEyhgXWabOaH7Wxwk8VauqJZurdZyqA39rDuYrHvh50yHfkhFnK0Y/yjK9LLGYr6sc+BVXYkmhZ4r1GBMwgbEJWOhjr4+rM4ESAhZ6CUYHMYGxCVjoY6+PqzOBEgIWeglGBzGBsQlY6GOvj6szgRICuxM6e9ytpsiyXcHec2Rseag4yk+MKEfW18qD+arWjJ84yk7FeXmNrU0VI8ulddzLuk79OVPrqXlvr6k6uR/fznn7866Ezg3AN1+02ltIb38GPAcdIsvAfxv37c8c7olyZHzU2sqDb5V5W9s5P3P4I6olc8CEMVEMfBkurWPoRTHgsAr1RMabQRSH9VO1MiaKgW9XQqchmwmYwHsCFvp7Jr5iArsjYKHvbknd0EcIHGWshX6UlXafhyZgoR96+d38UQhY6EdZafd5aAIW+qGX382vSWCk2CVC56ED7LUuWWbPkb1Axo1gaoHYr1/qdb7OGBVnHtvyqvZhOXTTypQHRqgaqUPloZaICTFUHs4nqDxRjkqfqiPjp5+opgwTxQx/idA5GBBZ5qZH6BwQGcEi8PiAH/WLj3GRo6xyFwAABddJREFUZWIQR1mUAx83UitTBKrqyOShnsh4iILKQy2qnyhHlS/Tr6oTv6onw0Qxw18idFWs/SZgApclYKFflr+zm8BZBD46yUL/KDGPN4ENErDQN7hoLtkEPkrAQv8oMY83gQ0SsNA3uGgu2QQ+SuAjQv9obI83ARMYhMDV8/Pz1GqZfXLVLw8UaK2jar6qNePnYQNRPXyTSyaOGkOcKE/G12v9eIDCp0+fpiXDr/rN+DM9t47hG1JULRX3NPeRypPx+//oGUoeYwIbJ2Chb3wBXb4JZAiMIvRMrR5jAiZwJgEL/UxwnmYCWyJgoW9ptVyrCZxJwEI/E5ynmcCWCBxB6FtaD9dqAqsQuGIf9kjG55kVSR6kERmfEe7BjM/oq1or6sgwqcjD56IjrvhUHj4HrpgoP/2qPIxRcSr8qg78FXmueHrIkSwjHvVkEB4a0YNZptYvX75MrbUo8eBvzcF8hByx5Q2UcZFlmChhECPKgY+eVZwKv1q/zMMpMnX4r+4ZSh5jAhsnYKG3LaBnm8AmCFjom1gmF2kCbQQs9DZ+nm0CmyBgoW9imVykCbQRsNDb+K0527FNoIyAhV6G0oFMYFwCUug8lIAPv2/B+EaKHqgzTBjToxb2pUdYG/bIe/RbkYO1UcwYU5FLxVDrx8MreCBHZJwLUHmk0DkcQtNbMA5cqIYr/ORRPCryZGKoOnr5YZKpd4Qx1Kq49KozUwdCjixzik8KvVfDztOVgJMdjICFfrAFd7vHJGChH3Pd3fXBCFjoB1twt3tMAhb6Mdd9za4de0ACFvqAi+KSTKCaQInQ+ef9Hlbd/FK8il7Ylmy1ijqIsdTnfJ0xrZbpdc639mtrL5n5vT6vnmFFLarmEqHzQf3b29tpbaOZTOOtYyr64GkqPB2kxdjvba2FtVE8GNOah5tN9Uo/qpYKf2svmfkcYKmotSIGD69QNZcIvaJYxzCBBAEPOZOAhX4mOE8zgS0RsNC3tFqu1QTOJGChnwnO00xgSwQs9C2tlmtdk8CuY1vou15eN2cC/xGw0P/j4N9NYNcELPSVlpc9ZfY3W4zPILeWx9kDVQNjWvNk5qs66JcHLUTGwZxMrmgMnwGPclT5qEH1zJgeZqGvRJlv2FCLrPzc+K3lcZBF5WFMa57MfPXmR79KZIg0kysaw5uFylPhp4Yf7Kel115vshY6q2EzgZ0TsNB3vsBuzwQgYKFDwWYCOydgoe98gd3e7gmkGrTQU5g8yAS2TcBC3/b6uXoTSBGw0FOYPMgEtk3AQj+xfk9PT1NkVd8IE+XAx17uifKGvMQeOQ/biEzt17OnHM3Hx/mEUQBQT2TsnataeYBFFAO/ipHxnyn0TOjtjuFJKJFVdMahjSgHvoo8vWIgYmWqFjUfv4rRy8+bEvVElqklmo8vEyMzxkLPUPIYE9g4AQt94wvo8k0gQ8BCz1DyGBPYOIEBhb5xoi7fBAYkYKEPuCguyQSqCVjo1UQdzwQGJFAidLaK+Jzw2taLH5+Ljow6KnolTmS9uJInqiPjI0YFk4oYql62raL1zfp61EovKg/sGRdZidA/f/48PT4+rm7te8sRip8+DilExo3Q2i/MfmY8/ScOUrTmycyv4Nqr1kw/p2n+vMr6Reub8XEYJlOLGqNEishVDMb87O70n0qEfjq0r5qACYxCwEIfZSVchwmsSMBCXxGuQ5vAKAQs9LKVcCATGJeAhT7u2rgyEygjYKGXoXQgExiXgIU+7tq4MhMoIyCFzp4je75bMPY2y8h0CKSY8jCH/8o4xu98xlsxyfgraN3c3Ew8YGTJqKMiDw8XWcrBdfwqD2cYGBuZFDqniHiqxxaMNyUFZRQ/N7ViCvtR6u1RB/0qJhl/Ra2IJ7LMIZVMHVEOfJk8jGFsZFLomWI9xgRMYGwCFvrY6+PqTKCEgIVegnHLQVz7EQhY6EdYZfd4eAIW+uFvAQM4AgEL/Qir7B4PT8BCP/wtsCYAxx6FwP8AAAD//6cPWSkAAAAGSURBVAMAucMxNdUfgfYAAAAASUVORK5CYII="
-        totp_setup = {"secret": secret, "qrCode": qr_code}
+        totp_setup = {
+            "secret": totp_secret,
+            "otpauthUrl": provisioning_uri(totp_secret, filename, TOTP_ISSUER),
+            "qrCode": qr_code,
+        }
+
+    file_meta = FileRecord(
+        id=file_id,
+        filename=filename,
+        size=size,
+        share_token=share_token,
+        owner_email=owner_email,
+        is_public=options["isPublic"],
+        available_from=available_from,
+        available_to=available_to,
+        created_at=time.time(),
+        shared_with=options["sharedWith"],
+        sha256=spool.sha256.hexdigest(),
+        password=options["password"],
+        totp_enabled=enable_totp,
+        totp_secret=totp_secret,
+    )
+
+    # store bytes (shared with identical uploads) and metadata
+    blob_store.put(file_meta.sha256, spool.path, size)
+    store.add_file(file_meta)
+    if share_token_filter is not None:
+        share_token_filter.add(file_meta.share_token)
+    app.logger.debug("stored upload %s (%d bytes)", file_meta.id, size)
 
     response = {
         "success": True,
-        "file": file_meta,
+        "file": file_meta.to_dict(),
         "message": "Upload successful (mock)",
     }
     if totp_setup:
@@ -694,6 +1392,293 @@ def upload_file():
     return jsonify(response), 200
 
 
+def drop_upload_session(session: dict):
+    shutil.rmtree(session["dir"], ignore_errors=True)
+
+
+def preallocate(path: str, size: int):
+    """
+    Create path with its final size reserved so chunks can be written at
+    their offsets in any order.
+    """
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    try:
+        if size and hasattr(os, "posix_fallocate"):
+            os.posix_fallocate(fd, 0, size)
+        else:
+            os.ftruncate(fd, size)
+    finally:
+        os.close(fd)
+
+
+def sweep_upload_sessions():
+    """
+    Remove expired upload sessions together with their partial data.
+    """
+    for session in store.pop_expired_upload_sessions():
+        drop_upload_session(session)
+
+
+def start_upload_session_sweeper(interval_seconds: float):
+    def run():
+        while True:
+            time.sleep(interval_seconds)
+            sweep_upload_sessions()
+
+    thread = threading.Thread(target=run, name="upload-session-sweeper", daemon=True)
+    thread.start()
+    return thread
+
+
+start_upload_session_sweeper(60)
+
+
+def get_upload_session(upload_id: str, user):
+    """
+    Return (session, None) for a live session the caller may use,
+    or (None, error_response).
+    """
+    session = store.get_upload_session(upload_id)
+    if not session:
+        return None, (jsonify({"error": "Upload session not found or expired"}), 404)
+    if session["ownerEmail"] and (not user or user["email"] != session["ownerEmail"]):
+        return None, (jsonify({"error": "Forbidden"}), 403)
+    return session, None
+
+
+def serialize_upload_session(session: dict) -> dict:
+    return {
+        "uploadId": session["id"],
+        "fileName": session["filename"],
+        "fileSize": session["size"],
+        "chunkSize": session["chunkSize"],
+        "totalChunks": session["totalChunks"],
+        "receivedChunks": sorted(session["received"]),
+        "expiresAt": datetime.fromtimestamp(session["expiresAt"], timezone.utc).isoformat(),
+    }
+
+
+@app.post("/api/files/uploads")
+def create_upload_session():
+    """
+    Open a resumable chunked upload.
+    Body: { fileName, fileSize, chunkSize?, isPublic?, password?, availableFrom?,
+            availableTo?, sharedWith?: [email], enableTOTP? }
+    Chunks are then sent with PUT /api/files/uploads/<uploadId>/chunks/<index>
+    and the file is created by POST /api/files/uploads/<uploadId>/complete.
+    """
+    token, user = get_current_user()
+    sweep_upload_sessions()
+
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({"error": "fileName and fileSize are required"}), 400
+    file_name = data.get("fileName")
+    try:
+        file_size = int(data.get("fileSize"))
+        chunk_size = int(data.get("chunkSize") or DEFAULT_SESSION_CHUNK_SIZE)
+    except (TypeError, ValueError):
+        return jsonify({"error": "fileName and fileSize are required"}), 400
+    if not isinstance(file_name, str) or not file_name or file_size < 0:
+        return jsonify({"error": "fileName and fileSize are required"}), 400
+    if not UPLOAD_CHUNK_SIZE <= chunk_size <= MAX_SESSION_CHUNK_SIZE:
+        return jsonify(
+            {
+                "error": "Invalid chunkSize",
+                "minChunkSize": UPLOAD_CHUNK_SIZE,
+                "maxChunkSize": MAX_SESSION_CHUNK_SIZE,
+            }
+        ), 400
+
+    policy = store.get_policy()
+    if file_size > policy.get("maxFileSizeMB", 50) * 1024 * 1024:
+        return (
+            jsonify(
+                {
+                    "error": "File too large",
+                    "maxFileSizeMB": policy.get("maxFileSizeMB"),
+                }
+            ),
+            413,
+        )
+
+    form = MultiDict()
+    for key, value in data.items():
+        if key == "sharedWith" and isinstance(value, list):
+            # items are type checked by parse_upload_options
+            for item in value:
+                form.add(key, item)
+        else:
+            form.add(key, str(value).lower() if isinstance(value, bool) else value)
+    options, error = parse_upload_options(form)
+    if error:
+        return error
+
+    upload_id = uuid.uuid4().hex
+    session = {
+        "id": upload_id,
+        "ownerEmail": user["email"] if user else None,
+        "filename": secure_filename(file_name) or f"upload-{upload_id}",
+        "size": file_size,
+        "chunkSize": chunk_size,
+        "totalChunks": max(1, -(-file_size // chunk_size)),
+        "options": options,
+        "dir": os.path.join(UPLOAD_SESSION_DIR, upload_id),
+        "expiresAt": time.time() + UPLOAD_SESSION_TTL_SECONDS,
+    }
+    session["dataPath"] = os.path.join(session["dir"], "data")
+    os.makedirs(session["dir"], exist_ok=True)
+    preallocate(session["dataPath"], file_size)
+    store.create_upload_session(session)
+
+    return jsonify(serialize_upload_session(dict(session, received=set()))), 201
+
+
+@app.get("/api/files/uploads/<string:upload_id>")
+def get_upload_session_status(upload_id: str):
+    """
+    Report which chunks have arrived, so an interrupted client can resume.
+    """
+    token, user = get_current_user()
+    session, error = get_upload_session(upload_id, user)
+    if error:
+        return error
+    return jsonify(serialize_upload_session(session)), 200
+
+
+@app.put("/api/files/uploads/<string:upload_id>/chunks/<int:index>")
+def upload_chunk(upload_id: str, index: int):
+    """
+    Store one chunk. The raw request body is the chunk content; every chunk
+    except the last must be exactly chunkSize bytes. Chunks can be sent
+    concurrently and out of order, and re-sending a chunk overwrites it, so
+    failed requests can simply be retried.
+    """
+    token, user = get_current_user()
+    session, error = get_upload_session(upload_id, user)
+    if error:
+        return error
+    if not 0 <= index < session["totalChunks"]:
+        return jsonify({"error": "Chunk index out of range"}), 400
+
+    if not store.begin_chunk(upload_id, index):
+        return jsonify({"error": "Upload session not found or expired"}), 404
+
+    offset = index * session["chunkSize"]
+    expected = min(session["chunkSize"], session["size"] - offset)
+    received = 0
+    try:
+        fd = os.open(session["dataPath"], os.O_WRONLY)
+        try:
+            while True:
+                chunk = request.stream.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                if received + len(chunk) > expected:
+                    received += len(chunk)
+                    break
+                # positional write: chunks never touch each other's ranges
+                view = memoryview(chunk)
+                while view:
+                    written = os.pwrite(fd, view, offset + received)
+                    received += written
+                    view = view[written:]
+        finally:
+            os.close(fd)
+    except FileNotFoundError:
+        # session was completed, aborted or swept while we were writing
+        return jsonify({"error": "Upload session not found or expired"}), 404
+    finally:
+        received_chunks = store.end_chunk(
+            upload_id, index, received == expected, time.time() + UPLOAD_SESSION_TTL_SECONDS
+        )
+
+    if received_chunks is None:
+        return jsonify({"error": "Upload session not found or expired"}), 404
+    if received != expected:
+        return jsonify({"error": "Chunk size mismatch", "expectedSize": expected}), 400
+
+    return jsonify(
+        {
+            "uploadId": upload_id,
+            "index": index,
+            "size": received,
+            "receivedChunks": received_chunks,
+            "totalChunks": session["totalChunks"],
+        }
+    ), 200
+
+
+@app.post("/api/files/uploads/<string:upload_id>/complete")
+def complete_upload_session(upload_id: str):
+    """
+    Create the file record from a fully received session. The chunks are
+    already in place in the target file, so this only hashes it.
+    Body (optional): { "sha256": hex digest of the whole file }
+    Returns the same payload as POST /api/files/upload. The session and its
+    data are only dropped once the file is stored; on a checksum mismatch
+    they are kept so the client can re-send chunks and complete again.
+    """
+    token, user = get_current_user()
+    session, error = get_upload_session(upload_id, user)
+    if error:
+        return error
+
+    data = request.get_json(silent=True)
+    if data is None:
+        data = {}
+    if not isinstance(data, dict):
+        return jsonify({"error": "Body must be a JSON object"}), 400
+    expected_digest = data.get("sha256")
+    if expected_digest is not None and not isinstance(expected_digest, str):
+        return jsonify({"error": "sha256 must be a hex string"}), 400
+
+    taken, session = store.take_upload_session(upload_id)
+    if session is None:
+        return jsonify({"error": "Upload session not found or expired"}), 404
+    if not taken:
+        missing = [i for i in range(session["totalChunks"]) if i not in session["received"]]
+        return jsonify(
+            {
+                "error": "Missing chunks",
+                "missingChunks": missing[:100],
+                "chunksInFlight": session["inFlight"],
+            }
+        ), 409
+
+    # the session is ours now: no chunk can be written until it is restored
+    try:
+        spool = UploadSpool.adopt(session["filename"], session["dataPath"])
+        matches = not expected_digest or expected_digest.lower() == spool.sha256.hexdigest()
+        if matches:
+            response = register_upload(user, session["options"], session["filename"], spool)
+    except Exception:
+        session["expiresAt"] = time.time() + UPLOAD_SESSION_TTL_SECONDS
+        store.restore_upload_session(session)
+        raise
+    if not matches:
+        session["expiresAt"] = time.time() + UPLOAD_SESSION_TTL_SECONDS
+        store.restore_upload_session(session)
+        return jsonify({"error": "Checksum mismatch", "uploadId": upload_id}), 400
+    # the data file was moved into the blob store, only the directory is left
+    drop_upload_session(session)
+    return response
+
+
+@app.delete("/api/files/uploads/<string:upload_id>")
+def abort_upload_session(upload_id: str):
+    """
+    Cancel an upload session and delete the chunks received so far.
+    """
+    token, user = get_current_user()
+    session, error = get_upload_session(upload_id, user)
+    if error:
+        return error
+    store.delete_upload_session(upload_id)
+    drop_upload_session(session)
+    return jsonify({"message": "Upload session aborted", "uploadId": upload_id}), 200
+
+
 @app.delete("/api/files/<string:file_id>")
 def delete_file(file_id: str):
     """
@@ -704,20 +1689,339 @@ def delete_file(file_id: str):
     if not user:
         return jsonify({"message": "Unauthorized"}), 401
 
-    if file_id not in files:
+    file_to_delete = store.get_file(file_id)
+    if not file_to_delete:
         return jsonify({"message": "File not found"}), 404
 
-    file_to_delete = files[file_id]
-
-    if file_to_delete.get("ownerEmail") != user["email"]:
+    if file_to_delete.owner_email != user["email"]:
         return jsonify({"message": "Forbidden"}), 403
 
-    # Delete the file from the in-memory store
-    del files[file_id]
+    # Delete the file from the metadata store, the blob is reclaimed by the
+    # reaper once no other file references it
+    remove_file(file_to_delete)
 
     return jsonify({"message": "File deleted successfully", "fileId": file_id}), 200
 
 
+def get_shared_file(share_token: str):
+    if unknown_share_token(share_token):
+        return None
+    return store.get_file_by_share_token(share_token)
+
+
+@app.get("/api/files/<string:share_token>")
+def get_file_info(share_token: str):
+    """
+    Public metadata of a shared file, for the /f/<token> share page.
+    Returns { file: { id, fileName, shareToken, status, isPublic, hasPassword } },
+    404 for an unknown token and 410 once the file has expired.
+    """
+    if unknown_share_token(share_token):
+        return jsonify({"error": "Not found", "message": "File not found"}), 404
+
+    cached = public_file_cache.get(share_token)
+    if cached is None:
+        file_meta = store.get_file_by_share_token(share_token)
+        if not file_meta:
+            return jsonify({"error": "Not found", "message": "File not found"}), 404
+
+        status = get_file_status(file_meta)
+        if status == "expired":
+            response = jsonify({"error": "File expired", "message": "File has expired"}), 410
+        else:
+            response = jsonify(
+                {
+                    "file": {
+                        "id": file_meta.id,
+                        "fileName": file_meta.filename,
+                        "shareToken": file_meta.share_token,
+                        "status": status,
+                        "isPublic": file_meta.is_public,
+                        "hasPassword": file_meta.password_protected,
+                    }
+                }
+            ), 200
+        cached = (response[0].get_data(), response[1])
+        public_file_cache.put(share_token, cached, expires_at=next_status_change(file_meta))
+
+    body, status_code = cached
+    return Response(body, status=status_code, mimetype="application/json")
+
+
+def parse_byte_ranges(header: str, size: int):
+    """
+    Parse a Range header against a file of `size` bytes.
+    Returns None when the header is absent or malformed (serve the whole
+    file), [] when no range is satisfiable (416), otherwise a list of
+    (start, end_exclusive) tuples in request order.
+    """
+    if not header or not header.startswith("bytes="):
+        return None
+    specs = header[len("bytes="):].split(",")
+    if len(specs) > MAX_RANGES:
+        return None
+
+    ranges = []
+    for spec in specs:
+        first, sep, last = spec.strip().partition("-")
+        if not sep:
+            return None
+        try:
+            if not first:
+                # suffix range: the last N bytes
+                length = int(last)
+                if length <= 0:
+                    continue
+                ranges.append((max(0, size - length), size))
+                continue
+            start = int(first)
+            end = int(last) + 1 if last else None
+        except ValueError:
+            return None
+        if start < 0 or (end is not None and end <= start):
+            return None
+        if start >= size:
+            continue
+        ranges.append((start, min(end or size, size)))
+    return ranges
+
+
+def iter_file_range(fh, start: int, length: int):
+    fh.seek(start)
+    try:
+        while length > 0:
+            chunk = fh.read(min(UPLOAD_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        fh.close()
+
+
+def send_blob(blob: dict, digest: str, download_name: str) -> Response:
+    """
+    Build a download response without copying the file through Python:
+    either hand the path to the front proxy or pass the open file to the
+    WSGI server's file_wrapper. The strong ETag is the content hash, so
+    Range / If-Range resumes survive restarts and re-uploads of the same bytes.
+    """
+    mimetype = mimetypes.guess_type(download_name)[0] or "application/octet-stream"
+    etag = f'"{digest}"'
+    headers = {
+        "Content-Disposition": f'attachment; filename="{download_name}"',
+        "Cache-Control": "private, no-cache",
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+    }
+
+    if etag in [t.strip() for t in request.headers.get("If-None-Match", "").split(",")]:
+        return Response(status=304, headers=headers)
+
+    # the proxy applies Range / If-Range itself when it serves the file
+    if DOWNLOAD_OFFLOAD == "x-accel-redirect":
+        rel_path = os.path.relpath(blob["path"], blob_store.root)
+        headers["X-Accel-Redirect"] = f"{X_ACCEL_PREFIX}/{rel_path}"
+        return Response(status=200, headers=headers, mimetype=mimetype)
+    if DOWNLOAD_OFFLOAD == "x-sendfile":
+        headers["X-Sendfile"] = blob["path"]
+        return Response(status=200, headers=headers, mimetype=mimetype)
+
+    size = blob["size"]
+    ranges = None
+    if_range = request.headers.get("If-Range")
+    # If-Range needs a strong validator; a date or other ETag means "send it all"
+    if not if_range or if_range.strip() == etag:
+        ranges = parse_byte_ranges(request.headers.get("Range"), size)
+
+    if ranges == []:
+        headers["Content-Range"] = f"bytes */{size}"
+        return Response(status=416, headers=headers)
+
+    fh = open(blob["path"], "rb")
+
+    if not ranges:
+        response = Response(
+            wrap_file(request.environ, fh, UPLOAD_CHUNK_SIZE),
+            status=200,
+            headers=headers,
+            mimetype=mimetype,
+            direct_passthrough=True,
+        )
+        response.content_length = size
+        return response
+
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        headers["Content-Range"] = f"bytes {start}-{end - 1}/{size}"
+        if "wsgi.file_wrapper" in request.environ:
+            # servers like gunicorn sendfile() from the current offset and
+            # stop at Content-Length
+            fh.seek(start)
+            body = request.environ["wsgi.file_wrapper"](fh, UPLOAD_CHUNK_SIZE)
+        else:
+            body = iter_file_range(fh, start, end - start)
+        response = Response(
+            body, status=206, headers=headers, mimetype=mimetype, direct_passthrough=True
+        )
+        response.content_length = end - start
+        return response
+
+    # multipart/byteranges: each part needs its own headers, so this one is
+    # streamed through Python in bounded chunks
+    boundary = uuid.uuid4().hex
+    part_headers = [
+        (
+            f"--{boundary}\r\nContent-Type: {mimetype}\r\n"
+            f"Content-Range: bytes {start}-{end - 1}/{size}\r\n\r\n"
+        ).encode("latin-1")
+        for start, end in ranges
+    ]
+    closing = f"\r\n--{boundary}--\r\n".encode("latin-1")
+
+    def generate():
+        try:
+            for index, (start, end) in enumerate(ranges):
+                yield (b"\r\n" if index else b"") + part_headers[index]
+                fh.seek(start)
+                remaining = end - start
+                while remaining > 0:
+                    chunk = fh.read(min(UPLOAD_CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    yield chunk
+            yield closing
+        finally:
+            fh.close()
+
+    response = Response(
+        generate(),
+        status=206,
+        headers=headers,
+        mimetype=f"multipart/byteranges; boundary={boundary}",
+        direct_passthrough=True,
+    )
+    response.content_length = (
+        sum(len(h) for h in part_headers)
+        + 2 * (len(ranges) - 1)
+        + sum(end - start for start, end in ranges)
+        + len(closing)
+    )
+    return response
+
+
+@app.get("/api/files/<string:share_token>/download")
+def download_file(share_token: str):
+    """
+    Download a shared file.
+    Query: password?, downloadToken?
+    Checks run in the documented order: status (410/423), whitelist (401/403),
+    password (403), TOTP download token (400). A file that is neither
+    public nor password protected is only served to its owner and the
+    sharedWith emails; the upload page marks password links not public.
+    """
+    file_meta = get_shared_file(share_token)
+    if not file_meta:
+        return jsonify({"error": "notFound", "message": "File not found"}), 404
+
+    status = get_file_status(file_meta)
+    if status == "expired":
+        return jsonify({"error": "expired", "message": "File has expired"}), 410
+    if status == "pending":
+        return jsonify(
+            {
+                "error": "pending",
+                "message": "File is not available yet",
+                "availableFrom": to_iso(file_meta.available_from),
+            }
+        ), 423
+
+    shared_with = file_meta.shared_with
+    if shared_with or not (file_meta.is_public or file_meta.password):
+        token, user = get_current_user()
+        if not user:
+            return jsonify({"error": "missingAuth", "message": "Authentication required"}), 401
+        if user["email"] not in shared_with and user["email"] != file_meta.owner_email:
+            return jsonify(
+                {
+                    "error": "notWhitelisted",
+                    "message": "You are not allowed to download this file. Your email is not in the shared list",
+                }
+            ), 403
+
+    if file_meta.password:
+        password = request.args.get("password")
+        if not password:
+            return jsonify({"error": "missingPassword", "message": "Password is required"}), 403
+        try:
+            matches, _ = password_hasher.verify(password, file_meta.password)
+        except HasherBusy:
+            return password_hasher_busy()
+        if not matches:
+            return jsonify({"error": "wrongPassword", "message": "Incorrect password"}), 403
+
+    if file_meta.totp_enabled:
+        download_token = request.args.get("downloadToken")
+        if not download_token:
+            return jsonify(
+                {"error": "missingDownloadToken", "message": "downloadToken is required"}
+            ), 400
+        if store.get_download_token(download_token) != file_meta.id:
+            return jsonify(
+                {"error": "invalidDownloadToken", "message": "Invalid or expired downloadToken"}
+            ), 400
+
+    blob = blob_store.get(file_meta.sha256)
+    if not blob:
+        return jsonify({"error": "notFound", "message": "File content not found"}), 404
+
+    return send_blob(blob, file_meta.sha256, file_meta.filename)
+
+
+@app.post("/api/files/<string:share_token>/totp/validate")
+def validate_file_totp(share_token: str):
+    """
+    Mock file TOTP validation, exchanges a code for a 5 minute downloadToken.
+    Body: { "code": string, "password"?: string }
+    code must be valid for the secret returned when the file was uploaded.
+    """
+    file_meta = get_shared_file(share_token)
+    if not file_meta:
+        return jsonify({"error": "notFound", "message": "File not found"}), 404
+    if get_file_status(file_meta) == "expired":
+        return jsonify({"error": "expired", "message": "File has expired"}), 410
+    if not file_meta.totp_enabled:
+        return jsonify({"error": "totpNotEnabled", "message": "TOTP is not enabled for this file"}), 400
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        data = {}
+    if file_meta.password:
+        password = data.get("password")
+        if not password or not isinstance(password, str):
+            return jsonify({"error": "missingPassword", "message": "Password is required"}), 400
+        try:
+            matches, _ = password_hasher.verify(password, file_meta.password)
+        except HasherBusy:
+            return password_hasher_busy()
+        if not matches:
+            return jsonify({"error": "wrongPassword", "message": "Incorrect password"}), 400
+
+    if not totp_verifier.verify(file_meta.totp_secret, data.get("code"), f"file:{file_meta.id}"):
+        return jsonify({"error": "invalidTOTPCode", "message": "Invalid TOTP code"}), 400
+
+    download_token = create_token("dl")
+    store.put_download_token(download_token, file_meta.id, time.time() + DOWNLOAD_TOKEN_TTL_SECONDS)
+
+    return jsonify(
+        {
+            "downloadToken": download_token,
+            "expiresIn": DOWNLOAD_TOKEN_TTL_SECONDS,
+        }
+    ), 200
+
+
 if __name__ == "__main__":
     # For local dev only
     app.run(host="0.0.0.0", port=8080, debug=True)
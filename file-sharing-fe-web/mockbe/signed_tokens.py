@@ -0,0 +1,52 @@
+import base64
+import hashlib
+import hmac
+import json
+
+TOKEN_VERSION = "v1"
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def sign_token(secret: bytes, claims: dict) -> str:
+    """
+    Compact signed token: v1.<base64url JSON claims>.<base64url HMAC-SHA256>.
+    Claims are readable by anyone holding the token, only integrity is
+    protected.
+    """
+    payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode("utf-8"))
+    signing_input = f"{TOKEN_VERSION}.{payload}".encode("ascii")
+    signature = hmac.new(secret, signing_input, hashlib.sha256).digest()
+    return f"{TOKEN_VERSION}.{payload}.{_b64encode(signature)}"
+
+
+def verify_token(secret: bytes, token: str, now: float):
+    """
+    Return the claims of a token signed with secret whose "exp" is after
+    now, or None if it is malformed, forged or expired.
+    """
+    try:
+        version, payload, signature = token.split(".")
+    except ValueError:
+        return None
+    if version != TOKEN_VERSION:
+        return None
+    signing_input = f"{version}.{payload}".encode("ascii", "replace")
+    expected = hmac.new(secret, signing_input, hashlib.sha256).digest()
+    try:
+        if not hmac.compare_digest(_b64decode(signature), expected):
+            return None
+        claims = json.loads(_b64decode(payload))
+    except ValueError:
+        return None
+    if not isinstance(claims, dict) or not isinstance(claims.get("exp"), (int, float)):
+        return None
+    if claims["exp"] <= now:
+        return None
+    return claims
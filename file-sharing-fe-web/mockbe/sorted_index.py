@@ -0,0 +1,63 @@
+import bisect
+
+
+class SortedIndex:
+    """
+    Ordered (key, id) index for paging through records without re-sorting.
+    Entries live in a plain sorted list, so lookups and page starts are
+    O(log n) bisects; inserts and removes are a bisect plus a list memmove.
+    """
+
+    def __init__(self):
+        self._entries = []
+        self._key_of = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def insert(self, key, item_id: str):
+        if item_id in self._key_of:
+            self.remove(item_id)
+        self._key_of[item_id] = key
+        bisect.insort(self._entries, (key, item_id))
+
+    def remove(self, item_id: str):
+        key = self._key_of.pop(item_id, None)
+        if key is None:
+            return
+        entry = (key, item_id)
+        i = bisect.bisect_left(self._entries, entry)
+        if i < len(self._entries) and self._entries[i] == entry:
+            del self._entries[i]
+
+    def page(self, offset: int, limit: int, reverse: bool = False) -> list:
+        """
+        Ids of entries [offset, offset + limit) in ascending or descending order.
+        """
+        if offset < 0 or limit <= 0:
+            return []
+        if reverse:
+            stop = len(self._entries) - offset
+            start = max(0, stop - limit)
+            return [item_id for _, item_id in reversed(self._entries[start:max(0, stop)])]
+        return [item_id for _, item_id in self._entries[offset:offset + limit]]
+
+    def key_of(self, item_id: str):
+        return self._key_of.get(item_id)
+
+    def iter_ids(self, reverse: bool = False, after: tuple = None):
+        """
+        Yield ids in order. With after=(key, id) iteration starts just past
+        that position (keyset pagination); the entry itself need not exist.
+        """
+        entries = self._entries
+        if reverse:
+            i = len(entries) if after is None else bisect.bisect_left(entries, after)
+            while i > 0:
+                i -= 1
+                yield entries[i][1]
+        else:
+            i = 0 if after is None else bisect.bisect_right(entries, after)
+            while i < len(entries):
+                yield entries[i][1]
+                i += 1
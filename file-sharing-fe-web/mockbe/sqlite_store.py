@@ -0,0 +1,590 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from file_record import FileRecord
+from metadata_store import MetadataStore, status_at
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    email TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    token TEXT PRIMARY KEY,
+    email TEXT NOT NULL,
+    expires_at REAL,
+    max_expires_at REAL
+);
+CREATE TABLE IF NOT EXISTS pending_logins (
+    key TEXT PRIMARY KEY,
+    email TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pending_logins_expiry ON pending_logins (expires_at);
+CREATE TABLE IF NOT EXISTS download_tokens (
+    token TEXT PRIMARY KEY,
+    file_id TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS download_tokens_expiry ON download_tokens (expires_at);
+CREATE TABLE IF NOT EXISTS upload_sessions (
+    id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    in_flight INTEGER NOT NULL DEFAULT 0,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS upload_sessions_expiry ON upload_sessions (expires_at);
+CREATE TABLE IF NOT EXISTS upload_chunks (
+    upload_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    PRIMARY KEY (upload_id, idx)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS totp_used (
+    scope TEXT PRIMARY KEY,
+    step INTEGER NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS totp_used_expiry ON totp_used (expires_at);
+CREATE TABLE IF NOT EXISTS files (
+    id TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    name_key TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    share_token TEXT NOT NULL,
+    owner_email TEXT,
+    is_public INTEGER NOT NULL,
+    available_from REAL,
+    available_to REAL,
+    created_at REAL NOT NULL,
+    shared_with TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    password TEXT,
+    totp_enabled INTEGER NOT NULL,
+    totp_secret TEXT,
+    status TEXT NOT NULL DEFAULT 'active'
+);
+CREATE INDEX IF NOT EXISTS files_owner_created ON files (owner_email, created_at, id);
+CREATE INDEX IF NOT EXISTS files_owner_name ON files (owner_email, name_key, id);
+CREATE INDEX IF NOT EXISTS files_owner_status_created ON files (owner_email, status, created_at, id);
+CREATE INDEX IF NOT EXISTS files_owner_status_name ON files (owner_email, status, name_key, id);
+CREATE UNIQUE INDEX IF NOT EXISTS files_share_token ON files (share_token);
+CREATE INDEX IF NOT EXISTS files_expiry ON files (available_to) WHERE available_to IS NOT NULL;
+CREATE INDEX IF NOT EXISTS files_sha256 ON files (sha256);
+CREATE INDEX IF NOT EXISTS files_pending_due ON files (available_from) WHERE status = 'pending';
+CREATE INDEX IF NOT EXISTS files_active_due ON files (available_to) WHERE status = 'active' AND available_to IS NOT NULL;
+CREATE INDEX IF NOT EXISTS sessions_expiry ON sessions (expires_at) WHERE expires_at IS NOT NULL;
+CREATE TABLE IF NOT EXISTS owner_stats (
+    owner_email TEXT PRIMARY KEY,
+    active INTEGER NOT NULL DEFAULT 0,
+    pending INTEGER NOT NULL DEFAULT 0,
+    expired INTEGER NOT NULL DEFAULT 0,
+    deleted INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS policy (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+FILE_COLUMNS = (
+    "id, filename, size, share_token, owner_email, is_public, available_from, available_to, "
+    "created_at, shared_with, sha256, password, totp_enabled, totp_secret"
+)
+
+# status derived from the availability window, ?1 is "now". advance_statuses()
+# uses it to move files.status forward; listings and the owner_stats counters
+# follow files.status.
+STATUS_SQL = (
+    "CASE WHEN available_to IS NOT NULL AND ?1 > available_to THEN 'expired' "
+    "WHEN available_from IS NOT NULL AND ?1 < available_from THEN 'pending' "
+    "ELSE 'active' END"
+)
+
+SORT_COLUMNS = {"createdAt": "created_at", "fileName": "name_key"}
+
+
+class SQLiteStore(MetadataStore):
+    """
+    Metadata backend on a single SQLite database in WAL mode, so several
+    server processes (e.g. gunicorn workers) can share users, sessions,
+    upload sessions, download tokens, TOTP replay state, files and policy.
+    Each thread keeps its own connection; statements use placeholders only,
+    so the connection's statement cache serves them prepared after the
+    first call.
+    """
+
+    def __init__(self, path: str, default_users: dict, default_policy: dict, busy_timeout: float = 5.0):
+        super().__init__(default_users, default_policy)
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self.connection()
+        conn.executescript(SCHEMA)
+        with self.transaction() as conn:
+            # every worker runs this; INSERT OR IGNORE keeps it idempotent
+            conn.executemany(
+                "INSERT OR IGNORE INTO users (email, data) VALUES (?, ?)",
+                [(email, json.dumps(user)) for email, user in self.default_users.items()],
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO policy (key, value) VALUES (?, ?)",
+                [(key, json.dumps(value)) for key, value in self.default_policy.items()],
+            )
+
+    def connection(self) -> sqlite3.Connection:
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.path,
+                timeout=self.busy_timeout,
+                isolation_level=None,
+                cached_statements=256,
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def transaction(self):
+        return _Transaction(self.connection())
+
+    # users
+    def get_user(self, email: str):
+        row = self.connection().execute("SELECT data FROM users WHERE email = ?", (email,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def add_user(self, user: dict) -> bool:
+        cursor = self.connection().execute(
+            "INSERT OR IGNORE INTO users (email, data) VALUES (?, ?)",
+            (user["email"], json.dumps(user)),
+        )
+        return cursor.rowcount == 1
+
+    def save_user(self, user: dict):
+        self.connection().execute(
+            "INSERT OR REPLACE INTO users (email, data) VALUES (?, ?)",
+            (user["email"], json.dumps(user)),
+        )
+
+    # sessions
+    def create_session(self, token: str, email: str, expires_at: float = None, max_expires_at: float = None):
+        self.connection().execute(
+            "INSERT OR REPLACE INTO sessions (token, email, expires_at, max_expires_at) VALUES (?, ?, ?, ?)",
+            (token, email, expires_at, max_expires_at),
+        )
+
+    def get_session(self, token: str, now: float = None):
+        row = self.connection().execute(
+            "SELECT email, expires_at, max_expires_at FROM sessions "
+            "WHERE token = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (token, time.time() if now is None else now),
+        ).fetchone()
+        if not row:
+            return None
+        return {"email": row[0], "expiresAt": row[1], "maxExpiresAt": row[2]}
+
+    def renew_session(self, token: str, expires_at: float):
+        self.connection().execute("UPDATE sessions SET expires_at = ? WHERE token = ?", (expires_at, token))
+
+    def delete_session(self, token: str):
+        self.connection().execute("DELETE FROM sessions WHERE token = ?", (token,))
+
+    def expire_sessions(self, now: float = None) -> int:
+        # range delete on the expiry index
+        cursor = self.connection().execute(
+            "DELETE FROM sessions WHERE expires_at IS NOT NULL AND expires_at <= ?",
+            (time.time() if now is None else now,),
+        )
+        return cursor.rowcount
+
+    def session_count(self) -> int:
+        return self.connection().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def put_pending_login(self, key: str, email: str, expires_at: float, max_entries: int):
+        with self.transaction() as conn:
+            cursor = conn.execute(
+                "INSERT OR REPLACE INTO pending_logins (key, email, expires_at) VALUES (?, ?, ?)",
+                (key, email, expires_at),
+            )
+            # rowids grow with every insert, so the cap is a rowid range delete
+            conn.execute("DELETE FROM pending_logins WHERE rowid <= ?", (cursor.lastrowid - max_entries,))
+
+    def get_pending_login(self, key: str, now: float = None):
+        row = self.connection().execute(
+            "SELECT email FROM pending_logins WHERE key = ? AND expires_at > ?",
+            (key, time.time() if now is None else now),
+        ).fetchone()
+        return row[0] if row else None
+
+    def delete_pending_login(self, key: str):
+        self.connection().execute("DELETE FROM pending_logins WHERE key = ?", (key,))
+
+    def expire_pending_logins(self, now: float = None) -> int:
+        cursor = self.connection().execute(
+            "DELETE FROM pending_logins WHERE expires_at <= ?", (time.time() if now is None else now,)
+        )
+        return cursor.rowcount
+
+    def put_download_token(self, token: str, file_id: str, expires_at: float):
+        self.connection().execute(
+            "INSERT OR REPLACE INTO download_tokens (token, file_id, expires_at) VALUES (?, ?, ?)",
+            (token, file_id, expires_at),
+        )
+
+    def get_download_token(self, token: str, now: float = None):
+        row = self.connection().execute(
+            "SELECT file_id FROM download_tokens WHERE token = ? AND expires_at > ?",
+            (token, time.time() if now is None else now),
+        ).fetchone()
+        return row[0] if row else None
+
+    def expire_download_tokens(self, now: float = None) -> int:
+        cursor = self.connection().execute(
+            "DELETE FROM download_tokens WHERE expires_at <= ?", (time.time() if now is None else now,)
+        )
+        return cursor.rowcount
+
+    def claim_totp_step(self, scope: str, step: int, expires_at: float) -> bool:
+        """
+        Record step as the last TOTP step accepted for scope unless that
+        step or a later one was accepted before, by any worker.
+        """
+        cursor = self.connection().execute(
+            "INSERT INTO totp_used (scope, step, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (scope) DO UPDATE SET step = excluded.step, expires_at = excluded.expires_at "
+            "WHERE step < excluded.step",
+            (scope, step, expires_at),
+        )
+        return cursor.rowcount == 1
+
+    def expire_totp_steps(self, now: float = None) -> int:
+        cursor = self.connection().execute(
+            "DELETE FROM totp_used WHERE expires_at <= ?", (time.time() if now is None else now,)
+        )
+        return cursor.rowcount
+
+    # upload sessions
+    @staticmethod
+    def _upload_state(conn, row) -> dict:
+        session = json.loads(row[0])
+        session["inFlight"] = row[1]
+        session["expiresAt"] = row[2]
+        session["received"] = {
+            idx for (idx,) in conn.execute("SELECT idx FROM upload_chunks WHERE upload_id = ?", (session["id"],))
+        }
+        return session
+
+    def create_upload_session(self, session: dict):
+        data = {key: value for key, value in session.items() if key not in ("expiresAt", "received", "inFlight")}
+        self.connection().execute(
+            "INSERT INTO upload_sessions (id, data, in_flight, expires_at) VALUES (?, ?, 0, ?)",
+            (session["id"], json.dumps(data), session["expiresAt"]),
+        )
+
+    def get_upload_session(self, upload_id: str, now: float = None):
+        conn = self.connection()
+        # one read transaction, so the chunk list matches the session row
+        conn.execute("BEGIN")
+        try:
+            row = conn.execute(
+                "SELECT data, in_flight, expires_at FROM upload_sessions WHERE id = ? AND expires_at > ?",
+                (upload_id, time.time() if now is None else now),
+            ).fetchone()
+            return self._upload_state(conn, row) if row else None
+        finally:
+            conn.execute("COMMIT")
+
+    def begin_chunk(self, upload_id: str, index: int) -> bool:
+        with self.transaction() as conn:
+            cursor = conn.execute("UPDATE upload_sessions SET in_flight = in_flight + 1 WHERE id = ?", (upload_id,))
+            if cursor.rowcount == 0:
+                return False
+            conn.execute("DELETE FROM upload_chunks WHERE upload_id = ? AND idx = ?", (upload_id, index))
+        return True
+
+    def end_chunk(self, upload_id: str, index: int, received: bool, expires_at: float):
+        with self.transaction() as conn:
+            if received:
+                cursor = conn.execute(
+                    "UPDATE upload_sessions SET in_flight = in_flight - 1, expires_at = ? WHERE id = ?",
+                    (expires_at, upload_id),
+                )
+            else:
+                cursor = conn.execute(
+                    "UPDATE upload_sessions SET in_flight = in_flight - 1 WHERE id = ?", (upload_id,)
+                )
+            if cursor.rowcount == 0:
+                return None
+            if received:
+                conn.execute("INSERT OR IGNORE INTO upload_chunks (upload_id, idx) VALUES (?, ?)", (upload_id, index))
+            return conn.execute("SELECT COUNT(*) FROM upload_chunks WHERE upload_id = ?", (upload_id,)).fetchone()[0]
+
+    def take_upload_session(self, upload_id: str):
+        with self.transaction() as conn:
+            row = conn.execute(
+                "SELECT data, in_flight, expires_at FROM upload_sessions WHERE id = ?", (upload_id,)
+            ).fetchone()
+            if not row:
+                return False, None
+            session = self._upload_state(conn, row)
+            if session["inFlight"] or len(session["received"]) < session["totalChunks"]:
+                return False, session
+            conn.execute("DELETE FROM upload_chunks WHERE upload_id = ?", (upload_id,))
+            conn.execute("DELETE FROM upload_sessions WHERE id = ?", (upload_id,))
+        return True, session
+
+    def restore_upload_session(self, session: dict):
+        data = {key: value for key, value in session.items() if key not in ("expiresAt", "received", "inFlight")}
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT INTO upload_sessions (id, data, in_flight, expires_at) VALUES (?, ?, 0, ?)",
+                (session["id"], json.dumps(data), session["expiresAt"]),
+            )
+            conn.executemany(
+                "INSERT INTO upload_chunks (upload_id, idx) VALUES (?, ?)",
+                [(session["id"], idx) for idx in session["received"]],
+            )
+
+    def delete_upload_session(self, upload_id: str) -> bool:
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM upload_chunks WHERE upload_id = ?", (upload_id,))
+            cursor = conn.execute("DELETE FROM upload_sessions WHERE id = ?", (upload_id,))
+        return cursor.rowcount == 1
+
+    def pop_expired_upload_sessions(self, now: float = None) -> list:
+        with self.transaction() as conn:
+            rows = conn.execute(
+                "SELECT data, in_flight, expires_at FROM upload_sessions WHERE expires_at <= ?",
+                (time.time() if now is None else now,),
+            ).fetchall()
+            sessions = [json.loads(row[0]) for row in rows]
+            ids = [(session["id"],) for session in sessions]
+            conn.executemany("DELETE FROM upload_chunks WHERE upload_id = ?", ids)
+            conn.executemany("DELETE FROM upload_sessions WHERE id = ?", ids)
+        return sessions
+
+    # files
+    def to_record(self, row, now: float) -> FileRecord:
+        record = FileRecord(
+            id=row[0],
+            filename=row[1],
+            size=row[2],
+            share_token=row[3],
+            owner_email=row[4],
+            is_public=row[5],
+            available_from=row[6],
+            available_to=row[7],
+            created_at=row[8],
+            shared_with=json.loads(row[9]),
+            sha256=row[10],
+            password=row[11],
+            totp_enabled=row[12],
+            totp_secret=row[13],
+        )
+        record.status = status_at(record, now)
+        return record
+
+    @staticmethod
+    def _count_status(conn, owner_email, status: str, delta: int):
+        # status is one of STATUSES or "deleted", never user input
+        if owner_email:
+            conn.execute(
+                f"INSERT INTO owner_stats (owner_email, {status}) VALUES (?, ?) "
+                f"ON CONFLICT (owner_email) DO UPDATE SET {status} = {status} + excluded.{status}",
+                (owner_email, delta),
+            )
+
+    def add_file(self, record):
+        record.status = status_at(record, time.time())
+        with self.transaction() as conn:
+            conn.execute(
+                f"INSERT INTO files ({FILE_COLUMNS}, name_key, status) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    record.id,
+                    record.filename,
+                    record.size,
+                    record.share_token,
+                    record.owner_email,
+                    int(record.is_public),
+                    record.available_from,
+                    record.available_to,
+                    record.created_at,
+                    json.dumps(list(record.shared_with)),
+                    record.sha256,
+                    record.password,
+                    int(record.totp_enabled),
+                    record.totp_secret,
+                    record.filename.lower(),
+                    record.status,
+                ),
+            )
+            self._count_status(conn, record.owner_email, record.status, 1)
+
+    def remove_file(self, record) -> bool:
+        with self.transaction() as conn:
+            row = conn.execute("SELECT owner_email, status FROM files WHERE id = ?", (record.id,)).fetchone()
+            if row is None:
+                return False
+            conn.execute("DELETE FROM files WHERE id = ?", (record.id,))
+            self._count_status(conn, row[0], row[1], -1)
+            self._count_status(conn, row[0], "deleted", 1)
+        return True
+
+    def pop_expired(self, now: float, limit: int) -> list:
+        with self.transaction() as conn:
+            rows = conn.execute(
+                f"SELECT {FILE_COLUMNS}, status FROM files "
+                "WHERE available_to IS NOT NULL AND available_to < ? "
+                "ORDER BY available_to LIMIT ?",
+                (now, limit),
+            ).fetchall()
+            records = [self.to_record(row, now) for row in rows]
+            conn.executemany("DELETE FROM files WHERE id = ?", [(record.id,) for record in records])
+            for record, row in zip(records, rows):
+                self._count_status(conn, record.owner_email, row[-1], -1)
+                self._count_status(conn, record.owner_email, "deleted", 1)
+        return records
+
+    def oldest_expiry(self):
+        row = self.connection().execute(
+            "SELECT MIN(available_to) FROM files WHERE available_to IS NOT NULL"
+        ).fetchone()
+        return row[0]
+
+    def share_tokens(self):
+        return (row[0] for row in self.connection().execute("SELECT share_token FROM files"))
+
+    def get_file(self, file_id: str):
+        return self._get_file_where("id", file_id)
+
+    def get_file_by_share_token(self, share_token: str):
+        return self._get_file_where("share_token", share_token)
+
+    def _get_file_where(self, column: str, value: str):
+        row = self.connection().execute(
+            f"SELECT {FILE_COLUMNS} FROM files WHERE {column} = ?", (value,)
+        ).fetchone()
+        return self.to_record(row, time.time()) if row else None
+
+    def count_refs(self, digest: str) -> int:
+        """
+        Number of file records pointing at a blob; lets every worker's
+        BlobStore agree on whether content is still in use.
+        """
+        row = self.connection().execute("SELECT COUNT(*) FROM files WHERE sha256 = ?", (digest,)).fetchone()
+        return row[0]
+
+    def list_owner_files(
+        self,
+        owner_email: str,
+        sort_key: str,
+        reverse: bool,
+        status: str = None,
+        offset: int = 0,
+        limit: int = 20,
+        after: tuple = None,
+    ) -> list:
+        if limit <= 0 or offset < 0:
+            return []
+        now = time.time()
+        # bring files.status up to date, then filter on it through the
+        # (owner_email, status, sort column, id) indexes
+        self.advance_statuses(now)
+        column = SORT_COLUMNS.get(sort_key, "created_at")
+        direction = "DESC" if reverse else "ASC"
+        where = ["owner_email = ?1"]
+        params = [owner_email]
+        if status is not None:
+            params.append(status)
+            where.append(f"status = ?{len(params)}")
+        if after is not None:
+            params.extend(after)
+            where.append(f"({column}, id) {'<' if reverse else '>'} (?{len(params) - 1}, ?{len(params)})")
+            offset = 0
+        params.extend((limit, offset))
+        sql = (
+            f"SELECT {FILE_COLUMNS} FROM files WHERE {' AND '.join(where)} "
+            f"ORDER BY {column} {direction}, id {direction} "
+            f"LIMIT ?{len(params) - 1} OFFSET ?{len(params)}"
+        )
+        rows = self.connection().execute(sql, params).fetchall()
+        return [self.to_record(row, now) for row in rows]
+
+    def advance_statuses(self, now: float = None) -> int:
+        """
+        Move files.status forward for files whose availability window
+        started or ended, and the owner counters with it. Due files are
+        found through partial indexes, so when nothing is due this is two
+        empty index probes and no write lock.
+        """
+        if now is None:
+            now = time.time()
+        due_sql = (
+            f"SELECT id, owner_email, status, {STATUS_SQL} FROM files "
+            "WHERE status = 'pending' AND available_from <= ?1 "
+            "UNION ALL "
+            f"SELECT id, owner_email, status, {STATUS_SQL} FROM files "
+            "WHERE status = 'active' AND available_to IS NOT NULL AND available_to < ?1"
+        )
+        if self.connection().execute(due_sql, (now,)).fetchone() is None:
+            return 0
+        with self.transaction() as conn:
+            # read again under the write lock, another worker may have won
+            rows = conn.execute(due_sql, (now,)).fetchall()
+            for file_id, owner_email, old_status, new_status in rows:
+                conn.execute("UPDATE files SET status = ? WHERE id = ?", (new_status, file_id))
+                self._count_status(conn, owner_email, old_status, -1)
+                self._count_status(conn, owner_email, new_status, 1)
+        return len(rows)
+
+    def owner_summary(self, owner_email: str) -> dict:
+        self.advance_statuses()
+        row = self.connection().execute(
+            "SELECT active, pending, expired, deleted FROM owner_stats WHERE owner_email = ?", (owner_email,)
+        ).fetchone()
+        return dict(zip(("active", "pending", "expired", "deleted"), row or (0, 0, 0, 0)))
+
+    def file_count(self) -> int:
+        return self.connection().execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    # policy
+    def get_policy(self) -> dict:
+        rows = self.connection().execute("SELECT key, value FROM policy")
+        policy = {key: json.loads(value) for key, value in rows}
+        # keep the documented field order
+        return {key: policy[key] for key in self.default_policy if key in policy} | policy
+
+    def update_policy(self, changes: dict) -> dict:
+        with self.transaction() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO policy (key, value) VALUES (?, ?)",
+                [(key, json.dumps(value)) for key, value in changes.items()],
+            )
+        return self.get_policy()
+
+
+class _Transaction:
+    """
+    BEGIN IMMEDIATE ... COMMIT / ROLLBACK around a with-block. IMMEDIATE takes
+    the write lock up front so concurrent writers wait on the busy timeout
+    instead of failing halfway through.
+    """
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("COMMIT" if exc_type is None else "ROLLBACK")
+        return False
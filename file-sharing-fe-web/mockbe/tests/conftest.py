@@ -0,0 +1,44 @@
+import os
+import sys
+import tempfile
+import uuid
+
+# server.py reads its configuration at import time
+os.environ.setdefault("MOCKBE_STORAGE_DIR", tempfile.mkdtemp(prefix="mockbe-tests-"))
+os.environ.setdefault("LOGIN_IP_BURST", "1e9")
+os.environ.setdefault("LOGIN_EMAIL_BURST", "1e9")
+os.environ.setdefault("PASSWORD_SCRYPT_N", str(2**10))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import pytest  # noqa: E402
+
+import server  # noqa: E402
+
+OWNER_EMAIL = "bigbluewhale@hcmut.edu.vn"
+OWNER_PASSWORD = "bigbluewhale@123"
+
+
+@pytest.fixture
+def client():
+    return server.app.test_client()
+
+
+@pytest.fixture
+def auth_headers(client):
+    token = client.post("/api/auth/login", json={"email": OWNER_EMAIL, "password": OWNER_PASSWORD}).json[
+        "accessToken"
+    ]
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def new_user_headers(client):
+    """
+    Auth headers of a freshly registered user with no files.
+    """
+    email = f"{uuid.uuid4().hex}@example.com"
+    client.post("/api/auth/register", json={"email": email, "password": "secret-password"})
+    token = client.post("/api/auth/login", json={"email": email, "password": "secret-password"}).json[
+        "accessToken"
+    ]
+    return {"Authorization": f"Bearer {token}"}
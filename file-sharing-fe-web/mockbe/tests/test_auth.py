@@ -0,0 +1,52 @@
+import pytest
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        {"email": "a@example.com", "password": 123456},
+        {"email": 42, "password": "secret-password"},
+        {"email": ["a@example.com"], "password": "secret-password"},
+        {"email": "a@example.com", "password": {"x": 1}},
+    ],
+)
+def test_register_rejects_non_string_credentials(client, body):
+    assert client.post("/api/auth/register", json=body).status_code == 400
+
+
+def test_register_rejects_taken_email(client):
+    body = {"email": "bigbluewhale@hcmut.edu.vn", "password": "whatever"}
+    assert client.post("/api/auth/register", json=body).status_code == 400
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        {"email": "bigbluewhale@hcmut.edu.vn", "password": 123456},
+        {"email": 42, "password": "secret-password"},
+        {"email": "bigbluewhale@hcmut.edu.vn", "password": ["bigbluewhale@123"]},
+    ],
+)
+def test_login_rejects_non_string_credentials(client, body):
+    assert client.post("/api/auth/login", json=body).status_code == 400
+
+
+def test_login_unknown_user_and_wrong_password(client):
+    assert client.post("/api/auth/login", json={"email": "nobody@example.com", "password": "x"}).status_code == 401
+    body = {"email": "bigbluewhale@hcmut.edu.vn", "password": "wrong"}
+    assert client.post("/api/auth/login", json=body).status_code == 401
+    assert client.post("/api/auth/login", json={}).status_code == 401
+    assert client.post("/api/auth/login", data="not json").status_code == 401
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        {"oldPassword": "secret-password", "newPassword": 12345678},
+        {"oldPassword": 12345678, "newPassword": "new-password"},
+        {"oldPassword": "secret-password", "newPassword": None},
+    ],
+)
+def test_change_password_rejects_non_string_passwords(client, new_user_headers, body):
+    response = client.post("/api/auth/password/change", headers=new_user_headers, json=body)
+    assert response.status_code == 400
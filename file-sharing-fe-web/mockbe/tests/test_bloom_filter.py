@@ -0,0 +1,55 @@
+from bloom_filter import CountingBloomFilter
+
+
+def test_added_items_are_found():
+    bloom = CountingBloomFilter(1000)
+    items = [f"token-{i}" for i in range(1000)]
+    for item in items:
+        bloom.add(item)
+    assert all(bloom.might_contain(item) for item in items)
+    assert bloom.count == 1000
+
+
+def test_false_positive_rate_near_target():
+    bloom = CountingBloomFilter(1000, error_rate=0.01)
+    for i in range(1000):
+        bloom.add(f"token-{i}")
+    false_positives = sum(bloom.might_contain(f"absent-{i}") for i in range(10000))
+    assert false_positives < 300
+
+
+def test_remove_forgets_item():
+    bloom = CountingBloomFilter(100)
+    bloom.add("a")
+    bloom.remove("a")
+    assert not bloom.might_contain("a")
+    assert bloom.count == 0
+    assert not any(bloom.counters)
+
+
+def test_remove_keeps_duplicates_and_neighbours():
+    bloom = CountingBloomFilter(100)
+    bloom.add("a")
+    bloom.add("a")
+    bloom.add("b")
+    bloom.remove("a")
+    assert bloom.might_contain("a")
+    assert bloom.might_contain("b")
+
+
+def test_saturated_counter_sticks():
+    bloom = CountingBloomFilter(1)
+    for _ in range(300):
+        bloom.add("a")
+    for _ in range(300):
+        bloom.remove("a")
+    # a counter at 255 never goes down: a false positive, not a false negative
+    assert bloom.might_contain("a")
+
+
+def test_share_token_filter_is_opt_in():
+    import server
+
+    # a per-process filter would 404 links uploaded through other workers
+    assert not server.SHARE_TOKEN_FILTER
+    assert not server.unknown_share_token("no-such-token")
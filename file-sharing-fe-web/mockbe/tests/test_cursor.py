@@ -0,0 +1,92 @@
+import base64
+import io
+import json
+
+import pytest
+
+from server import decode_cursor, encode_cursor
+
+
+def raw_cursor(*fields) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(fields)).encode()).decode().rstrip("=")
+
+
+def test_round_trip():
+    cursor = encode_cursor("createdAt", "desc", 1700000000.5, "id-1")
+    assert "=" not in cursor
+    assert decode_cursor(cursor, "createdAt", "desc") == (1700000000.5, "id-1")
+    cursor = encode_cursor("fileName", "asc", "report ü.pdf", "id-2")
+    assert decode_cursor(cursor, "fileName", "asc") == ("report ü.pdf", "id-2")
+
+
+def test_cursor_is_bound_to_its_ordering():
+    cursor = encode_cursor("createdAt", "desc", 1.0, "id-1")
+    assert decode_cursor(cursor, "createdAt", "asc") is None
+    assert decode_cursor(cursor, "fileName", "desc") is None
+
+
+@pytest.mark.parametrize(
+    "cursor, sort_key",
+    [
+        ("not base64 !!", "createdAt"),
+        (base64.urlsafe_b64encode(b"not json").decode(), "createdAt"),
+        (raw_cursor("createdAt", "desc", 1.0), "createdAt"),
+        (raw_cursor("createdAt", "desc", "1.0", "id"), "createdAt"),
+        (raw_cursor("createdAt", "desc", True, "id"), "createdAt"),
+        (raw_cursor("createdAt", "desc", None, "id"), "createdAt"),
+        (raw_cursor("fileName", "desc", 5, "id"), "fileName"),
+        (raw_cursor("fileName", "desc", ["a"], "id"), "fileName"),
+        (raw_cursor("createdAt", "desc", 1.0, 7), "createdAt"),
+        (base64.urlsafe_b64encode(b'{"a": 1}').decode(), "createdAt"),
+    ],
+)
+def test_malformed_cursors(cursor, sort_key):
+    assert decode_cursor(cursor, sort_key, "desc") is None
+
+
+def upload_files(client, headers, names):
+    for name in names:
+        client.post(
+            "/api/files/upload",
+            headers=headers,
+            data={"file": (io.BytesIO(name.encode()), name), "isPublic": "true"},
+            content_type="multipart/form-data",
+        )
+
+
+@pytest.mark.parametrize("sort_by", ["createdAt", "fileName"])
+@pytest.mark.parametrize("order", ["asc", "desc"])
+def test_cursor_pages_cover_listing(client, new_user_headers, sort_by, order):
+    upload_files(client, new_user_headers, [f"file-{i:02d}.txt" for i in range(7)])
+    query = {"sortBy": sort_by, "order": order}
+    expected = client.get("/api/files/my", headers=new_user_headers, query_string=dict(query, limit=50)).json
+    expected_ids = [f["id"] for f in expected["files"]]
+    assert len(expected_ids) == 7
+
+    seen, cursor = [], None
+    while True:
+        params = dict(query, limit=3)
+        if cursor:
+            params["cursor"] = cursor
+        body = client.get("/api/files/my", headers=new_user_headers, query_string=params).json
+        seen.extend(f["id"] for f in body["files"])
+        cursor = body["pagination"]["nextCursor"]
+        if not cursor:
+            break
+    assert seen == expected_ids
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "garbage",
+        raw_cursor("createdAt", "desc", "1", "id"),
+        raw_cursor("createdAt", "desc", {"x": 1}, "id"),
+        raw_cursor("createdAt", "asc", 1.0, "id"),
+    ],
+)
+def test_bad_cursor_is_rejected(client, new_user_headers, cursor):
+    upload_files(client, new_user_headers, ["a.txt"])
+    response = client.get("/api/files/my", headers=new_user_headers, query_string={"cursor": cursor})
+    assert response.status_code == 400
+    assert response.json["message"] == "Invalid cursor"
@@ -0,0 +1,45 @@
+import io
+
+import server
+
+
+def upload(client, headers, **fields):
+    data = {"file": (io.BytesIO(b"secret bytes"), "secret.txt")}
+    data.update(fields)
+    response = client.post("/api/files/upload", headers=headers, data=data, content_type="multipart/form-data")
+    assert response.status_code == 200, response.json
+    return response.json
+
+
+def test_private_file_is_owner_only(client, auth_headers, new_user_headers):
+    url = f"/api/files/{upload(client, auth_headers, isPublic='false')['file']['shareToken']}/download"
+    assert client.get(url).status_code == 401
+    assert client.get(url, headers=new_user_headers).status_code == 403
+    assert client.get(url, headers=auth_headers).status_code == 200
+
+
+def test_password_file_needs_the_password(client, auth_headers):
+    url = f"/api/files/{upload(client, auth_headers, password='secret-password')['file']['shareToken']}/download"
+    assert client.get(url).status_code == 403
+    assert client.get(url, query_string={"password": "wrong-password"}).status_code == 403
+    assert client.get(url, query_string={"password": "secret-password"}).status_code == 200
+
+
+def test_file_password_is_stored_hashed(client, auth_headers):
+    meta = upload(client, auth_headers, password="secret-password")["file"]
+    stored = server.store.get_file(meta["id"]).password
+    assert stored.startswith("scrypt$")
+    assert "secret-password" not in stored
+    assert "password" not in meta
+
+
+def test_totp_validate_checks_the_file_password(client, auth_headers):
+    meta = upload(client, auth_headers, password="secret-password", enableTOTP="true")["file"]
+    validate = f"/api/files/{meta['shareToken']}/totp/validate"
+    assert client.post(validate, json={"code": "000000"}).json["error"] == "missingPassword"
+    assert client.post(validate, json={"code": "000000", "password": 123}).json["error"] == "missingPassword"
+    body = {"code": "000000", "password": "wrong-password"}
+    assert client.post(validate, json=body).json["error"] == "wrongPassword"
+    body = {"code": "000000", "password": "secret-password"}
+    assert client.post(validate, json=body).json["error"] == "invalidTOTPCode"
+    assert client.post(validate, json=["code"]).status_code == 400
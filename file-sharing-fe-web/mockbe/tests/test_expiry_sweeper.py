@@ -0,0 +1,47 @@
+import time
+
+import pytest
+
+import expiry_sweeper
+from expiry_sweeper import ExpirySweeper
+
+
+def test_rates_must_be_positive():
+    with pytest.raises(ValueError):
+        ExpirySweeper(lambda limit: (0, 0), lambda: None, files_per_second=0, bytes_per_second=1)
+    with pytest.raises(ValueError):
+        ExpirySweeper(lambda limit: (0, 0), lambda: None, files_per_second=1, bytes_per_second=-1)
+
+
+def test_sweep_once_counts_and_paces():
+    sweeper = ExpirySweeper(lambda limit: (limit, 0), lambda: None, files_per_second=100, bytes_per_second=1e9)
+    started = time.monotonic()
+    assert sweeper.sweep_once() == (10, 0)
+    # 10 files at 100 per second take at least 0.1 s
+    assert time.monotonic() - started >= 0.09
+    metrics = sweeper.metrics()
+    assert metrics["deletedFiles"] == 10
+    assert metrics["batches"] == 1
+    assert metrics["lagSeconds"] == 0.0
+
+
+def test_failing_batches_do_not_stop_the_thread(monkeypatch):
+    monkeypatch.setattr(expiry_sweeper, "ERROR_BACKOFF_SECONDS", 0.01)
+    calls = []
+
+    def delete_batch(limit):
+        calls.append(limit)
+        if len(calls) <= 2:
+            raise OSError("disk gone")
+        return 0, 0
+
+    sweeper = ExpirySweeper(delete_batch, lambda: None, files_per_second=10, bytes_per_second=1e9, idle_seconds=0.01)
+    sweeper.start()
+    deadline = time.monotonic() + 5
+    while len(calls) < 4 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    metrics = sweeper.metrics()
+    assert metrics["running"]
+    assert metrics["errors"] == 2
+    assert metrics["lastError"] == "OSError('disk gone')"
+    assert len(calls) >= 4
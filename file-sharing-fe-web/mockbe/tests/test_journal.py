@@ -0,0 +1,75 @@
+import os
+
+from journal import Journal
+from memory_store import MemoryStore
+from test_metadata_store import POLICY, USERS, make_record
+
+
+def open_store(directory):
+    return MemoryStore(USERS, POLICY, journal=Journal(str(directory), group_commit_seconds=0))
+
+
+def assert_same_files(store, other):
+    assert sorted(store.files) == sorted(other.files)
+    for file_id, record in store.files.items():
+        assert MemoryStore.file_row(other.files[file_id]) == MemoryStore.file_row(record)
+
+
+def mutate(store):
+    kept = make_record()
+    removed = make_record(filename="old.txt")
+    store.add_file(kept)
+    store.add_file(removed)
+    store.remove_file(removed)
+    store.add_user({"id": "u2", "email": "c@example.com", "password": "y", "role": "user"})
+    user = store.get_user("a@example.com")
+    user["totp_enabled"] = True
+    store.save_user(user)
+    store.create_session("token-1", "c@example.com", None, None)
+    store.update_policy({"maxFileSizeMB": 5})
+    return kept
+
+
+def test_replay_rebuilds_state(tmp_path):
+    store = open_store(tmp_path)
+    kept = mutate(store)
+
+    recovered = open_store(tmp_path)
+    assert_same_files(store, recovered)
+    assert recovered.get_file_by_share_token(kept.share_token).id == kept.id
+    assert recovered.get_user("c@example.com")["password"] == "y"
+    assert recovered.get_user("a@example.com")["totp_enabled"] is True
+    assert recovered.get_session("token-1")["email"] == "c@example.com"
+    assert recovered.get_policy()["maxFileSizeMB"] == 5
+    assert recovered.owner_summary("a@example.com") == store.owner_summary("a@example.com")
+    assert recovered.owner_summary("a@example.com")["deleted"] == 1
+
+
+def test_replay_after_snapshot(tmp_path):
+    store = open_store(tmp_path)
+    mutate(store)
+    store.snapshot()
+    later = make_record(filename="later.txt")
+    store.add_file(later)
+
+    names = os.listdir(tmp_path)
+    assert len([name for name in names if name.startswith("snapshot-")]) == 1
+    recovered = open_store(tmp_path)
+    assert_same_files(store, recovered)
+    assert recovered.owner_summary("a@example.com") == store.owner_summary("a@example.com")
+    assert recovered.get_session("token-1")["email"] == "c@example.com"
+
+
+def test_torn_tail_is_ignored(tmp_path):
+    store = open_store(tmp_path)
+    kept = make_record()
+    store.add_file(kept)
+    segments = sorted(name for name in os.listdir(tmp_path) if name.startswith("journal-"))
+    with open(tmp_path / segments[-1], "a", encoding="utf-8") as fh:
+        fh.write('[99,"add_fi')
+
+    recovered = open_store(tmp_path)
+    assert list(recovered.files) == [kept.id]
+    # appends go on after the last complete entry
+    recovered.add_file(make_record())
+    assert len(open_store(tmp_path).files) == 2
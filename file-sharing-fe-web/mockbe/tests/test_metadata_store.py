@@ -0,0 +1,208 @@
+import time
+import uuid
+
+import pytest
+
+from file_record import FileRecord
+from memory_store import MemoryStore
+from metadata_store import file_sort_key
+from sqlite_store import SQLiteStore
+
+USERS = {"a@example.com": {"id": "u1", "email": "a@example.com", "password": "x", "role": "user"}}
+POLICY = {"maxFileSizeMB": 50}
+
+
+def make_record(owner="a@example.com", **fields):
+    now = time.time()
+    values = dict(
+        id=str(uuid.uuid4()),
+        filename="report.pdf",
+        size=10,
+        share_token=uuid.uuid4().hex,
+        owner_email=owner,
+        is_public=True,
+        available_from=None,
+        available_to=None,
+        created_at=now,
+        shared_with=["b@example.com"],
+        sha256="0" * 64,
+    )
+    values.update(fields)
+    return FileRecord(**values)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteStore(str(tmp_path / "metadata.db"), USERS, POLICY)
+    return MemoryStore(USERS, POLICY)
+
+
+def add_files(store, now):
+    records = [
+        make_record(filename="b.txt", created_at=now - 50),
+        make_record(filename="A.txt", created_at=now - 40),
+        make_record(filename="c.txt", created_at=now - 30, available_from=now + 3600, status="pending"),
+        make_record(filename="d.txt", created_at=now - 20, available_to=now - 1, status="expired"),
+        make_record(filename="e.txt", created_at=now - 10),
+        make_record(filename="mine.txt", owner="b@example.com", created_at=now),
+    ]
+    for record in records:
+        store.add_file(record)
+    return records
+
+
+def names(records):
+    return [record.filename for record in records]
+
+
+def test_listing_order_and_status_filter(store):
+    add_files(store, time.time())
+    owner = "a@example.com"
+    assert names(store.list_owner_files(owner, "createdAt", True)) == ["e.txt", "d.txt", "c.txt", "A.txt", "b.txt"]
+    assert names(store.list_owner_files(owner, "fileName", False)) == ["A.txt", "b.txt", "c.txt", "d.txt", "e.txt"]
+    assert names(store.list_owner_files(owner, "createdAt", False, status="active")) == ["b.txt", "A.txt", "e.txt"]
+    assert names(store.list_owner_files(owner, "createdAt", False, status="pending")) == ["c.txt"]
+    assert names(store.list_owner_files(owner, "createdAt", True, offset=1, limit=2)) == ["d.txt", "c.txt"]
+
+
+def test_keyset_pages_match_offset_pages(store):
+    add_files(store, time.time())
+    owner = "a@example.com"
+    for sort_key in ("createdAt", "fileName"):
+        for reverse in (False, True):
+            for status in (None, "active"):
+                expected = store.list_owner_files(owner, sort_key, reverse, status=status, limit=100)
+                seen, after = [], None
+                while True:
+                    page = store.list_owner_files(owner, sort_key, reverse, status=status, limit=2, after=after)
+                    if not page:
+                        break
+                    seen.extend(page)
+                    after = (file_sort_key(page[-1], sort_key), page[-1].id)
+                assert [r.id for r in seen] == [r.id for r in expected]
+
+
+def test_owner_summary_follows_changes(store):
+    records = add_files(store, time.time())
+    assert store.owner_summary("a@example.com") == {"active": 3, "pending": 1, "expired": 1, "deleted": 0}
+    store.remove_file(records[0])
+    assert not store.remove_file(records[0])
+    assert store.owner_summary("a@example.com") == {"active": 2, "pending": 1, "expired": 1, "deleted": 1}
+    assert store.owner_summary("nobody@example.com") == {"active": 0, "pending": 0, "expired": 0, "deleted": 0}
+
+
+def test_statuses_advance(store):
+    now = time.time()
+    record = make_record(available_from=now - 1, status="pending")
+    store.add_file(record)
+    store.advance_statuses(now)
+    assert store.owner_summary("a@example.com")["active"] == 1
+    assert names(store.list_owner_files("a@example.com", "createdAt", False, status="active")) == ["report.pdf"]
+    assert store.list_owner_files("a@example.com", "createdAt", False, status="pending") == []
+
+
+def test_pop_expired(store):
+    now = time.time()
+    expired = make_record(available_to=now - 10, status="expired")
+    store.add_file(expired)
+    store.add_file(make_record(available_to=now + 3600))
+    assert [r.id for r in store.pop_expired(now, 10)] == [expired.id]
+    assert store.get_file(expired.id) is None
+    assert store.pop_expired(now, 10) == []
+
+
+def test_download_tokens(store):
+    now = time.time()
+    store.put_download_token("live", "file-1", now + 60)
+    store.put_download_token("stale", "file-2", now - 1)
+    assert store.get_download_token("live", now) == "file-1"
+    assert store.get_download_token("stale", now) is None
+    assert store.get_download_token("missing", now) is None
+    store.expire_download_tokens(now)
+    assert store.get_download_token("live", now) == "file-1"
+
+
+def test_upload_session_lifecycle(store):
+    now = time.time()
+    store.create_upload_session(
+        {
+            "id": "up-1",
+            "ownerEmail": "a@example.com",
+            "filename": "big.bin",
+            "size": 10,
+            "chunkSize": 5,
+            "totalChunks": 2,
+            "options": {"isPublic": True},
+            "dir": "/tmp/up-1",
+            "dataPath": "/tmp/up-1/data",
+            "expiresAt": now + 60,
+        }
+    )
+    assert store.begin_chunk("up-1", 0)
+    assert store.end_chunk("up-1", 0, True, now + 120) == 1
+    assert store.begin_chunk("up-1", 1)
+    taken, session = store.take_upload_session("up-1")
+    assert not taken and session["inFlight"] == 1
+    assert store.end_chunk("up-1", 1, True, now + 120) == 2
+
+    session = store.get_upload_session("up-1", now)
+    assert session["received"] == {0, 1}
+    assert session["options"] == {"isPublic": True}
+    assert session["expiresAt"] == now + 120
+    taken, session = store.take_upload_session("up-1")
+    assert taken and session["filename"] == "big.bin"
+    assert store.get_upload_session("up-1", now) is None
+    store.restore_upload_session(session)
+    restored = store.get_upload_session("up-1", now)
+    assert restored["received"] == {0, 1} and restored["inFlight"] == 0
+    taken, session = store.take_upload_session("up-1")
+    assert taken
+    assert store.take_upload_session("up-1") == (False, None)
+    assert not store.begin_chunk("up-1", 0)
+    assert store.end_chunk("up-1", 0, True, now) is None
+
+
+def test_expired_upload_sessions(store):
+    now = time.time()
+    base = {
+        "ownerEmail": "a@example.com",
+        "filename": "big.bin",
+        "size": 10,
+        "chunkSize": 5,
+        "totalChunks": 2,
+        "options": {},
+        "dir": "/tmp/up",
+        "dataPath": "/tmp/up/data",
+    }
+    store.create_upload_session(dict(base, id="old", expiresAt=now - 1))
+    store.create_upload_session(dict(base, id="new", expiresAt=now + 60))
+    assert store.get_upload_session("old", now) is None
+    assert [s["id"] for s in store.pop_expired_upload_sessions(now)] == ["old"]
+    assert store.get_upload_session("new", now) is not None
+    assert store.delete_upload_session("new")
+    assert not store.delete_upload_session("new")
+
+
+def test_sqlite_status_listing_uses_an_index(tmp_path):
+    store = SQLiteStore(str(tmp_path / "metadata.db"), USERS, POLICY)
+    conn = store.connection()
+    for column in ("created_at", "name_key"):
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM files WHERE owner_email = ?1 AND status = ?2 "
+            f"ORDER BY {column} DESC, id DESC LIMIT 20 OFFSET 100",
+            ("a@example.com", "active"),
+        ).fetchall()
+        detail = " ".join(row[3] for row in plan)
+        assert "owner_email=? AND status=?" in detail
+        assert "TEMP B-TREE" not in detail
+
+
+def test_sqlite_listing_follows_status_changes(tmp_path):
+    store = SQLiteStore(str(tmp_path / "metadata.db"), USERS, POLICY)
+    now = time.time()
+    store.add_file(make_record(available_from=now + 0.2))
+    assert names(store.list_owner_files("a@example.com", "createdAt", False, status="pending")) == ["report.pdf"]
+    time.sleep(0.3)
+    assert names(store.list_owner_files("a@example.com", "createdAt", False, status="active")) == ["report.pdf"]
+    assert store.list_owner_files("a@example.com", "createdAt", False, status="pending") == []
@@ -0,0 +1,87 @@
+import io
+
+import pytest
+
+import server
+
+
+def upload(client, headers, data, **kwargs):
+    return client.post(
+        "/api/files/upload", headers=headers, data=data, content_type="multipart/form-data", **kwargs
+    )
+
+
+@pytest.fixture
+def form_limits():
+    saved = server.app.config["MAX_FORM_PARTS"], server.app.config["MAX_FORM_MEMORY_SIZE"]
+    yield server.app.config
+    server.app.config["MAX_FORM_PARTS"], server.app.config["MAX_FORM_MEMORY_SIZE"] = saved
+
+
+def test_file_and_fields(client, auth_headers):
+    content = b"hello world" * 10000
+    response = upload(
+        client,
+        auth_headers,
+        {
+            "file": (io.BytesIO(content), "notes.txt"),
+            "isPublic": "true",
+            "sharedWith": ["b@example.com", "c@example.com"],
+        },
+    )
+    assert response.status_code == 200, response.json
+    meta = response.json["file"]
+    assert meta["filename"] == "notes.txt"
+    assert meta["size"] == len(content)
+    assert meta["sharedWith"] == ["b@example.com", "c@example.com"]
+    blob = server.blob_store.get(server.store.get_file(meta["id"]).sha256)
+    with open(blob["path"], "rb") as fh:
+        assert fh.read() == content
+
+
+def test_file_part_is_required(client, auth_headers):
+    response = upload(client, auth_headers, {"isPublic": "true"})
+    assert response.status_code == 400
+
+
+def test_extra_file_parts_are_ignored(client, auth_headers):
+    response = upload(
+        client,
+        auth_headers,
+        {"file": [(io.BytesIO(b"first"), "a.txt"), (io.BytesIO(b"second"), "b.txt")], "isPublic": "true"},
+    )
+    assert response.status_code == 200
+    assert response.json["file"]["filename"] == "a.txt"
+    assert response.json["file"]["size"] == 5
+
+
+def test_file_too_large(client, auth_headers):
+    max_mb = server.store.get_policy()["maxFileSizeMB"]
+    server.store.update_policy({"maxFileSizeMB": 1})
+    try:
+        response = upload(client, auth_headers, {"file": (io.BytesIO(b"x" * (2 * 1024 * 1024)), "big.bin")})
+    finally:
+        server.store.update_policy({"maxFileSizeMB": max_mb})
+    assert response.status_code == 413
+    assert response.json["error"] == "File too large"
+
+
+def test_too_many_parts(client, auth_headers, form_limits):
+    form_limits["MAX_FORM_PARTS"] = 5
+    data = {"file": (io.BytesIO(b"x"), "a.txt"), "sharedWith": [f"u{i}@example.com" for i in range(10)]}
+    response = upload(client, auth_headers, data)
+    assert response.status_code == 413
+    assert response.json["error"] == "Too many form fields or form data too large"
+
+
+def test_form_fields_too_large(client, auth_headers, form_limits):
+    form_limits["MAX_FORM_MEMORY_SIZE"] = 1024
+    data = {"file": (io.BytesIO(b"x"), "a.txt"), "password": "p" * 4096}
+    response = upload(client, auth_headers, data)
+    assert response.status_code == 413
+
+
+def test_file_bytes_do_not_count_as_form_memory(client, auth_headers, form_limits):
+    form_limits["MAX_FORM_MEMORY_SIZE"] = 1024
+    response = upload(client, auth_headers, {"file": (io.BytesIO(b"x" * 100_000), "a.txt"), "isPublic": "true"})
+    assert response.status_code == 200
@@ -0,0 +1,104 @@
+import io
+import os
+
+import pytest
+
+import server
+from server import parse_byte_ranges
+
+CONTENT = os.urandom(300_000)
+
+
+@pytest.fixture
+def shared_file(client, auth_headers):
+    response = client.post(
+        "/api/files/upload",
+        headers=auth_headers,
+        data={"file": (io.BytesIO(CONTENT), "range.bin"), "isPublic": "true"},
+        content_type="multipart/form-data",
+    )
+    meta = response.json["file"]
+    return f"/api/files/{meta['shareToken']}/download", f'"{meta["sha256"]}"'
+
+
+def test_parse_byte_ranges():
+    assert parse_byte_ranges(None, 100) is None
+    assert parse_byte_ranges("bytes=0-9", 100) == [(0, 10)]
+    assert parse_byte_ranges("bytes=90-", 100) == [(90, 100)]
+    assert parse_byte_ranges("bytes=-10", 100) == [(90, 100)]
+    assert parse_byte_ranges("bytes=-500", 100) == [(0, 100)]
+    assert parse_byte_ranges("bytes=50-500", 100) == [(50, 100)]
+    assert parse_byte_ranges("bytes=0-0, 10-19", 100) == [(0, 1), (10, 20)]
+    # unsatisfiable ranges are dropped, none left means 416
+    assert parse_byte_ranges("bytes=100-", 100) == []
+    assert parse_byte_ranges("bytes=200-300, 0-1", 100) == [(0, 2)]
+    # malformed headers are ignored and the whole file is sent
+    for header in ("items=0-1", "bytes=abc", "bytes=5-1", "bytes=1", "bytes=-x"):
+        assert parse_byte_ranges(header, 100) is None
+    assert parse_byte_ranges("bytes=" + ",".join(["0-1"] * (server.MAX_RANGES + 1)), 100) is None
+
+
+def test_full_download(client, shared_file):
+    url, etag = shared_file
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.headers["ETag"] == etag
+    assert response.headers["Accept-Ranges"] == "bytes"
+    assert response.get_data() == CONTENT
+
+
+def test_single_range(client, shared_file):
+    url, _ = shared_file
+    response = client.get(url, headers={"Range": "bytes=100000-199999"})
+    assert response.status_code == 206
+    assert response.headers["Content-Range"] == f"bytes 100000-199999/{len(CONTENT)}"
+    assert response.get_data() == CONTENT[100000:200000]
+
+
+def test_suffix_range(client, shared_file):
+    url, _ = shared_file
+    response = client.get(url, headers={"Range": "bytes=-10"})
+    assert response.status_code == 206
+    assert response.get_data() == CONTENT[-10:]
+
+
+def test_multiple_ranges(client, shared_file):
+    url, _ = shared_file
+    response = client.get(url, headers={"Range": "bytes=0-9,200000-200009"})
+    assert response.status_code == 206
+    assert response.mimetype == "multipart/byteranges"
+    boundary = response.mimetype_params["boundary"].encode()
+    body = response.get_data()
+    parts = [part for part in body.split(b"--" + boundary) if part.strip(b"\r\n-")]
+    assert len(parts) == 2
+    for part, (start, end) in zip(parts, [(0, 10), (200000, 200010)]):
+        head, _, data = part.partition(b"\r\n\r\n")
+        assert f"Content-Range: bytes {start}-{end - 1}/{len(CONTENT)}".encode() in head
+        assert data[: end - start] == CONTENT[start:end]
+
+
+def test_unsatisfiable_range(client, shared_file):
+    url, _ = shared_file
+    response = client.get(url, headers={"Range": f"bytes={len(CONTENT)}-"})
+    assert response.status_code == 416
+    assert response.headers["Content-Range"] == f"bytes */{len(CONTENT)}"
+
+
+def test_if_range_matching_etag(client, shared_file):
+    url, etag = shared_file
+    response = client.get(url, headers={"Range": "bytes=0-99", "If-Range": etag})
+    assert response.status_code == 206
+    assert response.get_data() == CONTENT[:100]
+
+
+def test_if_range_stale_validator_sends_everything(client, shared_file):
+    url, _ = shared_file
+    for validator in ('"0000"', "Wed, 21 Oct 2015 07:28:00 GMT"):
+        response = client.get(url, headers={"Range": "bytes=0-99", "If-Range": validator})
+        assert response.status_code == 200
+        assert response.get_data() == CONTENT
+
+
+def test_if_none_match(client, shared_file):
+    url, etag = shared_file
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
@@ -0,0 +1,46 @@
+import pytest
+
+from rate_limiter import TokenBucketLimiter
+
+
+def test_burst_then_wait():
+    limiter = TokenBucketLimiter(rate=1, burst=3)
+    assert [limiter.acquire("k", now=0) for _ in range(3)] == [0, 0, 0]
+    assert limiter.acquire("k", now=0) == pytest.approx(1)
+
+
+def test_refills_at_rate():
+    limiter = TokenBucketLimiter(rate=2, burst=2)
+    limiter.acquire("k", now=0)
+    limiter.acquire("k", now=0)
+    assert limiter.acquire("k", now=0.25) == pytest.approx(0.25)
+    assert limiter.acquire("k", now=0.5) == 0
+    assert limiter.acquire("k", now=0.5) > 0
+
+
+def test_refill_is_capped_at_burst():
+    limiter = TokenBucketLimiter(rate=1, burst=2)
+    limiter.acquire("k", now=0)
+    assert [limiter.acquire("k", now=1000) for _ in range(3)] == [0, 0, 1]
+
+
+def test_refused_requests_take_nothing():
+    limiter = TokenBucketLimiter(rate=1, burst=1)
+    limiter.acquire("k", now=0)
+    for _ in range(5):
+        assert limiter.acquire("k", now=0.5) == pytest.approx(0.5)
+    assert limiter.acquire("k", now=1) == 0
+
+
+def test_keys_are_independent():
+    limiter = TokenBucketLimiter(rate=1, burst=1)
+    assert limiter.acquire("a", now=0) == 0
+    assert limiter.acquire("a", now=0) > 0
+    assert limiter.acquire("b", now=0) == 0
+
+
+def test_key_count_is_bounded():
+    limiter = TokenBucketLimiter(rate=1, burst=1, max_keys=64, shards=4)
+    for i in range(1000):
+        limiter.acquire(f"ip-{i}", now=0)
+    assert len(limiter) <= 64
@@ -0,0 +1,47 @@
+import threading
+import time
+
+from sqlite_store import SQLiteStore
+from test_metadata_store import POLICY, USERS
+
+
+def test_sqlite_sessions_are_shared_between_workers(tmp_path):
+    path = str(tmp_path / "metadata.db")
+    worker_a = SQLiteStore(path, USERS, POLICY)
+    worker_b = SQLiteStore(path, USERS, POLICY)
+    now = time.time()
+
+    worker_a.create_session("token-1", "a@example.com", now + 60, now + 3600)
+    assert worker_b.get_session("token-1", now)["email"] == "a@example.com"
+    worker_b.renew_session("token-1", now + 120)
+    assert worker_a.get_session("token-1", now)["expiresAt"] == now + 120
+    worker_b.delete_session("token-1")
+    assert worker_a.get_session("token-1", now) is None
+
+    worker_a.put_pending_login("temp-1", "a@example.com", now + 60, 100)
+    assert worker_b.get_pending_login("temp-1", now) == "a@example.com"
+
+
+def test_concurrent_logins_and_checks(tmp_path):
+    path = str(tmp_path / "metadata.db")
+    now = time.time()
+    errors = []
+
+    def worker(name):
+        store = SQLiteStore(path, USERS, POLICY)
+        try:
+            for i in range(50):
+                token = f"{name}-{i}"
+                store.create_session(token, "a@example.com", now + 60, now + 3600)
+                assert store.get_session(token, now)["email"] == "a@example.com"
+                store.renew_session(token, now + 120)
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=worker, args=(f"w{i}",)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert SQLiteStore(path, USERS, POLICY).session_count() == 200
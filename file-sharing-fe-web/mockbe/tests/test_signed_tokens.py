@@ -0,0 +1,92 @@
+import json
+import os
+import subprocess
+import sys
+
+from signed_tokens import sign_token, verify_token
+
+SECRET = b"test-secret"
+
+
+def test_round_trip():
+    token = sign_token(SECRET, {"sub": "a@example.com", "exp": 200})
+    assert verify_token(SECRET, token, now=100) == {"sub": "a@example.com", "exp": 200}
+
+
+def test_expired():
+    token = sign_token(SECRET, {"sub": "a@example.com", "exp": 200})
+    assert verify_token(SECRET, token, now=200) is None
+
+
+def test_wrong_secret():
+    token = sign_token(SECRET, {"sub": "a@example.com", "exp": 200})
+    assert verify_token(b"other-secret", token, now=100) is None
+
+
+def test_tampered_payload():
+    token = sign_token(SECRET, {"sub": "a@example.com", "exp": 200})
+    forged = sign_token(SECRET, {"sub": "admin@example.com", "exp": 200})
+    version, _, signature = token.split(".")
+    payload = forged.split(".")[1]
+    assert verify_token(SECRET, f"{version}.{payload}.{signature}", now=100) is None
+
+
+def test_malformed():
+    for token in ("", "v1", "v1.a.b.c", "v2.e30.AAAA", "v1.!!!.???", "v1.é.x"):
+        assert verify_token(SECRET, token, now=100) is None
+
+
+def test_claims_without_numeric_exp():
+    assert verify_token(SECRET, sign_token(SECRET, {"sub": "a"}), now=100) is None
+    assert verify_token(SECRET, sign_token(SECRET, {"exp": "9999"}), now=100) is None
+
+
+SERVER_DIR = os.path.join(os.path.dirname(__file__), "..")
+
+WORKER = """
+import json, sys
+import server
+client = server.app.test_client()
+for action, token in json.loads(sys.argv[1]):
+    if action == "login":
+        body = {"email": "bigbluewhale@hcmut.edu.vn", "password": "bigbluewhale@123"}
+        print(">", client.post("/api/auth/login", json=body).json["accessToken"])
+    elif action == "check":
+        print(">", client.get("/api/user", headers={"Authorization": f"Bearer {token}"}).status_code)
+    elif action == "logout":
+        print(">", client.post("/api/auth/logout", headers={"Authorization": f"Bearer {token}"}).status_code)
+"""
+
+
+def run_worker(env: dict, *actions):
+    result = subprocess.run(
+        [sys.executable, "-c", WORKER, json.dumps(actions)],
+        cwd=SERVER_DIR,
+        env=dict(os.environ, **env),
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    # only lines starting with ">" are answers, the server may log to stdout
+    answers = [line[2:] for line in result.stdout.splitlines() if line.startswith("> ")]
+    return result.returncode, answers, result.stderr
+
+
+def test_signed_mode_requires_a_shared_store(tmp_path):
+    env = {"MOCKBE_STORAGE_DIR": str(tmp_path), "ACCESS_TOKEN_MODE": "signed", "METADATA_BACKEND": "memory"}
+    returncode, _, stderr = run_worker(env)
+    assert returncode != 0
+    assert "requires METADATA_BACKEND=sqlite" in stderr
+
+
+def test_logout_is_seen_by_other_workers(tmp_path):
+    env = {
+        "MOCKBE_STORAGE_DIR": str(tmp_path),
+        "ACCESS_TOKEN_MODE": "signed",
+        "ACCESS_TOKEN_SECRET": "shared-secret",
+        "METADATA_BACKEND": "sqlite",
+    }
+    _, (token,), _ = run_worker(env, ("login", None))
+    assert run_worker(env, ("check", token))[1] == ["200"]
+    assert run_worker(env, ("logout", token))[1] == ["200"]
+    assert run_worker(env, ("check", token))[1] == ["401"]
@@ -0,0 +1,105 @@
+import base64
+import io
+import time
+
+from totp import TOTPVerifier, generate_secret, hotp
+
+NOW = 1_700_000_010.0
+
+
+def code_at(secret: str, step: int) -> str:
+    return hotp(base64.b32decode(secret + "=" * (-len(secret) % 8)), step)
+
+
+def test_rfc_6238_vector():
+    # RFC 6238 appendix B, SHA1, T = 59 -> 94287082 (8 digits)
+    key = b"12345678901234567890"
+    assert hotp(key, 59 // 30, digits=8) == "94287082"
+
+
+def test_drift_window():
+    verifier = TOTPVerifier(drift_steps=1)
+    secret = generate_secret()
+    step = int(NOW // 30)
+    assert verifier.verify(secret, code_at(secret, step - 1), "user:a", now=NOW)
+    assert verifier.verify(secret, code_at(secret, step + 1), "user:b", now=NOW)
+    assert not verifier.verify(secret, code_at(secret, step - 2), "user:c", now=NOW)
+    assert not verifier.verify(secret, code_at(secret, step + 2), "user:d", now=NOW)
+
+
+def test_code_is_accepted_once_per_scope():
+    verifier = TOTPVerifier()
+    secret = generate_secret()
+    code = code_at(secret, int(NOW // 30))
+    assert verifier.verify(secret, code, "user:a", now=NOW)
+    assert not verifier.verify(secret, code, "user:a", now=NOW + 1)
+    assert verifier.verify(secret, code, "file:f", now=NOW + 1)
+
+
+def test_older_step_rejected_after_newer_one():
+    verifier = TOTPVerifier()
+    secret = generate_secret()
+    step = int(NOW // 30)
+    assert verifier.verify(secret, code_at(secret, step), "user:a", now=NOW)
+    assert not verifier.verify(secret, code_at(secret, step - 1), "user:a", now=NOW)
+    assert verifier.verify(secret, code_at(secret, step + 1), "user:a", now=NOW + 30)
+
+
+def test_rejects_garbage():
+    verifier = TOTPVerifier()
+    secret = generate_secret()
+    assert not verifier.verify(secret, 123456, "user:a", now=NOW)
+    assert not verifier.verify(secret, None, "user:a", now=NOW)
+    assert not verifier.verify(None, "123456", "user:a", now=NOW)
+
+
+def test_claim_step_decides_replays():
+    claimed = []
+
+    def claim_step(scope, step, expires_at):
+        claimed.append((scope, step, expires_at))
+        return len(claimed) == 1
+
+    verifier = TOTPVerifier(drift_steps=1, claim_step=claim_step)
+    secret = generate_secret()
+    step = int(NOW // 30)
+    code = code_at(secret, step)
+    assert verifier.verify(secret, code, "user:a", now=NOW)
+    assert not verifier.verify(secret, code, "user:a", now=NOW)
+    assert claimed[0] == ("user:a", step, (step + 2) * 30)
+
+
+def test_sqlite_claim_step(tmp_path):
+    from sqlite_store import SQLiteStore
+
+    store = SQLiteStore(str(tmp_path / "metadata.db"), {}, {})
+    verifier = TOTPVerifier(claim_step=store.claim_totp_step)
+    other_worker = TOTPVerifier(claim_step=store.claim_totp_step)
+    secret = generate_secret()
+    step = int(NOW // 30)
+    assert verifier.verify(secret, code_at(secret, step), "user:a", now=NOW)
+    assert not other_worker.verify(secret, code_at(secret, step), "user:a", now=NOW)
+    assert not other_worker.verify(secret, code_at(secret, step - 1), "user:a", now=NOW)
+    assert other_worker.verify(secret, code_at(secret, step + 1), "user:a", now=NOW)
+
+
+def test_file_totp_code_works_once(client, auth_headers):
+    response = client.post(
+        "/api/files/upload",
+        headers=auth_headers,
+        data={"file": (io.BytesIO(b"secret bytes"), "secret.txt"), "isPublic": "true", "enableTOTP": "true"},
+        content_type="multipart/form-data",
+    )
+    body = response.json
+    share_token = body["file"]["shareToken"]
+    code = code_at(body["totpSetup"]["secret"], int(time.time() // 30))
+
+    validate = f"/api/files/{share_token}/totp/validate"
+    download_token = client.post(validate, json={"code": code}).json["downloadToken"]
+    assert client.post(validate, json={"code": code}).status_code == 400
+    assert client.post(validate, json={"code": 123456}).status_code == 400
+
+    url = f"/api/files/{share_token}/download"
+    assert client.get(url).status_code == 400
+    assert client.get(url, query_string={"downloadToken": "dl-forged"}).status_code == 400
+    assert client.get(url, query_string={"downloadToken": download_token}).status_code == 200
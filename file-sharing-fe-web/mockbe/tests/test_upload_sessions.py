@@ -0,0 +1,106 @@
+import hashlib
+import os
+
+import pytest
+
+import server
+
+CONTENT = os.urandom(100_000)
+CHUNK_SIZE = 64 * 1024
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        ["fileName", "fileSize"],
+        "upload",
+        {"fileName": 123, "fileSize": 10},
+        {"fileName": ["a.txt"], "fileSize": 10},
+        {"fileName": "a.txt", "fileSize": "ten"},
+        {"fileName": "a.txt", "fileSize": 10, "password": 12345678},
+        {"fileName": "a.txt", "fileSize": 10, "password": ["secret-password"]},
+        {"fileName": "a.txt", "fileSize": 10, "sharedWith": [{"a": 1}]},
+        {"fileName": "a.txt", "fileSize": 10, "sharedWith": [["b@example.com"]]},
+        {"fileName": "a.txt", "fileSize": 10, "availableFrom": 1700000000},
+    ],
+)
+def test_upload_session_rejects_malformed_options(client, auth_headers, body):
+    response = client.post("/api/files/uploads", headers=auth_headers, json=body)
+    assert response.status_code == 400
+
+
+def test_upload_session_accepts_json_types(client, auth_headers):
+    body = {
+        "fileName": "a.txt",
+        "fileSize": 10,
+        "isPublic": True,
+        "enableTOTP": False,
+        "sharedWith": ["b@example.com"],
+        "password": "secret-password",
+    }
+    response = client.post("/api/files/uploads", headers=auth_headers, json=body)
+    assert response.status_code == 201
+    upload_id = response.json["uploadId"]
+    assert client.delete(f"/api/files/uploads/{upload_id}", headers=auth_headers).status_code == 200
+
+
+def open_session(client, headers):
+    body = {"fileName": "big.bin", "fileSize": len(CONTENT), "chunkSize": CHUNK_SIZE, "isPublic": True}
+    return client.post("/api/files/uploads", headers=headers, json=body).json["uploadId"]
+
+
+def send_chunks(client, headers, upload_id, content=CONTENT):
+    for index in range(0, len(content), CHUNK_SIZE):
+        url = f"/api/files/uploads/{upload_id}/chunks/{index // CHUNK_SIZE}"
+        assert client.put(url, headers=headers, data=content[index : index + CHUNK_SIZE]).status_code == 200
+
+
+def test_chunked_upload(client, auth_headers):
+    upload_id = open_session(client, auth_headers)
+    send_chunks(client, auth_headers, upload_id)
+    digest = hashlib.sha256(CONTENT).hexdigest()
+    response = client.post(f"/api/files/uploads/{upload_id}/complete", headers=auth_headers, json={"sha256": digest})
+    assert response.status_code == 200
+    assert response.json["file"]["sha256"] == digest
+    assert client.get(f"/api/files/uploads/{upload_id}", headers=auth_headers).status_code == 404
+
+
+def test_complete_with_missing_chunks(client, auth_headers):
+    upload_id = open_session(client, auth_headers)
+    send_chunks(client, auth_headers, upload_id, CONTENT[:CHUNK_SIZE])
+    response = client.post(f"/api/files/uploads/{upload_id}/complete", headers=auth_headers)
+    assert response.status_code == 409
+    assert response.json["missingChunks"] == [1]
+
+
+@pytest.mark.parametrize("body", [{"sha256": 123}, {"sha256": ["ab"]}, ["sha256"], "sha256"])
+def test_malformed_complete_keeps_the_upload(client, auth_headers, body):
+    upload_id = open_session(client, auth_headers)
+    send_chunks(client, auth_headers, upload_id)
+    url = f"/api/files/uploads/{upload_id}/complete"
+    assert client.post(url, headers=auth_headers, json=body).status_code == 400
+    assert client.post(url, headers=auth_headers).status_code == 200
+
+
+def test_checksum_mismatch_keeps_the_upload(client, auth_headers):
+    upload_id = open_session(client, auth_headers)
+    corrupted = b"x" * CHUNK_SIZE + CONTENT[CHUNK_SIZE:]
+    send_chunks(client, auth_headers, upload_id, corrupted)
+    url = f"/api/files/uploads/{upload_id}/complete"
+    digest = hashlib.sha256(CONTENT).hexdigest()
+    assert client.post(url, headers=auth_headers, json={"sha256": digest}).status_code == 400
+
+    status = client.get(f"/api/files/uploads/{upload_id}", headers=auth_headers).json
+    assert status["receivedChunks"] == [0, 1]
+    send_chunks(client, auth_headers, upload_id, CONTENT[:CHUNK_SIZE])
+    response = client.post(url, headers=auth_headers, json={"sha256": digest.upper()})
+    assert response.status_code == 200
+    assert response.json["file"]["sha256"] == digest
+
+
+def test_session_options_keep_only_the_password_hash(client, auth_headers):
+    body = {"fileName": "a.txt", "fileSize": 10, "password": "secret-password"}
+    upload_id = client.post("/api/files/uploads", headers=auth_headers, json=body).json["uploadId"]
+    stored = server.store.get_upload_session(upload_id)["options"]["password"]
+    assert stored.startswith("scrypt$")
+    client.delete(f"/api/files/uploads/{upload_id}", headers=auth_headers)
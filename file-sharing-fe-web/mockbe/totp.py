@@ -0,0 +1,103 @@
+import base64
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from urllib.parse import quote
+
+from lru_cache import LRUCache
+
+
+def generate_secret() -> str:
+    """
+    Random 160-bit secret, base32 without padding as authenticator apps
+    expect it.
+    """
+    return base64.b32encode(secrets.token_bytes(20)).decode("ascii").rstrip("=")
+
+
+def provisioning_uri(secret: str, account: str, issuer: str) -> str:
+    label = quote(f"{issuer}:{account}")
+    return f"otpauth://totp/{label}?secret={secret}&issuer={quote(issuer)}"
+
+
+def hotp(key: bytes, counter: int, digits: int = 6) -> str:
+    # RFC 4226 dynamic truncation
+    digest = hmac.new(key, counter.to_bytes(8, "big"), hashlib.sha1).digest()
+    offset = digest[-1] & 0x0F
+    value = int.from_bytes(digest[offset:offset + 4], "big") & 0x7FFFFFFF
+    return str(value % 10**digits).zfill(digits)
+
+
+class TOTPVerifier:
+    """
+    RFC 6238 TOTP (HMAC-SHA1, 30 second steps) accepting codes up to
+    drift_steps steps either side of now.
+
+    The codes of the current window are computed once per secret and step
+    and kept in an LRU of max_secrets entries, so a check is a dict lookup.
+    A code is accepted at most once per scope (a user or a file): the
+    replay cache remembers the last step accepted for each scope and
+    rejects that step and older ones. Entries only need to outlive the drift
+    window, so the cache is bounded by max_scopes and by time.
+
+    The replay cache is per process. When several workers verify codes,
+    pass claim_step(scope, step, expires_at) -> bool backed by shared
+    storage; it must record step for scope and return True only if no
+    step at or after it was recorded before.
+    """
+
+    def __init__(
+        self,
+        drift_steps: int = 1,
+        step_seconds: int = 30,
+        digits: int = 6,
+        max_secrets: int = 10000,
+        max_scopes: int = 100000,
+        claim_step=None,
+    ):
+        self.drift_steps = drift_steps
+        self.step_seconds = step_seconds
+        self.digits = digits
+        # window_codes[secret] = (step, { code: step })
+        self.window_codes = LRUCache(max_secrets)
+        # last_used[scope] = last accepted step
+        self.last_used = LRUCache(max_scopes)
+        self.lock = threading.Lock()
+        self.claim_step = claim_step
+
+    def _codes(self, secret: str, step: int, now: float) -> dict:
+        cached = self.window_codes.get(secret, now)
+        if cached is not None and cached[0] == step:
+            return cached[1]
+        key = base64.b32decode(secret.upper() + "=" * (-len(secret) % 8))
+        codes = {}
+        # nearest step wins if two steps happen to share a code
+        for offset in sorted(range(-self.drift_steps, self.drift_steps + 1), key=abs, reverse=True):
+            codes[hotp(key, step + offset, self.digits)] = step + offset
+        self.window_codes.put(secret, (step, codes), expires_at=(step + 1) * self.step_seconds, now=now)
+        return codes
+
+    def verify(self, secret: str, code, scope: str, now: float = None) -> bool:
+        """
+        True if code is valid for secret within the drift window and no code
+        of the same or a later step was accepted for scope before.
+        """
+        if not secret or not isinstance(code, str):
+            return False
+        if now is None:
+            now = time.time()
+        step = int(now // self.step_seconds)
+        matched = self._codes(secret, step, now).get(code.strip())
+        if matched is None:
+            return False
+        expires_at = (matched + self.drift_steps + 1) * self.step_seconds
+        if self.claim_step is not None:
+            return self.claim_step(scope, matched, expires_at)
+        with self.lock:
+            last = self.last_used.get(scope, now)
+            if last is not None and matched <= last:
+                return False
+            self.last_used.put(scope, matched, expires_at=expires_at, now=now)
+        return True